@@ -0,0 +1,6 @@
+"""
+Process multiple repositories in a single process, sharing one worker pool:
+configs are loaded once per repository, and the interpreter startup is only paid once.
+"""
+from batch_mode.manifest import RepoConfig, load_manifest
+from batch_mode.run_batch import RepoResult, configure_repo, process_chunk, run_batch, write_batch_report
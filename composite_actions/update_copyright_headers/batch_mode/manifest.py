@@ -0,0 +1,105 @@
+"""
+Load the batch manifest: the list of repositories to process, with optional per-repo configs.
+
+Example manifest (yaml):
+
+repos:
+  - target_path: repo_a               # Relative to the manifest's directory
+  - target_path: /abs/path/to/repo_b
+    excludes_path: COPYRIGHT_EXCLUDES # Relative to target_path, like the CLI arguments
+    languages_path: languages.yml
+    disclaimer_path: disclaimer.txt
+    disclaimer_mode: config
+    year_cache_path: .cache/years.json
+    year_providers: [git, map, fixed]
+    year_map_path: years.json
+    default_year: 2020
+    skip_shallow_history: true
+"""
+# pylint: disable=locally-disabled, unspecified-encoding
+
+# Imports
+from argparse import Namespace
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+
+@dataclass(frozen=True)
+class RepoConfig:
+	"""Configuration for one repository of a batch run. All paths are absolute."""
+
+	target_path: Path
+	languages_path: Path
+	excludes_path: Path
+	disclaimer_path: Path
+	disclaimer_mode: Optional[str] = None
+	year_cache_path: Optional[Path] = None
+	year_providers: Tuple[str, ...] = ("git",)
+	year_map_path: Optional[Path] = None
+	default_year: Optional[int] = None
+	skip_shallow_history: bool = False
+
+
+def load_manifest(manifest_path: Union[str, Path], defaults: Namespace) -> List[RepoConfig]:
+	"""
+	Load and validate the repositories listed in the manifest file.
+
+	Args:
+		manifest_path (Union[str, Path]): Path to the manifest file.
+		defaults (Namespace): Parsed command-line arguments,
+			used for the values not specified in the manifest.
+
+	Returns:
+		REPOS (List[RepoConfig]): Configuration of each repository, in the manifest order.
+	"""
+	# Imported here: yaml is slow to import, and only needed in batch mode
+	# pylint: disable-next=import-outside-toplevel
+	import yaml
+
+	manifest_path = Path(manifest_path).absolute()
+	with open(manifest_path) as manifest_file:
+		repo_entries = yaml.safe_load(manifest_file)["repos"]
+
+	out = []
+	for repo_entry in repo_entries:
+		# A repository can be given as a simple path
+		if isinstance(repo_entry, str):
+			repo_entry = {"target_path": repo_entry}
+
+		target_path = manifest_path.parent.joinpath(repo_entry["target_path"]).absolute()
+		if not target_path.exists():
+			raise FileNotFoundError(
+				f"Specified target path '{target_path!s}' in manifest does not exist !"
+			)
+
+		paths = {}
+		for arg_name in ("languages_path", "excludes_path", "disclaimer_path"):
+			# Calculate full path
+			path = target_path.joinpath(repo_entry.get(arg_name, getattr(defaults, arg_name)))
+			if not path.exists():
+				raise FileNotFoundError(
+					f"Specified path '{path!s}' for '{arg_name}' of repo '{target_path!s}' does not exist !"
+				)
+			paths[arg_name] = path
+
+		year_cache_path = repo_entry.get("year_cache_path")
+		year_map_path = repo_entry.get("year_map_path", defaults.year_map_path)
+		out.append(
+			RepoConfig(
+				target_path=target_path,
+				disclaimer_mode=repo_entry.get("disclaimer_mode", defaults.disclaimer_mode),
+				year_cache_path=(
+					None if year_cache_path is None else target_path.joinpath(year_cache_path)
+				),
+				year_providers=tuple(repo_entry.get("year_providers", defaults.year_providers)),
+				year_map_path=None if year_map_path is None else target_path.joinpath(year_map_path),
+				default_year=repo_entry.get("default_year", defaults.default_year),
+				skip_shallow_history=bool(
+					repo_entry.get("skip_shallow_history", defaults.skip_shallow_history)
+				),
+				**paths,
+			)
+		)
+
+	return out
@@ -0,0 +1,293 @@
+"""
+Run the updates on all repositories of a batch, with a single shared worker pool.
+
+The main process walks each repository, and splits its files in chunks sent to the pool.
+Each worker loads the configs of the repository a chunk belongs to (only when it changes).
+Git commands always run from the processed file's directory: no `chdir` is needed.
+"""
+# pylint: disable=locally-disabled, unspecified-encoding, global-statement
+
+# Imports
+import json
+import logging
+import subprocess
+from argparse import Namespace
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from traceback import format_exc
+from typing import Dict, List, Optional, Tuple, Union
+
+import config_cache
+import content_updates
+import file_walk
+import git_plumbing
+import language_support
+import progress_reporting
+from batch_mode.manifest import RepoConfig
+
+# Globals
+# Number of files sent to a worker at once
+CHUNK_SIZE = 64
+
+# Repository whose configs are currently loaded in this process
+CURRENT_REPO: Optional[RepoConfig] = None
+# State of its config files and HEAD when they were loaded, see get_repo_stamp()
+CURRENT_STAMP: Optional[tuple] = None
+
+# (modified files, errors, creation years computed by the worker)
+ChunkResult = Tuple[List[str], List[Tuple[str, str, str]], Dict[str, int]]
+
+
+@dataclass
+class RepoResult:
+	"""Results of a batch run for one repository."""
+
+	target_path: str
+	n_files: int = 0
+	modified: List[str] = field(default_factory=list)
+	# (path, exception, traceback)
+	errors: List[Tuple[str, str, str]] = field(default_factory=list)
+
+
+def init_worker(args: Namespace) -> None:
+	"""Apply the global (non repository specific) settings in a worker process."""
+	level = (
+		logging.DEBUG
+		if args.verbose
+		else (logging.WARNING if args.quiet else logging.INFO)
+	)
+	logging.basicConfig(format="[%(relativeCreated)d ms] %(message)s", level=level)
+
+	config_cache.set_config_cache_dir(
+		None if args.no_config_cache else args.config_cache_dir
+	)
+	language_support.set_inner_pad(args.padding)
+	language_support.set_scan_window(
+		args.scan_window_lines or None, args.scan_window_size or None
+	)
+	content_updates.set_whitespace_surround(args.whitespace_surround)
+	content_updates.set_safe_writes(args.safe_writes)
+
+
+def get_repo_stamp(repo_config: RepoConfig) -> tuple:
+	"""
+	Get the state of a repository's config files (modification time and size) and of its HEAD.
+	The configs loaded for the repository are stale when it changes: a file was edited,
+	or a commit was made (the creation years looked up in the history are then out-of-date).
+	"""
+	stamp: list = []
+	for path in (
+		repo_config.languages_path,
+		repo_config.excludes_path,
+		repo_config.disclaimer_path,
+		repo_config.year_map_path,
+	):
+		try:
+			stat = path.stat()  # type: ignore[union-attr]
+			stamp.append((stat.st_mtime_ns, stat.st_size))
+		except (AttributeError, OSError):
+			# No such file
+			stamp.append(None)
+
+	target_dir = repo_config.target_path
+	if not target_dir.is_dir():
+		target_dir = target_dir.parent
+	try:
+		stamp.append(git_plumbing.run_git(target_dir, "rev-parse", "-q", "--verify", "HEAD"))
+	except subprocess.CalledProcessError:
+		# Not a repository, or no commit yet
+		stamp.append(None)
+
+	return tuple(stamp)
+
+
+def configure_repo(
+	repo_config: RepoConfig, use_year_cache: bool, check_changes: bool = False
+) -> None:
+	"""
+	Load the configs of the given repository in this process, unless they already are.
+
+	Args:
+		repo_config (RepoConfig): The repository to load the configs of.
+		use_year_cache (bool): Whether to load the repository's year cache.
+		check_changes (bool, optional): Also reload the configs if the repository changed since
+			they were loaded, see get_repo_stamp(). For long-running processes. Defaults to False.
+	"""
+	global CURRENT_REPO, CURRENT_STAMP
+	stamp = get_repo_stamp(repo_config) if check_changes else None
+	if CURRENT_REPO == repo_config and (not check_changes or CURRENT_STAMP == stamp):
+		return
+
+	logging.debug("Loading configs for %s", str(repo_config.target_path))
+	language_support.load_languages(repo_config.languages_path, force_reload=True)
+	file_walk.get_exclude_patterns(repo_config.excludes_path, force_reload=True)
+	if repo_config.disclaimer_mode in ("always", "config"):
+		content_updates.get_disclaimer_text(repo_config.disclaimer_path, force_reload=True)
+
+	if use_year_cache:
+		content_updates.load_year_cache(repo_config.target_path, repo_config.year_cache_path)
+	content_updates.set_year_provider(
+		content_updates.make_year_provider(
+			repo_config.year_providers,
+			repo_config.target_path,
+			repo_config.year_map_path,
+			repo_config.default_year,
+			skip_shallow_history=repo_config.skip_shallow_history,
+		)
+	)
+
+	CURRENT_REPO = repo_config
+	CURRENT_STAMP = stamp
+
+
+def process_chunk(
+	repo_config: RepoConfig,
+	chunk: List[content_updates.FileGroup],
+	dry_run: bool,
+	use_year_cache: bool,
+) -> ChunkResult:
+	"""Process a chunk of file groups from a repository. Runs in the worker processes."""
+	configure_repo(repo_config, use_year_cache)
+	content_updates.add_creation_year_candidates(group.path for group in chunk)
+
+	modified = []
+	errors = []
+	for group in chunk:
+		path_str = str(group.path.relative_to(repo_config.target_path))
+		logging.debug("====Processing file %s ====", path_str)
+		try:
+			if content_updates.process_group(group, dry_run):
+				modified.extend(
+					str(path.relative_to(repo_config.target_path)) for path in group.paths
+				)
+		# pylint: disable-next=broad-exception-caught
+		except Exception as exc:
+			logging.error("Error while processing %s !: %s", path_str, exc)
+			# Exceptions might not be picklable: send them back as text
+			traceback = format_exc()
+			errors.extend(
+				(str(path.relative_to(repo_config.target_path)), repr(exc), traceback)
+				for path in group.paths
+			)
+
+	# Send the newly computed creation years back, for the main process to save them
+	new_years: Dict[str, int] = {}
+	year_cache = content_updates.get_year_cache() if use_year_cache else None
+	if year_cache is not None:
+		new_years = year_cache.new_years
+		year_cache.new_years = {}
+
+	return modified, errors, new_years
+
+
+def run_batch(
+	repos: List[RepoConfig],
+	args: Namespace,
+	repo_files: Optional[List[List[Tuple[Path, bool]]]] = None,
+) -> List[RepoResult]:
+	"""
+	Process all files of all the given repositories, with a shared pool of args.jobs workers.
+	Errors are collected per repository, they never stop the batch.
+
+	Args:
+		repos (List[RepoConfig]): Repositories to process.
+		args (Namespace): Parsed command-line arguments.
+		repo_files (List[List[Tuple[Path, bool]]], optional): Files to process in each repository
+			(with do_disclaimer), in the same order as repos. By default, repositories are walked.
+
+	Returns:
+		RESULTS (List[RepoResult]): Results for each repository, in the same order as repos.
+	"""
+	use_year_cache = not args.no_year_cache
+	results = []
+	year_caches = {}
+	# (repository result, repository config, number of files in the chunk, chunk result)
+	futures: List[Tuple[RepoResult, RepoConfig, int, Future]] = []
+	progress = progress_reporting.ProgressReporter(interval=args.progress_interval)
+
+	with ProcessPoolExecutor(
+		max_workers=args.jobs, initializer=init_worker, initargs=(args,)
+	) as pool:
+		for repo_index, repo_config in enumerate(repos):
+			result = RepoResult(str(repo_config.target_path))
+			results.append(result)
+
+			logging.info("Locating files to update in %s...", str(repo_config.target_path))
+			try:
+				configure_repo(repo_config, use_year_cache)
+				year_cache = content_updates.get_year_cache() if use_year_cache else None
+				if year_cache is not None:
+					year_caches[repo_config] = year_cache
+					if not args.dry_run:
+						# Save the cache brought up-to-date with HEAD: workers load it as is
+						year_cache.save()
+
+				if repo_files is not None:
+					to_update = repo_files[repo_index]
+				else:
+					to_update = list(
+						file_walk.get_relevant_files(
+							repo_config.target_path, repo_config.disclaimer_mode
+						)
+					)
+				# Paths to the same file must be in the same chunk: it is only written once
+				groups = content_updates.group_files(to_update, args.dedup_content)
+			# pylint: disable-next=broad-exception-caught
+			except Exception as exc:
+				logging.error("Error while preparing %s !: %s", result.target_path, exc)
+				result.errors.append((".", repr(exc), format_exc()))
+				continue
+
+			result.n_files = len(to_update)
+			progress.add_total(len(to_update))
+			for i in range(0, len(groups), CHUNK_SIZE):
+				chunk = groups[i : i + CHUNK_SIZE]
+				futures.append(
+					(
+						result,
+						repo_config,
+						sum(len(group.paths) for group in chunk),
+						pool.submit(
+							process_chunk,
+							repo_config,
+							chunk,
+							args.dry_run,
+							use_year_cache,
+						),
+					)
+				)
+
+		for result, repo_config, n_files, future in futures:
+			try:
+				modified, errors, new_years = future.result()
+			# pylint: disable-next=broad-exception-caught
+			except Exception as exc:
+				# The worker itself failed (ex: it was killed): the whole chunk is lost
+				result.errors.append(("<chunk>", repr(exc), format_exc()))
+				progress.add_done(errors=n_files)
+				continue
+
+			progress.add_done(
+				modified=len(modified),
+				skipped=n_files - len(modified) - len(errors),
+				errors=len(errors),
+			)
+			result.modified.extend(modified)
+			result.errors.extend(errors)
+			if repo_config in year_caches:
+				year_caches[repo_config].merge(new_years)
+
+	progress.finish()
+
+	if not args.dry_run:
+		for year_cache in year_caches.values():
+			year_cache.save()
+
+	return results
+
+
+def write_batch_report(results: List[RepoResult], report_path: Union[str, Path]) -> None:
+	"""Write the per-repository results as a JSON file."""
+	with open(report_path, "w") as report_file:
+		json.dump([asdict(result) for result in results], report_file, indent=2)
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the parsing primitives, on pathological inputs of increasing size.
+
+Each benchmark is run for every size of the sweep, and the growth exponent of its run time
+is estimated (1.0 is linear, 2.0 is quadratic): accidental O(n²) behaviour shows up as numbers.
+Results are saved as JSON, and can be compared against a stored baseline with --baseline.
+
+Ex: python3 benchmarks/micro_benchmarks.py -o results.json --baseline baseline.json
+"""
+# pylint: disable=locally-disabled, unspecified-encoding, wrong-import-position
+
+# Imports
+import json
+import logging
+import platform
+import sys
+from argparse import ArgumentParser, Namespace
+from dataclasses import dataclass
+from math import log
+from pathlib import Path
+from sys import exit as s_exit
+from timeit import Timer
+from typing import Callable, Dict, List
+
+# The packages are imported as top-level names, like in update_copyright_headers.py
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+from content_updates.copyright_disclaimer.extract_disclaimer import (
+	block_score,
+	locate_disclaimer,
+)
+from content_updates.copyright_header.extract_header import locate_header
+from content_updates.copyright_header.insert_header import get_header_insert_line
+from content_updates.utils import whitespace_surround
+from language_support import CommentBlock, Language, get_commented_blocks
+
+# Globals
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+# Growth exponents above this are reported as suspicious
+DEFAULT_MAX_EXPONENT = 1.5
+
+# Relative slowdown allowed when comparing against a baseline
+DEFAULT_TOLERANCE = 0.5
+
+JS = Language("JavaScript", "//", "/*", "*/", extensions={".js"})
+XML = Language("XML", "<!--", "<!--", "-->", "-->", extensions={".xml"})
+YAML = Language("YAML", "#", extensions={".yml"})
+
+HEADER_LINE = "// Copyright (c) 2023 Advanced ABC, Inc. All rights reserved.\n"
+
+
+@dataclass
+class Benchmark:
+	"""A primitive to time, and how to build its pathological input for a given size."""
+
+	name: str
+	# Builds the input lines for the given size (number of lines, or characters for one-liners)
+	make_input: Callable[[int], List[str]]
+	# Runs the primitive on the input lines
+	run: Callable[[List[str]], object]
+
+
+# Pathological inputs
+def comment_run(size: int) -> List[str]:
+	"""A single huge block of single-line comments."""
+	return ["// Lorem ipsum dolor sit amet, consectetur adipiscing elit.\n"] * size
+
+
+def unterminated_multiline(size: int) -> List[str]:
+	"""A multiline comment which is never closed."""
+	return ["/*\n"] + [" Lorem ipsum dolor sit amet, consectetur adipiscing elit.\n"] * size
+
+
+def minified_js(size: int) -> List[str]:
+	"""A single line of size characters, like minified javascript."""
+	return ["var a=1;" * (size // 8) + "\n"]
+
+
+def xml_without_declaration(size: int) -> List[str]:
+	"""XML with no format declaration ('?>'): its search goes through the whole file."""
+	return ["<item><name>value</name></item>\n"] * size
+
+
+def yaml_without_document_start(size: int) -> List[str]:
+	"""YAML with no document start marker ('---'): its search goes through the whole file."""
+	return ["key: value\n"] * size
+
+
+def uncommented_code(size: int) -> List[str]:
+	"""Code with no comments at all, and a short comment at the top for the header search."""
+	return ["// Short comment\n"] + ["var a = 1;\n"] * size
+
+
+def header_then_blank_lines(size: int) -> List[str]:
+	"""An existing header, followed by a run of blank lines: searches for a second header cross it."""
+	return [HEADER_LINE] + ["\n"] * size + ["var a = 1;\n"]
+
+
+def header_then_code(size: int) -> List[str]:
+	"""An existing header, followed by a long body of code: searches for a second header cross it."""
+	return [HEADER_LINE, "\n"] + ["var a = 1;\n"] * size
+
+
+def surround_first_line(text_lines: List[str]) -> None:
+	"""Surround the first line with blank lines: inserts at the start of a (copied) list."""
+	whitespace_surround(list(text_lines), 1, 1)
+
+
+BENCHMARKS = [
+	Benchmark("get_commented_blocks/comment_run", comment_run, lambda t: get_commented_blocks(t, JS)),
+	Benchmark(
+		"get_commented_blocks/unterminated_multiline",
+		unterminated_multiline,
+		lambda t: get_commented_blocks(t, JS),
+	),
+	Benchmark("get_commented_blocks/minified_js", minified_js, lambda t: get_commented_blocks(t, JS)),
+	Benchmark("locate_header/comment_run", comment_run, lambda t: locate_header(t, JS)),
+	Benchmark(
+		"locate_header/unterminated_multiline",
+		unterminated_multiline,
+		lambda t: locate_header(t, JS),
+	),
+	Benchmark("locate_header/minified_js", minified_js, lambda t: locate_header(t, JS)),
+	Benchmark("locate_header/uncommented_code", uncommented_code, lambda t: locate_header(t, JS)),
+	Benchmark(
+		"locate_header/header_then_blank_lines",
+		header_then_blank_lines,
+		lambda t: locate_header(t, JS),
+	),
+	Benchmark("locate_header/header_then_code", header_then_code, lambda t: locate_header(t, JS)),
+	Benchmark(
+		"block_score/comment_run",
+		comment_run,
+		lambda t: block_score(CommentBlock(t, 0, len(t) - 1, False)),
+	),
+	Benchmark("locate_disclaimer/comment_run", comment_run, lambda t: locate_disclaimer(t, JS)),
+	Benchmark(
+		"locate_disclaimer/unterminated_multiline",
+		unterminated_multiline,
+		lambda t: locate_disclaimer(t, JS),
+	),
+	Benchmark(
+		"get_header_insert_line/xml_without_declaration",
+		xml_without_declaration,
+		lambda t: get_header_insert_line(t, XML),
+	),
+	Benchmark(
+		"get_header_insert_line/yaml_without_document_start",
+		yaml_without_document_start,
+		lambda t: get_header_insert_line(t, YAML),
+	),
+	Benchmark("whitespace_surround/first_line", uncommented_code, surround_first_line),
+]
+
+
+# Helper functions
+def time_benchmark(benchmark: Benchmark, size: int, repeat: int) -> float:
+	"""Returns the best run time of the benchmark for the given size, in seconds."""
+	text_lines = benchmark.make_input(size)
+	return min(Timer(lambda: benchmark.run(text_lines)).repeat(repeat=repeat, number=1))
+
+
+def growth_exponent(timings: Dict[str, float]) -> float:
+	"""
+	Estimate the exponent k of the run time, assuming time ~ size^k,
+	from the smallest and largest sizes of the sweep.
+	"""
+	sizes = sorted(timings, key=int)
+	small, large = sizes[0], sizes[-1]
+	if small == large or timings[small] <= 0:
+		return 0.0
+
+	return log(timings[large] / timings[small]) / log(int(large) / int(small))
+
+
+def compare_to_baseline(
+	results: Dict[str, Dict[str, float]],
+	baseline: Dict[str, Dict[str, float]],
+	tolerance: float,
+) -> List[str]:
+	"""Returns a description of each timing slower than its baseline by more than tolerance."""
+	regressions = []
+	for name, timings in results.items():
+		for size, seconds in timings.items():
+			baseline_seconds = baseline.get(name, {}).get(size)
+			if baseline_seconds is None or baseline_seconds <= 0:
+				continue
+
+			ratio = seconds / baseline_seconds
+			if ratio > 1 + tolerance:
+				regressions.append(
+					f"{name} (size {size}): {seconds * 1000:.2f} ms, "
+					f"{ratio:.2f}x the baseline ({baseline_seconds * 1000:.2f} ms)"
+				)
+
+	return regressions
+
+
+# Main functions
+def parse_arguments() -> Namespace:
+	"""Parse and Validate command-line arguments"""
+	parser = ArgumentParser(description=__doc__)
+	parser.add_argument(
+		"-s",
+		"--sizes",
+		help="Comma-separated input sizes of the sweep.",
+		type=lambda value: [int(size) for size in value.split(",")],
+		default=DEFAULT_SIZES,
+	)
+	parser.add_argument(
+		"-r",
+		"--repeat",
+		help="Number of runs per benchmark and size: the best one is kept.",
+		type=int,
+		default=5,
+	)
+	parser.add_argument(
+		"-f",
+		"--filter",
+		help="Only run benchmarks whose name contains this string.",
+		default="",
+	)
+	parser.add_argument(
+		"-o",
+		"--output",
+		help="Path to the JSON file where results are written.",
+		type=Path,
+		default=None,
+	)
+	parser.add_argument(
+		"--baseline",
+		help="Path to results of a previous run (JSON) to compare against.",
+		type=Path,
+		default=None,
+	)
+	parser.add_argument(
+		"--tolerance",
+		help="Relative slowdown allowed compared to the baseline (0.5 = 50%% slower).",
+		type=float,
+		default=DEFAULT_TOLERANCE,
+	)
+	parser.add_argument(
+		"--max_exponent",
+		help="Growth exponents above this value are reported as errors (2.0 = quadratic).",
+		type=float,
+		default=DEFAULT_MAX_EXPONENT,
+	)
+
+	out = parser.parse_args()
+
+	if out.repeat < 1:
+		raise ValueError("'repeat' must be at least 1 !")
+
+	if out.baseline is not None and not out.baseline.exists():
+		raise FileNotFoundError(f"Specified baseline '{out.baseline!s}' does not exist !")
+
+	return out
+
+
+def main() -> int:
+	"""Main function"""
+	logging.basicConfig(format="%(message)s", level=logging.INFO)
+	args = parse_arguments()
+
+	results: Dict[str, Dict[str, float]] = {}
+	exponents: Dict[str, float] = {}
+	for benchmark in BENCHMARKS:
+		if args.filter not in benchmark.name:
+			continue
+
+		# JSON keys are strings: use them from the start to compare with loaded baselines
+		timings = {
+			str(size): time_benchmark(benchmark, size, args.repeat) for size in args.sizes
+		}
+		results[benchmark.name] = timings
+		exponents[benchmark.name] = growth_exponent(timings)
+
+		logging.info(
+			"%-52s %s  (exponent: %.2f)",
+			benchmark.name,
+			"  ".join(f"{size}: {seconds * 1000:9.3f} ms" for size, seconds in timings.items()),
+			exponents[benchmark.name],
+		)
+
+	failed = False
+	for name, exponent in exponents.items():
+		if exponent > args.max_exponent:
+			logging.error("%s grows faster than expected: exponent %.2f !", name, exponent)
+			failed = True
+
+	if args.baseline is not None:
+		with open(args.baseline) as baseline_file:
+			baseline = json.load(baseline_file)["results"]
+
+		regressions = compare_to_baseline(results, baseline, args.tolerance)
+		for regression in regressions:
+			logging.error("Regression: %s", regression)
+		failed = failed or bool(regressions)
+
+	if args.output is not None:
+		with open(args.output, "w") as output_file:
+			json.dump(
+				{
+					"python": platform.python_version(),
+					"platform": platform.platform(),
+					"sizes": args.sizes,
+					"repeat": args.repeat,
+					"results": results,
+					"exponents": exponents,
+				},
+				output_file,
+				indent=2,
+			)
+
+	return 1 if failed else 0
+
+
+if __name__ == "__main__":
+	s_exit(main())
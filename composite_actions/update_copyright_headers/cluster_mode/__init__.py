@@ -0,0 +1,15 @@
+"""
+Cluster mode: a coordinator serves work units (chunks of directories) over a TCP or Unix socket,
+and workers, possibly on other hosts sharing the filesystem, pull and process them.
+Work is pulled dynamically: fast workers get more units, and units of lost workers are reassigned.
+"""
+from cluster_mode.coordinator import (
+	DEFAULT_UNIT_TIMEOUT,
+	DISCONNECT_DELAY,
+	UNIT_SIZE,
+	Coordinator,
+	WorkUnit,
+	make_units,
+	parse_address,
+)
+from cluster_mode.worker import run_worker
@@ -0,0 +1,292 @@
+"""
+Cluster coordinator: split the files to update in work units, and serve them to workers.
+
+Units are chunks of directories (see make_units()). Workers pull them one at a time, so fast
+workers get more of them. The connection is a multiprocessing.connection (TCP or Unix socket,
+authenticated with a shared key), and messages are pickled tuples:
+- worker -> coordinator: ("hello", worker_name), ("request",),
+	("result", unit_id, modified, errors, new_years)
+- coordinator -> worker: ("config", session, dry_run), ("unit", unit_id, groups),
+	("wait",) when all remaining units are assigned, ("done",) when all units are done.
+
+A unit is assigned again when its worker disconnects (or dies) before sending its result,
+or does not send it within the unit timeout. Only the first result of a unit is kept.
+"""
+
+# Imports
+import logging
+from collections import deque
+from dataclasses import dataclass
+from multiprocessing.connection import Connection, Listener
+from pathlib import Path
+from threading import Condition, Thread
+from time import monotonic
+from traceback import format_exc
+from typing import Deque, Dict, List, Tuple, Union
+
+import content_updates
+import progress_reporting
+from batch_mode import RepoResult
+from server_mode import SessionConfig
+
+# Globals
+# Default number of file groups in a unit
+UNIT_SIZE = 64
+
+# Default number of seconds a worker has to process a unit, before it is assigned to another one
+DEFAULT_UNIT_TIMEOUT = 600.0
+
+# Number of times a unit is assigned before it is reported as failed
+MAX_ATTEMPTS = 3
+
+# Seconds connected workers are given to receive ("done",), once all units are done
+DISCONNECT_DELAY = 2.0
+
+Address = Union[str, Tuple[str, int]]
+
+
+@dataclass
+class WorkUnit:
+	"""File groups processed by a worker at once."""
+
+	unit_id: int
+	groups: List[content_updates.FileGroup]
+	attempts: int = 0
+
+	@property
+	def n_files(self) -> int:
+		"""Number of paths in the unit."""
+		return sum(len(group.paths) for group in self.groups)
+
+
+def parse_address(address: str) -> Address:
+	"""
+	Parse a cluster address: "host:port" for TCP, anything else is the path of a Unix socket.
+	Ex: "0.0.0.0:7777", "build-host-1:7777", "/tmp/copyright.sock"
+	"""
+	host, _, port = address.rpartition(":")
+	if host and port.isdigit() and "/" not in address:
+		return host, int(port)
+	return str(Path(address).absolute())
+
+
+def make_units(
+	groups: List[content_updates.FileGroup], unit_size: int = UNIT_SIZE
+) -> List[WorkUnit]:
+	"""
+	Split file groups in work units of at most unit_size groups, keeping directories together:
+	small directories are packed in the same unit, large ones are split over several units.
+	"""
+	by_dir: Dict[Path, List[content_updates.FileGroup]] = {}
+	for group in groups:
+		by_dir.setdefault(group.path.parent, []).append(group)
+
+	units_groups: List[List[content_updates.FileGroup]] = []
+	current: List[content_updates.FileGroup] = []
+	for dir_groups in by_dir.values():
+		for i in range(0, len(dir_groups), unit_size):
+			piece = dir_groups[i : i + unit_size]
+			if current and len(current) + len(piece) > unit_size:
+				units_groups.append(current)
+				current = []
+			current.extend(piece)
+	if current:
+		units_groups.append(current)
+
+	return [WorkUnit(unit_id, unit_groups) for unit_id, unit_groups in enumerate(units_groups)]
+
+
+class Coordinator:
+	"""Serve work units to the workers, and collect their results."""
+
+	def __init__(
+		self,
+		session: SessionConfig,
+		units: List[WorkUnit],
+		dry_run: bool,
+		unit_timeout: float = DEFAULT_UNIT_TIMEOUT,
+		progress: Union[None, progress_reporting.ProgressReporter] = None,
+	) -> None:
+		"""
+		Args:
+			session (SessionConfig): Configuration sent to the workers.
+			units (List[WorkUnit]): Work units to process.
+			dry_run (bool): Whether the workers should only report the files they would modify.
+			unit_timeout (float, optional): Seconds a worker has to process a unit.
+				Defaults to DEFAULT_UNIT_TIMEOUT.
+			progress (ProgressReporter, optional): Where processed files are counted.
+		"""
+		self.session = session
+		self.units = {unit.unit_id: unit for unit in units}
+		self.dry_run = dry_run
+		self.unit_timeout = unit_timeout
+		self.progress = progress
+
+		self.result = RepoResult(str(session.repo.target_path))
+		self.result.n_files = sum(unit.n_files for unit in units)
+
+		# All the state below is protected by the condition's lock
+		self.condition = Condition()
+		self.pending: Deque[int] = deque(self.units)
+		# unit_id -> (worker name, deadline)
+		self.assigned: Dict[int, Tuple[str, float]] = {}
+		self.n_done = 0
+		self.n_connected = 0
+
+	@property
+	def finished(self) -> bool:
+		"""Whether all units are done (or failed)."""
+		return self.n_done == len(self.units)
+
+	def requeue(self, unit_id: int, reason: str) -> None:
+		"""Put an assigned unit back in the queue, or fail it after MAX_ATTEMPTS. Needs the lock."""
+		worker_name, _ = self.assigned.pop(unit_id)
+		unit = self.units[unit_id]
+		if unit.attempts < MAX_ATTEMPTS:
+			logging.warning("Unit %s of %s %s: assigning it again", unit_id, worker_name, reason)
+			# Retry it first: its files are probably the last ones left in their directories
+			self.pending.appendleft(unit_id)
+			return
+
+		logging.error("Unit %s %s %s times: giving up on it", unit_id, reason, unit.attempts)
+		error = f"Work unit failed: its worker {reason} {unit.attempts} times"
+		target_path = self.session.repo.target_path
+		self.result.errors.extend(
+			(str(path.relative_to(target_path)), error, "")
+			for group in unit.groups
+			for path in group.paths
+		)
+		if self.progress is not None:
+			self.progress.add_done(errors=unit.n_files)
+		self.n_done += 1
+		self.condition.notify_all()
+
+	def requeue_expired(self) -> None:
+		"""Requeue the units whose worker is past its deadline. Needs the lock."""
+		now = monotonic()
+		for unit_id, (_, deadline) in list(self.assigned.items()):
+			if deadline < now:
+				self.requeue(unit_id, "timed out")
+
+	def next_message(self, worker_name: str) -> tuple:
+		"""Answer a worker's request: a unit to process, ("wait",) or ("done",)."""
+		with self.condition:
+			self.requeue_expired()
+			if self.pending:
+				unit_id = self.pending.popleft()
+				unit = self.units[unit_id]
+				unit.attempts += 1
+				self.assigned[unit_id] = (worker_name, monotonic() + self.unit_timeout)
+				logging.debug("Unit %s (%s files) -> %s", unit_id, unit.n_files, worker_name)
+				return ("unit", unit_id, unit.groups)
+			if self.assigned:
+				return ("wait",)
+			return ("done",)
+
+	def add_result(
+		self,
+		unit_id: int,
+		modified: List[str],
+		errors: List[Tuple[str, str, str]],
+		new_years: Dict[str, int],
+	) -> None:
+		"""Record the result of a unit. Results of units which are not assigned are ignored."""
+		with self.condition:
+			if self.assigned.pop(unit_id, None) is None:
+				logging.debug("Ignoring a late result for unit %s", unit_id)
+				return
+
+			self.result.modified.extend(modified)
+			self.result.errors.extend(errors)
+			year_cache = content_updates.get_year_cache() if self.session.use_year_cache else None
+			if year_cache is not None:
+				year_cache.merge(new_years)
+
+			if self.progress is not None:
+				n_files = self.units[unit_id].n_files
+				self.progress.add_done(
+					modified=len(modified),
+					skipped=n_files - len(modified) - len(errors),
+					errors=len(errors),
+				)
+			self.n_done += 1
+			self.condition.notify_all()
+
+	def handle_worker(self, connection: Connection) -> None:
+		"""Serve units to a connected worker, until all are done or the worker is lost."""
+		worker_name = "<unknown>"
+		with self.condition:
+			self.n_connected += 1
+		try:
+			_, worker_name = connection.recv()
+			logging.info("Worker %s connected", worker_name)
+			connection.send(("config", self.session, self.dry_run))
+
+			while True:
+				message = connection.recv()
+				if message[0] == "result":
+					self.add_result(*message[1:])
+					continue
+
+				answer = self.next_message(worker_name)
+				connection.send(answer)
+				if answer[0] == "done":
+					break
+		except (EOFError, OSError) as exc:
+			logging.warning("Lost worker %s: %r", worker_name, exc)
+		# pylint: disable-next=broad-exception-caught
+		except Exception as exc:
+			logging.error("Error with worker %s !: %s\n%s", worker_name, exc, format_exc())
+		finally:
+			connection.close()
+			with self.condition:
+				for unit_id, (assignee, _) in list(self.assigned.items()):
+					if assignee == worker_name:
+						self.requeue(unit_id, "was lost")
+				self.n_connected -= 1
+				self.condition.notify_all()
+
+	def accept_workers(self, listener: Listener) -> None:
+		"""Accept worker connections, each served by its own thread."""
+		while True:
+			try:
+				connection = listener.accept()
+			except OSError:
+				# The listener was closed
+				return
+			# pylint: disable-next=broad-exception-caught
+			except Exception as exc:
+				# Ex: AuthenticationError, for a client with another key
+				logging.warning("Rejected a connection: %r", exc)
+				continue
+			Thread(target=self.handle_worker, args=(connection,), daemon=True).start()
+
+	def run(self, address: Address, authkey: bytes) -> RepoResult:
+		"""
+		Serve the units on the given address until they are all done.
+
+		Args:
+			address (Address): Address to listen on, see parse_address().
+			authkey (bytes): Shared secret of the cluster: workers must use the same one.
+
+		Returns:
+			RESULT (RepoResult): Modified files and errors of all units.
+		"""
+		with Listener(address, authkey=authkey) as listener:
+			logging.info(
+				"Serving %s units (%s files) on %s", len(self.units), self.result.n_files, address
+			)
+			Thread(target=self.accept_workers, args=(listener,), daemon=True).start()
+
+			with self.condition:
+				while not self.finished:
+					# Wake up regularly to check the deadlines, even if no worker asks for a unit
+					self.condition.wait(timeout=1.0)
+					self.requeue_expired()
+
+				# Let the connected workers ask once more, to receive ("done",)
+				deadline = monotonic() + DISCONNECT_DELAY
+				while self.n_connected and monotonic() < deadline:
+					self.condition.wait(timeout=deadline - monotonic())
+
+		return self.result
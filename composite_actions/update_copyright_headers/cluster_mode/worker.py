@@ -0,0 +1,103 @@
+"""
+Cluster worker: pull work units from the coordinator, process them, and send the results back.
+See coordinator.py for the protocol.
+"""
+
+# Imports
+import logging
+import socket
+from multiprocessing.connection import Client, Connection
+from multiprocessing.synchronize import Event
+from os import getpid
+from time import monotonic, sleep
+from typing import Optional
+
+from batch_mode import process_chunk
+from cluster_mode.coordinator import Address
+from server_mode import activate_session
+
+# Globals
+# Seconds to wait before asking again, when all remaining units are assigned to other workers
+WAIT_DELAY = 0.5
+
+# Default number of seconds to wait for the coordinator to be listening
+DEFAULT_CONNECT_TIMEOUT = 30.0
+
+
+def connect(
+	address: Address, authkey: bytes, timeout: float, stop: Optional[Event] = None
+) -> Optional[Connection]:
+	"""
+	Connect to the coordinator, retrying until it listens or the timeout elapses.
+	Returns None if stop is set first: the coordinator is done, there is nothing left to process.
+	"""
+	deadline = monotonic() + timeout
+	while stop is None or not stop.is_set():
+		try:
+			return Client(address, authkey=authkey)
+		except (FileNotFoundError, ConnectionRefusedError):
+			if monotonic() > deadline:
+				raise
+			if stop is None:
+				sleep(WAIT_DELAY)
+			else:
+				stop.wait(WAIT_DELAY)
+
+	return None
+
+
+def run_worker(
+	address: Address,
+	authkey: bytes,
+	connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+	stop: Optional[Event] = None,
+) -> int:
+	"""
+	Process work units from the coordinator at the given address, until there are none left.
+
+	Args:
+		address (Address): Address of the coordinator, see parse_address().
+		authkey (bytes): Shared secret of the cluster.
+		connect_timeout (float, optional): Seconds to wait for the coordinator to be listening.
+			Defaults to DEFAULT_CONNECT_TIMEOUT.
+		stop (Event, optional): Set by the coordinator of local workers once all units are done:
+			workers which are not connected yet stop trying to.
+
+	Returns:
+		EXIT_CODE (int): 0 once all units are done, 1 if the coordinator was lost.
+	"""
+	worker_name = f"{socket.gethostname()}:{getpid()}"
+	n_units = 0
+	connection = connect(address, authkey, connect_timeout, stop)
+	if connection is None:
+		logging.info("Worker %s: all units were done before it connected", worker_name)
+		return 0
+
+	with connection:
+		try:
+			connection.send(("hello", worker_name))
+			_, session, dry_run = connection.recv()
+			activate_session(session)
+			logging.info("Worker %s connected to %s", worker_name, address)
+
+			while True:
+				connection.send(("request",))
+				message = connection.recv()
+				if message[0] == "done":
+					break
+				if message[0] == "wait":
+					sleep(WAIT_DELAY)
+					continue
+
+				_, unit_id, groups = message
+				modified, errors, new_years = process_chunk(
+					session.repo, groups, dry_run, session.use_year_cache
+				)
+				connection.send(("result", unit_id, modified, errors, new_years))
+				n_units += 1
+		except (EOFError, OSError) as exc:
+			logging.error("Worker %s lost the coordinator !: %r", worker_name, exc)
+			return 1
+
+	logging.info("Worker %s done: processed %s units", worker_name, n_units)
+	return 0
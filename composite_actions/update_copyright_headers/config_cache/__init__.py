@@ -0,0 +1,9 @@
+"""
+Cache parsed config files in a serialized form, keyed by the hash of their content.
+Warm invocations can then skip parsing (and importing the parsers) entirely.
+"""
+from config_cache.cache import (
+	DEFAULT_CONFIG_CACHE_DIR,
+	load_cached_config,
+	set_config_cache_dir,
+)
@@ -0,0 +1,82 @@
+"""Serialized config cache, keyed by the content hash of the config files."""
+# pylint: disable=locally-disabled, global-statement
+
+# Imports
+import logging
+import pickle
+from hashlib import sha256
+from os import environ, getpid, replace
+from pathlib import Path
+from sys import version_info
+from typing import Callable, Optional, TypeVar, Union
+
+# Globals
+# Bump this whenever the structure of the cached objects changes
+CONFIG_CACHE_VERSION = 1
+
+DEFAULT_CONFIG_CACHE_DIR = Path(
+	environ.get("XDG_CACHE_HOME", Path.home().joinpath(".cache"))
+).joinpath("update_copyright_headers")
+
+CONFIG_CACHE_DIR: Optional[Path] = DEFAULT_CONFIG_CACHE_DIR
+
+ConfigType = TypeVar("ConfigType")
+
+
+def set_config_cache_dir(value: Optional[Union[str, Path]]) -> None:
+	"""Set the directory holding the cached configs. None disables the cache."""
+	global CONFIG_CACHE_DIR
+	CONFIG_CACHE_DIR = None if value is None else Path(value)
+
+
+def load_cached_config(
+	config_path: Union[str, Path], parse: Callable[[str], ConfigType]
+) -> ConfigType:
+	"""
+	Load a config file, using the cached parsed value if the file content did not change.
+
+	The cache key is the hash of the file content, along with the parse function name,
+	the python version and CONFIG_CACHE_VERSION: any change in those invalidates the cache.
+	Cache errors are never fatal, the file is simply parsed again.
+
+	Args:
+		config_path (Union[str, Path]): Path to the config file.
+		parse (Callable[[str], ConfigType]): Function parsing the file's text.
+
+	Returns:
+		CONFIG (ConfigType): The parsed config, as returned by `parse`.
+	"""
+	config_bytes = Path(config_path).read_bytes()
+
+	if CONFIG_CACHE_DIR is None:
+		return parse(config_bytes.decode())
+
+	key = sha256(config_bytes)
+	parse_name = f"{parse.__module__}.{parse.__qualname__}"
+	key.update(f"{parse_name}:{version_info[:2]}:{CONFIG_CACHE_VERSION}".encode())
+	cache_path = CONFIG_CACHE_DIR.joinpath(f"{parse.__name__}-{key.hexdigest()}.pickle")
+
+	try:
+		with open(cache_path, "rb") as cache_file:
+			config = pickle.load(cache_file)
+		logging.debug("Loaded %s from the config cache (%s)", str(config_path), cache_path)
+		return config
+	except FileNotFoundError:
+		pass
+	# pylint: disable-next=broad-exception-caught
+	except Exception as exc:
+		logging.debug("Ignoring unreadable config cache %s: %s", str(cache_path), exc)
+
+	config = parse(config_bytes.decode())
+
+	try:
+		CONFIG_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+		# Write atomically: concurrent runs might be reading the same cache file
+		tmp_path = cache_path.with_name(f"{cache_path.name}.{getpid()}.tmp")
+		with open(tmp_path, "wb") as cache_file:
+			pickle.dump(config, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+		replace(tmp_path, cache_path)
+	except OSError as exc:
+		logging.debug("Could not write config cache %s: %s", str(cache_path), exc)
+
+	return config
@@ -1,12 +1,31 @@
-"""
-Contains all logic for updating the copyright headers / disclaimer on  a given file:
-- Updating the date
-- Adding the header without breaking the file
-- Adding the disclaimer if  needed 
-
-We always assume the copyright header is alone on its line (with the appropriate comment markers)
-"""
-
-from content_updates.config import set_whitespace_surround
-from content_updates.copyright_disclaimer import get_disclaimer_text
-from content_updates.process_file import process_file
+"""
+Contains all logic for updating the copyright headers / disclaimer on  a given file:
+- Updating the date
+- Adding the header without breaking the file
+- Adding the disclaimer if  needed 
+
+We always assume the copyright header is alone on its line (with the appropriate comment markers)
+"""
+
+from content_updates.config import set_rollover, set_safe_writes, set_whitespace_surround
+from content_updates.copyright_disclaimer import get_disclaimer_text
+from content_updates.copyright_header import (
+	PROVIDER_NAMES,
+	add_creation_year_candidates,
+	get_header_index,
+	get_year_cache,
+	load_header_index,
+	load_year_cache,
+	make_year_provider,
+	save_header_index,
+	save_year_cache,
+	set_year_provider,
+)
+from content_updates.dedup import FileGroup, group_files
+from content_updates.edit_buffer import EditBuffer
+from content_updates.process_file import (
+	get_updated_lines,
+	process_file,
+	process_group,
+	update_lines,
+)
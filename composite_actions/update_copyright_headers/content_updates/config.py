@@ -1,16 +1,38 @@
-"""
-Use separate file to avoid circular import issues.
-The setter and getter are needed as simply using the global does not work:
-its value is only passed on initial import, not on every access.
-"""
-DO_WHITESPACE_SURROUND: bool = False
-
-
-def set_whitespace_surround(value: bool):
-	# pylint: disable-next-global-statement
-	global DO_WHITESPACE_SURROUND
-	DO_WHITESPACE_SURROUND = value
-	
-	
-def do_whitespace_surround() -> bool:
-	return DO_WHITESPACE_SURROUND
+"""
+Use separate file to avoid circular import issues.
+The setter and getter are needed as simply using the global does not work:
+its value is only passed on initial import, not on every access.
+"""
+DO_WHITESPACE_SURROUND: bool = False
+DO_SAFE_WRITES: bool = False
+DO_ROLLOVER: bool = False
+
+
+def set_whitespace_surround(value: bool):
+	# pylint: disable-next-global-statement
+	global DO_WHITESPACE_SURROUND
+	DO_WHITESPACE_SURROUND = value
+
+
+def do_whitespace_surround() -> bool:
+	return DO_WHITESPACE_SURROUND
+
+
+def set_safe_writes(value: bool):
+	# pylint: disable-next-global-statement
+	global DO_SAFE_WRITES
+	DO_SAFE_WRITES = value
+
+
+def do_safe_writes() -> bool:
+	return DO_SAFE_WRITES
+
+
+def set_rollover(value: bool):
+	# pylint: disable-next-global-statement
+	global DO_ROLLOVER
+	DO_ROLLOVER = value
+
+
+def do_rollover() -> bool:
+	return DO_ROLLOVER
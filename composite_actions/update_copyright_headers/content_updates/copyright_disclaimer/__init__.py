@@ -1,6 +1,6 @@
-"""
-Update or add a new disclaimer to the input lines
-"""
-
-from content_updates.copyright_disclaimer.insert_disclaimer import get_disclaimer_text
-from content_updates.copyright_disclaimer.transform_disclaimer import process_disclaimer
+"""
+Update or add a new disclaimer to the input lines
+"""
+
+from content_updates.copyright_disclaimer.insert_disclaimer import get_disclaimer_text
+from content_updates.copyright_disclaimer.transform_disclaimer import process_disclaimer
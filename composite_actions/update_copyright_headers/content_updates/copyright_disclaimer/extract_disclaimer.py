@@ -1,104 +1,179 @@
-"""
-Check file to see if it contains a copyright disclaimer, and extract its position
-"""
-
-# Imports
-from math import sqrt
-from typing import List, Tuple, Union
-from language_support import Language, get_commented_blocks
-
-# Globals
-DISCLAIMER_BLOCK_SCORE_THRESH = 8.0
-
-def block_score(block: List[str]) -> float:
-	"""
-	Check the input block for telltale signs of a copyright disclaimer:
-	
-	- Minimum lenghth ( line count)
-	- Specific formatting: all lines have mostly the same length
-	- Must-have words: 'ABC' or 'Advanced ABC' or 'XYZ'
-	- Key words: 'copyright', 'disclaimer', 'intellectual property'...
-	- Key phrases: 'This copyright disclaimer', 'MADE AVAILABLE "AS IS"'...
-	
-	Using these, calculate a likelihood score for whether the block is a copyright disclaimer.
-	"""
-	
-	# Config
-	std_dev_coeff = -1
-	keyword_coeff = 2
-	key_phrase_coeff = 10
-	min_line_count = 10
-	
-	must_have_one = {"ABC", "XYZ", "Advanced ABC"}
-	keywords = {"copyright", "disclaimer", "intellectual property", "copyright notice"}
-	key_phrases = {
-		"MUST BE RETAINED AS PART OF THIS FILE",
-		"This file contains confidential and proprietary information",
-		'MADE AVAILABLE "AS IS"',
-	}
-	
-	res = 0.0
-	full_text = " ".join(line.strip() for line in block).lower()
-	
-	# Check for minimum line count
-	if len(block) < min_line_count:
-		return -float("inf")
-		
-	# Check for must haves
-	if not any(must_have.lower() in full_text for must_have in must_have_one):
-		return -float("inf")
-		
-	# Check for keywords
-	for keyword in keywords:
-		if keyword.lower() in full_text:
-			res += keyword_coeff
-		
-	# Check for key phrases
-	for key_phrase in key_phrases:
-		if key_phrase.lower() in full_text:
-			res += key_phrase_coeff
-			
-	# Calculate line length standard deviation
-	# Ignore very short lines (titles or empty lines)
-	lengths = [len(line) for line in block if len(line) > 20]
-	avg_length = sum(lengths) / len(lengths)
-	length_std_dev = sqrt(
-		sum((length - avg_length) ** 2 for length in lengths) / len(lengths)
-	)
-	
-	res += std_dev_coeff * length_std_dev
-	
-	return res
-	
-	
-def locate_disclaimer(
-	text: List[str], text_language: Language
-) -> Union[None, Tuple[int, int]]:
-	"""
-	Returns the start and end lines of the copyright disclaimer comment block.
-	If it is a multiline comment, we also include the multiline markers.
-	If no disclaimer exists, return None.
-	"""
-	
-	commented_blocks = get_commented_blocks(text, text_language)
-	block_scores = sorted(
-		[
-			(block_start, block_end, block_score(block_text), is_multiline)
-			for block_start, block_end, block_text, is_multiline in commented_blocks
-		],
-		key=lambda block: block[2],
-		reverse=True,
-	)
-	
-	# If no comment blocks were present, there is no copyright disclaimer
-	if not block_scores:
-		return None
-		
-	block_start, block_end, max_score, _ = block_scores[0]
-	
-	# If the highest-scoring block does not go over the threshold, consider there is no doisclaimer
-	if max_score < DISCLAIMER_BLOCK_SCORE_THRESH:
-		return None
-		
-	# Otherwise, we consider the highest-scoring block to be the disclaimer
-	return block_start, block_end
+"""
+Check file to see if it contains a copyright disclaimer, and extract its position
+"""
+
+# Imports
+from math import sqrt
+from typing import Optional, Sequence, Tuple, Union
+
+from content_updates.config import do_whitespace_surround
+from content_updates.copyright_disclaimer.insert_disclaimer import get_commented_disclaimer
+from content_updates.copyright_header.extract_header import locate_header
+from language_support import CommentBlock, Language, iter_commented_blocks
+
+# Globals
+DISCLAIMER_BLOCK_SCORE_THRESH = 8.0
+
+def block_score(block: CommentBlock) -> float:
+	"""
+	Check the input block for telltale signs of a copyright disclaimer:
+
+	- Minimum lenghth ( line count)
+	- Specific formatting: all lines have mostly the same length
+	- Must-have words: 'ABC' or 'Advanced ABC' or 'XYZ'
+	- Key words: 'copyright', 'disclaimer', 'intellectual property'...
+	- Key phrases: 'This copyright disclaimer', 'MADE AVAILABLE "AS IS"'...
+
+	Using these, calculate a likelihood score for whether the block is a copyright disclaimer.
+	"""
+
+	# Config
+	std_dev_coeff = -1
+	keyword_coeff = 2
+	key_phrase_coeff = 10
+	min_line_count = 10
+
+	must_have_one = {"ABC", "XYZ", "Advanced ABC"}
+	keywords = {"copyright", "disclaimer", "intellectual property", "copyright notice"}
+	key_phrases = {
+		"MUST BE RETAINED AS PART OF THIS FILE",
+		"This file contains confidential and proprietary information",
+		'MADE AVAILABLE "AS IS"',
+	}
+
+	res = 0.0
+
+	# Check for minimum line count
+	if len(block) < min_line_count:
+		return -float("inf")
+
+	# Only built for blocks long enough, and cached in the block
+	full_text = block.normalized_text
+
+	# Check for must haves
+	if not any(must_have.lower() in full_text for must_have in must_have_one):
+		return -float("inf")
+
+	# Check for keywords
+	for keyword in keywords:
+		if keyword.lower() in full_text:
+			res += keyword_coeff
+
+	# Check for key phrases
+	for key_phrase in key_phrases:
+		if key_phrase.lower() in full_text:
+			res += key_phrase_coeff
+
+	# Calculate line length standard deviation
+	# Ignore very short lines (titles or empty lines)
+	lengths = [len(line) for line in block.iter_lines() if len(line) > 20]
+	avg_length = sum(lengths) / len(lengths)
+	length_std_dev = sqrt(
+		sum((length - avg_length) ** 2 for length in lengths) / len(lengths)
+	)
+
+	res += std_dev_coeff * length_std_dev
+
+	return res
+
+
+def is_separate_line(text: Sequence[str], line_index: int, text_language: Language) -> bool:
+	"""
+	Returns True if the line cannot be part of the same comment block as its neighbours:
+	it is out of bounds, blank, or not commented at all.
+	"""
+	if line_index < 0 or line_index >= len(text):
+		return True
+
+	line = text[line_index]
+	if line.strip() == "":
+		return True
+
+	return not line.startswith(text_language.comment_marker) and not (
+		text_language.multiline_start is not None
+		and line.strip().startswith(text_language.multiline_start)
+	)
+
+
+def locate_exact_disclaimer(
+	text: Sequence[str], text_language: Language
+) -> Optional[Tuple[int, int]]:
+	"""
+	Fast path for the common case: the file already contains the exact configured disclaimer,
+	at the expected position right after the header (after one blank line at most).
+
+	The lines are compared with the cached commented disclaimer: this takes O(disclaimer length)
+	and needs neither comment block extraction nor scoring.
+	Only returns a position if update_disclaimer() would leave the text unchanged:
+	the disclaimer must be its own comment block, and surrounded by blank lines if required.
+
+	Returns:
+		COORDS (Optional[Tuple[int, int]]): Start and end lines of the disclaimer,
+			or None if the exact disclaimer was not found at the expected position.
+	"""
+	try:
+		header_pos = locate_header(text, text_language)
+	except ValueError:
+		# Ex: multiple headers. Let the full search decide what to do
+		return None
+	if header_pos is None:
+		return None
+
+	commented_disclaimer = get_commented_disclaimer(text_language)
+	start = header_pos[1] + 1
+	if start < len(text) and text[start].strip() == "":
+		start += 1
+	end = start + len(commented_disclaimer) - 1
+
+	# Compare the first line on its own first: it is enough to reject most files
+	if start >= len(text) or text[start] != commented_disclaimer[0]:
+		return None
+	if text[start:end + 1] != commented_disclaimer:
+		return None
+
+	# A multiline disclaimer is always its own block, single-line comments would merge into it
+	is_multiline = len(commented_disclaimer) > 1 and text_language.multiline_start is not None
+	must_be_blank = do_whitespace_surround()
+	for line_index in (start - 1, end + 1):
+		if line_index < 0 or line_index >= len(text):
+			continue
+		if must_be_blank and text[line_index].strip() != "":
+			return None
+		if not is_multiline and not is_separate_line(text, line_index, text_language):
+			return None
+
+	return start, end
+
+
+def locate_disclaimer(
+	text: Sequence[str], text_language: Language
+) -> Union[None, Tuple[int, int]]:
+	"""
+	Returns the start and end lines of the copyright disclaimer comment block.
+	If it is a multiline comment, we also include the multiline markers.
+	If no disclaimer exists, return None.
+	Only the comment blocks of the top-of-file scan window are scored.
+	"""
+
+	commented_blocks = iter_commented_blocks(text, text_language)
+	block_scores = sorted(
+		[
+			(block.start_line, block.end_line, block_score(block), block.is_multiline)
+			for block in commented_blocks
+		],
+		key=lambda block: block[2],
+		reverse=True,
+	)
+
+	# If no comment blocks were present, there is no copyright disclaimer
+	if not block_scores:
+		return None
+
+	block_start, block_end, max_score, _ = block_scores[0]
+
+	# If the highest-scoring block does not go over the threshold, consider there is no doisclaimer
+	if max_score < DISCLAIMER_BLOCK_SCORE_THRESH:
+		return None
+
+	# Otherwise, we consider the highest-scoring block to be the disclaimer
+	return block_start, block_end
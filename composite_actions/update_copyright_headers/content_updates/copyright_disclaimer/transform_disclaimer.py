@@ -1,49 +1,58 @@
-"""
-Defines the main function for this module, process_disclaimer()
-"""
-
-import logging
-from typing import List
-
-from content_updates.copyright_disclaimer.extract_disclaimer import locate_disclaimer
-from content_updates.copyright_disclaimer.insert_disclaimer import(
-	add_disclaimer,
-		update_disclaimer,
-)
-from language_support import Language
-
-
-def process_disclaimer(text_lines: List[str], file_language: Language):
-	"""
-	Insert or update the copyright disclaimer in the input lines.
-	If the file already contains a disclaimer, it will be replaced.
-	If ther is none, a new one will be insered just after the copyright header.
-		--> Such a header must alredaty exist !
-		
-	Returns a new list
-	
-	Args:
-		text_lines (List[str]): Input text as a list of lines.
-		file_language (language_support.Language): The language used by this text.
-		
-	Returns:
-		LINES_WITH_DISCLAIMER (List[str]): New text, with the update/new disclaimer.
-	"""
-	
-	disclaimer_coords = locate_disclaimer(text_lines, file_language)
-	logging.debug("disclaimer_coords: %s", disclaimer_coords)
-	
-	if disclaimer_coords is None:
-		# Need to add a new disclaimer
-		logging_info("Disclaimer not found, adding new one.")
-		return add_disclaimer(text_lines, file_language)
-		
-	d_start, d_end = disclaimer_coords
-	new_lines = update_disclaimer(text_lines, file_language, d_start, d_end)
-	
-	if new_lines == text_lines:
-		logging_info("Existing disclaimer already up-to-date")
-	else:
-		logging_info("Disclaimer updated ! ")
-		
-	return new_lines
+"""
+Defines the main function for this module, process_disclaimer()
+"""
+
+import logging
+
+from content_updates.copyright_disclaimer.extract_disclaimer import(
+	locate_disclaimer,
+	locate_exact_disclaimer,
+)
+from content_updates.copyright_disclaimer.insert_disclaimer import(
+	add_disclaimer,
+		update_disclaimer,
+)
+from content_updates.edit_buffer import EditBuffer
+from language_support import Language
+from profiling import profile_stage
+
+
+@profile_stage("disclaimer")
+def process_disclaimer(text_lines: EditBuffer, file_language: Language) -> None:
+	"""
+	Insert or update the copyright disclaimer in the input lines.
+	If the file already contains a disclaimer, it will be replaced.
+	If ther is none, a new one will be insered just after the copyright header.
+		--> Such a header must alredaty exist !
+
+	The edits are recorded in text_lines.
+
+	Args:
+		text_lines (EditBuffer): Input text as a buffer of lines.
+		file_language (language_support.Language): The language used by this text.
+	"""
+
+	# Fast path: the exact disclaimer is already in place, nothing to score or rewrite
+	exact_coords = locate_exact_disclaimer(text_lines, file_language)
+	if exact_coords is not None:
+		logging.debug("exact disclaimer_coords: %s", exact_coords)
+		logging.debug("Existing disclaimer already up-to-date")
+		return
+
+	disclaimer_coords = locate_disclaimer(text_lines, file_language)
+	logging.debug("disclaimer_coords: %s", disclaimer_coords)
+
+	if disclaimer_coords is None:
+		# Need to add a new disclaimer
+		logging.debug("Disclaimer not found, adding new one.")
+		add_disclaimer(text_lines, file_language)
+		return
+
+	d_start, d_end = disclaimer_coords
+	edit_count = text_lines.edit_count
+	update_disclaimer(text_lines, file_language, d_start, d_end)
+
+	if text_lines.edit_count == edit_count:
+		logging.debug("Existing disclaimer already up-to-date")
+	else:
+		logging.debug("Disclaimer updated ! ")
@@ -1,5 +1,21 @@
-"""
-Update or add a new header to the input lines
-"""
-
-from content_updates.copyright_header.transform_header import process_header
+"""
+Update or add a new header to the input lines
+"""
+
+from content_updates.copyright_header.header_index import (
+	get_header_index,
+	load_header_index,
+	save_header_index,
+)
+from content_updates.copyright_header.transform_header import process_header
+from content_updates.copyright_header.year_cache import (
+	get_year_cache,
+	load_year_cache,
+	save_year_cache,
+)
+from content_updates.copyright_header.year_providers import (
+	PROVIDER_NAMES,
+	add_creation_year_candidates,
+	make_year_provider,
+	set_year_provider,
+)
@@ -1,85 +1,229 @@
-"""
-Check file to see if it contaons a copyright header, and extract its position
-"""
-
-# Imports
-import re
-from typing import List, Tuple, Union
-
-from content_updates.utils import YEAR_RANGE_REGEX
-from language_support import Language, get_commented_blocks
-
-# Globals
-
-# A commented line matching this regex in the input file will be considered a "copyright header".
-# The structure is
-
-# 1. Any amount of white space
-# 2. 0-5 non-whitespace, accounting for the comment marker
-# 3. Any amount of whitespace
-# 4. Optionally a '(c)' marker
-# 5. The word "Copyright"
-# 6. A year range or a single year
-# 7. A company name ("XYZ", "ABC" or "Advanced ABC")
-# Any text until the end of the line (usually " Inc. All rights reserved.")
-# The regex is not case sensitive
-# Note the use of a raw f-string (rf) forcing us to use {{}} in the beginning
-EXISTING_HEADER_REGEX = re.compile(
-	#pylint: disable-next=line-too-long
-	#rf"^\s*\S{{0,5}}\s*(?:\(C\))? Copyright (?P<year_range>{YEAR_RANGE_REGEX}) (?:XYZ|ABC|Advanced ABC).*$",
-	#flags=re.IGNORECASE,
-	rf"^\s*\S{{0,5}}\s* Copyright (?:\(c\))? (?P<year_range>{YEAR_RANGE_REGEX}) (?:XYZ|ABC|Advanced ABC).*$",
-	flags=re.IGNORECASE,
-)
-
-	
-def locate_header(
-	text_lines: List[str], text_language: Language
-) -> Union[None, Tuple[int, int, bool]]:
-	"""
-	Returns the start and end lines of the copyright header if it exists.
-	It might be part of a multiline comment block - then the third element of the tuple will be True.
-	If no header exists, return None.
-	"""
-	commented_blocks = get_commented_blocks(text_lines, text_language)
-	header_block_cords = []
-	
-	for block in commented_blocks:
-		block_start, _, block_text, block_is_multiline = block
-		
-		# The header might be part of a larger block which contains other things
-		# (For example it might be attached to the disclaimer or shebang)
-		# Try to extract a header from a block
-		# If the header is non continguous, they will get extracted as 2 distinct headers.
-		# This will raise an error lower in the function.
-		
-		buff: List[int] = []
-		for i, line in enumerate(block_text):
-			if re.match(EXISTING_HEADER_REGEX, line):
-				buff.append(i)
-				continue
-			
-			# If the line does not match, flush the buffer if it is full
-			if buff:
-				header_block_cords.append(
-					(block_start + buff[0], block_start + buff[-1], block_is_multiline)
-				)
-				buff = []
-				
-		# Buffer might still be full
-		if buff:
-			header_block_cords.append(
-				(block_start + buff[0], block_start + buff[-1], block_is_multiline)
-			)	
-			
-	if not header_block_cords:
-		# No header was found
-		return None
-		
-	if len(header_block_cords) > 1:
-		# More than 1 header was found	
-		raise ValueError("Multiple headers found in the file ~")
-		
-	header_start, header_end, in_multiple_block = header_block_cords[0]
-	return header_start, header_end, in_multiple_block
-		
+"""
+Check file to see if it contaons a copyright header, and extract its position
+"""
+
+# Imports
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from content_updates.utils import YEAR_RANGE_REGEX
+from language_support import CommentBlock, Language, is_past_scan_window, iter_commented_blocks
+
+# Globals
+
+# A commented line matching this regex in the input file will be considered a "copyright header".
+# The structure is
+
+# 1. Any amount of white space
+# 2. 0-5 non-whitespace, accounting for the comment marker
+# 3. Any amount of whitespace
+# 4. Optionally a '(c)' marker
+# 5. The word "Copyright"
+# 6. A year range or a single year
+# 7. A company name ("XYZ", "ABC" or "Advanced ABC")
+# Any text until the end of the line (usually " Inc. All rights reserved.")
+# The regex is not case sensitive
+# Note the use of a raw f-string (rf) forcing us to use {{}} in the beginning
+# The regex is only compiled on first use, see get_existing_header_regex()
+EXISTING_HEADER_PATTERN = (
+	#pylint: disable-next=line-too-long
+	#rf"^\s*\S{{0,5}}\s*(?:\(C\))? Copyright (?P<year_range>{YEAR_RANGE_REGEX}) (?:XYZ|ABC|Advanced ABC).*$",
+	rf"^\s*\S{{0,5}}\s* Copyright (?:\(c\))? (?P<year_range>{YEAR_RANGE_REGEX}) (?:XYZ|ABC|Advanced ABC).*$"
+)
+EXISTING_HEADER_REGEX: Union[None, re.Pattern] = None
+# Same pattern, searching a whole text for a header line: whitespace may not cross line ends
+EXISTING_HEADER_SEARCH_PATTERN = (
+	#pylint: disable-next=line-too-long
+	rf"^[^\S\n]*\S{{0,5}}[^\S\n]* Copyright (?:\(c\))? (?P<year_range>{YEAR_RANGE_REGEX}) (?:XYZ|ABC|Advanced ABC).*$"
+)
+EXISTING_HEADER_SEARCH_REGEX: Union[None, re.Pattern] = None
+
+# Number of lines at the top of the file searched by locate_header_fast()
+HEADER_SEARCH_WINDOW = 200
+# Anchored regexes matching the top-of-file region, per language comment markers
+TOP_REGION_REGEXES: Dict[Tuple[str, Optional[str], Optional[str]], re.Pattern] = {}
+
+
+def get_existing_header_regex() -> re.Pattern:
+	"""Get the compiled EXISTING_HEADER_PATTERN, compiling it on the first call."""
+	# pylint: disable-next=global-statement
+	global EXISTING_HEADER_REGEX
+	if EXISTING_HEADER_REGEX is None:
+		EXISTING_HEADER_REGEX = re.compile(EXISTING_HEADER_PATTERN, flags=re.IGNORECASE)
+
+	return EXISTING_HEADER_REGEX
+
+
+def get_existing_header_search_regex() -> re.Pattern:
+	"""Get the compiled EXISTING_HEADER_SEARCH_PATTERN, compiling it on the first call."""
+	# pylint: disable-next=global-statement
+	global EXISTING_HEADER_SEARCH_REGEX
+	if EXISTING_HEADER_SEARCH_REGEX is None:
+		EXISTING_HEADER_SEARCH_REGEX = re.compile(
+			EXISTING_HEADER_SEARCH_PATTERN, flags=re.IGNORECASE | re.MULTILINE
+		)
+
+	return EXISTING_HEADER_SEARCH_REGEX
+
+
+def get_top_region_regex(text_language: Language) -> re.Pattern:
+	"""
+	Get the anchored regex matching the top-of-file region of a file in the given language.
+	This is the only region where a header can legally sit:
+	a run of blank lines, comments, and format declarations (shebang, xml declaration, yaml '---').
+	The match stops at the first line of code.
+
+	The regex is compiled once per language, from its comment markers.
+	Comment lines are recognized with the same rules as get_commented_blocks().
+	"""
+	# Key on the markers, not the name: different configs can define the same language name
+	markers = (
+		text_language.comment_marker,
+		text_language.multiline_start,
+		text_language.multiline_end,
+	)
+	if markers in TOP_REGION_REGEXES:
+		return TOP_REGION_REGEXES[markers]
+
+	wspace = r"[^\S\n]*"
+	line_end = r"(?:\n|\Z)"
+	alternatives = []
+
+	if text_language.multiline_start:
+		m_start = re.escape(text_language.multiline_start)
+		m_end = re.escape(text_language.multiline_end) # type: ignore
+		# One-line multiline comment (common in XML)
+		alternatives.append(rf"{wspace}{m_start}[^\n]*{m_end}{wspace}{line_end}")
+		# Full multiline comment: up to the first line ending with the end marker, or the end of text
+		alternatives.append(
+			rf"{wspace}{m_start}(?![^\n]*{m_end}{wspace}$)[^\n]*"
+			+ rf"(?:\n(?![^\n]*{m_end}{wspace}$)[^\n]*)*(?:\n[^\n]*{m_end}{wspace})?{line_end}"
+		)
+
+	alternatives.extend(
+		[
+			# Single-line comment
+			rf"{re.escape(text_language.comment_marker)}[^\n]*{line_end}",
+			# Blank line
+			rf"{wspace}{line_end}",
+			# Format declarations: shebang, xml-like declaration, yaml document start
+			rf"#![^\n]*{line_end}",
+			rf"{wspace}<\?[^\n]*{line_end}",
+			rf"{wspace}---{wspace}{line_end}",
+		]
+	)
+
+	TOP_REGION_REGEXES[markers] = re.compile(
+		rf"\A(?:{'|'.join(alternatives)})*", flags=re.MULTILINE
+	)
+	return TOP_REGION_REGEXES[markers]
+
+
+def get_header_block_cords(
+	commented_blocks: Iterable[CommentBlock],
+) -> List[Tuple[int, int, bool]]:
+	"""Extract the (start, end, in_multiline) coordinates of all header lines runs in the blocks."""
+	existing_header_regex = get_existing_header_regex()
+	header_block_cords = []
+
+	for block in commented_blocks:
+		# The header might be part of a larger block which contains other things
+		# (For example it might be attached to the disclaimer or shebang)
+		# Try to extract a header from a block
+		# If the header is non continguous, they will get extracted as 2 distinct headers.
+		# This will raise an error lower in the function.
+
+		buff: List[int] = []
+		for i, line in enumerate(block.iter_lines(), block.start_line):
+			if re.match(existing_header_regex, line):
+				buff.append(i)
+				continue
+
+			# If the line does not match, flush the buffer if it is full
+			if buff:
+				header_block_cords.append((buff[0], buff[-1], block.is_multiline))
+				buff = []
+
+		# Buffer might still be full
+		if buff:
+			header_block_cords.append((buff[0], buff[-1], block.is_multiline))
+
+	return header_block_cords
+
+
+def locate_header_fast(
+	text_lines: Sequence[str], text_language: Language
+) -> Union[None, Tuple[int, int, bool]]:
+	"""
+	Fast path for locate_header(): only search the top-of-file region for the header.
+	Returns None when inconclusive: no header, or multiple headers found in the region,
+	or the header might continue past the searched window, or a line after the region but in the
+	scan window looks like a header (the full scan then decides whether it is one, and raises if so).
+	"""
+	window = text_lines[:HEADER_SEARCH_WINDOW]
+	window_text = "".join(window)
+
+	region_match = get_top_region_regex(text_language).match(window_text)
+	region_end = window_text.count("\n", 0, region_match.end())
+	if region_match.end() == len(window_text) and not window_text.endswith("\n"):
+		# The last line has no newline, but still belongs to the region
+		region_end = len(window)
+
+	# The region ends on a line of code: comment blocks before it are the same as for the full file
+	header_block_cords = get_header_block_cords(
+		iter_commented_blocks(text_lines[:region_end], text_language)
+	)
+
+	if len(header_block_cords) != 1:
+		return None
+
+	header_start, header_end, in_multiple_block = header_block_cords[0]
+	if region_end == len(window) < len(text_lines) and header_end == region_end - 1:
+		# The region was cut by the window: the header might go on after it
+		return None
+
+	# A single regex search over the rest of the scan window: much cheaper than its comment blocks.
+	# Might match lines outside comments, or past the window's code lines: the full scan sorts them out
+	size = sum(map(len, text_lines[:region_end]))
+	search_end = region_end
+	for line in text_lines[region_end:]:
+		size += len(line)
+		if is_past_scan_window(0, size):
+			break
+		search_end += 1
+
+	search_text = "".join(text_lines[region_end:search_end])
+	if get_existing_header_search_regex().search(search_text) is not None:
+		return None
+
+	return header_start, header_end, in_multiple_block
+
+
+def locate_header(
+	text_lines: Sequence[str], text_language: Language
+) -> Union[None, Tuple[int, int, bool]]:
+	"""
+	Returns the start and end lines of the copyright header if it exists.
+	It might be part of a multiline comment block - then the third element of the tuple will be True.
+	If no header exists, return None.
+
+	The top of the file is searched first (see locate_header_fast()),
+	all comment blocks of the scan window are only scanned if that search is inconclusive.
+	"""
+	header_cords = locate_header_fast(text_lines, text_language)
+	if header_cords is not None:
+		return header_cords
+
+	commented_blocks = iter_commented_blocks(text_lines, text_language)
+	header_block_cords = get_header_block_cords(commented_blocks)
+
+	if not header_block_cords:
+		# No header was found
+		return None
+
+	if len(header_block_cords) > 1:
+		# More than 1 header was found	
+		raise ValueError("Multiple headers found in the file ~")
+
+	header_start, header_end, in_multiple_block = header_block_cords[0]
+	return header_start, header_end, in_multiple_block
@@ -0,0 +1,211 @@
+"""
+Persistent index of the header position in each file, for year rollover runs (see --rollover).
+
+After a file is fully processed, the index records the byte offset of its last header line,
+the offset of the end year token in that line, and a checksum of the line.
+On the next rollover (ex: every January), indexed files are validated by reading that line back
+and comparing its checksum: if it still matches, only the 4 bytes of the end year are rewritten.
+Files which changed (or were never indexed) go through the full parsing path, and are indexed again.
+"""
+# pylint: disable=locally-disabled, unspecified-encoding, global-statement
+
+# Imports
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+from zlib import crc32
+
+from content_updates.config import do_safe_writes
+from content_updates.copyright_header.extract_header import locate_header
+from content_updates.copyright_header.update_header import (
+	CURRENT_YEAR,
+	TRANSITION_YEAR,
+	YEAR_RANGE_MATCHER,
+)
+from language_support import Language
+
+# Globals
+HEADER_INDEX: Union[None, "HeaderIndex"] = None
+
+# Bump this when the index format changes: indexes with another version are discarded
+HEADER_INDEX_VERSION = 1
+
+# Only year ranges can be patched in place: "2022 - 2024" -> "2022 - 2025".
+# A single year ("2024") becomes a range, which changes the size of the line,
+# and ranges ending before the transition year get a second header line.
+PATCHABLE_RANGE_MATCHER = re.compile(r"[0-9]{4} ?- ?(?P<end_year>[0-9]{4})")
+
+# [line offset, line length, end year offset in the line, line checksum, end year]
+# Offsets and lengths are in bytes
+IndexEntry = List[int]
+
+
+class HeaderIndex:
+	"""Map of paths (relative to root) to the position of their header's end year."""
+
+	def __init__(self, index_path: Path, root: Path) -> None:
+		self.index_path = index_path
+		self.root = root
+		self.entries: Dict[str, IndexEntry] = {}
+
+	def key(self, file_path: Path) -> Optional[str]:
+		"""Index key for the given file, None if it is outside of root."""
+		try:
+			return Path(file_path).absolute().relative_to(self.root).as_posix()
+		except ValueError:
+			return None
+
+	def load(self) -> None:
+		"""Load the index file, if it exists."""
+		try:
+			with open(self.index_path) as index_file:
+				index_data = json.load(index_file)
+		except FileNotFoundError:
+			logging.debug("No header index found at %s", str(self.index_path))
+			return
+		except ValueError:
+			logging.warning("Ignoring corrupted header index at %s", str(self.index_path))
+			return
+
+		if index_data.get("version") == HEADER_INDEX_VERSION:
+			self.entries = index_data["entries"]
+
+	def save(self) -> None:
+		"""Atomically write the index to its file."""
+		tmp_path = self.index_path.with_name(f"{self.index_path.name}.tmp")
+		with open(tmp_path, "w") as index_file:
+			json.dump({"version": HEADER_INDEX_VERSION, "entries": self.entries}, index_file)
+		os.replace(tmp_path, self.index_path)
+
+	def record(
+		self,
+		file_path: Path,
+		text_lines: Sequence[str],
+		file_language: Language,
+		encoding: str,
+	) -> None:
+		"""
+		Index the header of a file, from its current content.
+		Files whose header end year cannot be patched in place are removed from the index.
+
+		Args:
+			file_path (Path): The path to the file.
+			text_lines (Sequence[str]): Current content of the file. Its lines must map exactly
+				to the file's bytes ('\\n' line endings only).
+			file_language (Language): Language of the file.
+			encoding (str): Encoding of the file.
+		"""
+		key = self.key(file_path)
+		if key is None:
+			return
+		self.entries.pop(key, None)
+
+		header_cords = locate_header(text_lines, file_language)
+		if header_cords is None:
+			return
+
+		# The end year is in the last line with a year range
+		h_start, h_end, _ = header_cords
+		for line_index in range(h_end, h_start - 1, -1):
+			line = text_lines[line_index]
+			range_match = YEAR_RANGE_MATCHER.search(line)
+			if range_match is not None:
+				break
+		else:
+			return
+
+		patchable_match = PATCHABLE_RANGE_MATCHER.fullmatch(range_match["year_range"])
+		if patchable_match is None or int(patchable_match["end_year"]) <= TRANSITION_YEAR:
+			return
+
+		line_bytes = line.encode(encoding)
+		line_offset = sum(len(previous.encode(encoding)) for previous in text_lines[:line_index])
+		year_offset = range_match.start("year_range") + patchable_match.start("end_year")
+		self.entries[key] = [
+			line_offset,
+			len(line_bytes),
+			len(line[:year_offset].encode(encoding)),
+			crc32(line_bytes),
+			int(patchable_match["end_year"]),
+		]
+
+	def rollover(self, file_path: Path, dry_run: bool = False) -> Optional[bool]:
+		"""
+		Bump the end year of an indexed file's header to the current year, in place.
+
+		Args:
+			file_path (Path): The path to the file.
+			dry_run (bool, optional): Only validate the entry, do not write anything.
+
+		Returns:
+			MODIFIED (Optional[bool]): Whether the file was modified,
+				None if it is not indexed or its entry is no longer valid: it needs a full update.
+		"""
+		key = self.key(file_path)
+		entry = None if key is None else self.entries.get(key)
+		if entry is None:
+			return None
+		line_offset, line_length, year_offset, checksum, end_year = entry
+
+		file_descriptor = os.open(file_path, os.O_RDWR)
+		try:
+			line_bytes = os.pread(file_descriptor, line_length, line_offset)
+			if len(line_bytes) != line_length or crc32(line_bytes) != checksum:
+				logging.debug("Header index entry of %s is outdated", key)
+				return None
+
+			if end_year >= CURRENT_YEAR:
+				return False
+
+			year_bytes = str(CURRENT_YEAR).encode("ascii")
+			if dry_run:
+				return True
+
+			os.pwrite(file_descriptor, year_bytes, line_offset + year_offset)
+			if do_safe_writes():
+				os.fsync(file_descriptor)
+		finally:
+			os.close(file_descriptor)
+
+		new_line_bytes = (
+			line_bytes[:year_offset] + year_bytes + line_bytes[year_offset + len(year_bytes) :]
+		)
+		entry[3] = crc32(new_line_bytes)
+		entry[4] = CURRENT_YEAR
+		return True
+
+
+def load_header_index(root: Union[str, Path], index_path: Union[str, Path]) -> HeaderIndex:
+	"""
+	Load the header index (or start an empty one) for the files under root.
+
+	Args:
+		root (Union[str, Path]): The target path: index keys are relative to it.
+		index_path (Union[str, Path]): Path to the index file.
+
+	Returns:
+		HEADER_INDEX (HeaderIndex): The loaded index.
+	"""
+	global HEADER_INDEX
+
+	root_dir = Path(root).absolute()
+	if not root_dir.is_dir():
+		root_dir = root_dir.parent
+
+	HEADER_INDEX = HeaderIndex(Path(index_path).absolute(), root_dir)
+	HEADER_INDEX.load()
+	return HEADER_INDEX
+
+
+def get_header_index() -> Optional[HeaderIndex]:
+	"""Get the loaded header index, if any."""
+	return HEADER_INDEX
+
+
+def save_header_index() -> None:
+	"""Write the loaded header index (if any) back to its file."""
+	if HEADER_INDEX is not None:
+		HEADER_INDEX.save()
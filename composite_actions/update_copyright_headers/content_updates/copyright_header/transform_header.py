@@ -1,49 +1,54 @@
-"""
-Defines the main function for this module, process_header()
-"""
-
-import logging
-from pathlib import Path
-from typing import List
-
-from content_updates.copyright_header.extract_header import locate_header
-from content_updates.copyright_header.insert_header import add_header, update_header
-from language_support import get_language
-
-def process_header(text_lines: List[str], file_path: Path) -> List[str]:
-	"""
-	Insert or update the copyright header in the input lines.
-	If the file already contains a header, the years specified must be made up-to-date.
-	If there is none, a new one will be inserted in the first available safe spot.
-	
-	Returns a new list.
-	
-	Args:
-		text_lines (List[str]): Input text as a list of lines.
-		file_path (Path). The path to the file this text came from.
-			This is used when no header is present:
-			We use git to determine the file's creation date.
-			
-	Returns:
-		LINES_WITH_HEADER (List[str]): New text, with the updated/new header.
-	"""
-	
-	file_language = get_language(file_path)
-	
-	header_data = locate_header(text_lines, file_language)
-	logging.debug("header_data: %s", header_data)
-	
-	if header_data is None:
-		# Need to add a new header
-		logging.info("Header not found, adding new one.")
-		return add_header(text_lines, file_path)
-		
-	h_start, h_end, in_multiline = header_data
-	new_lines = update_header(text_lines, file_language, h_start, h_end, in_multiline)
-	
-	if new_lines == text_lines:
-		logging.info("Existing header already up-to-date")
-	else:
-		logging.info("Header updated !")
-		
-	return new_lines
+"""
+Defines the main function for this module, process_header()
+"""
+
+import logging
+from pathlib import Path
+from typing import Optional
+
+from content_updates.copyright_header.extract_header import locate_header
+from content_updates.copyright_header.insert_header import add_header, update_header
+from content_updates.edit_buffer import EditBuffer
+from language_support import Language, get_language
+from profiling import profile_stage
+
+@profile_stage("header")
+def process_header(
+	text_lines: EditBuffer, file_path: Path, file_language: Optional[Language] = None
+) -> None:
+	"""
+	Insert or update the copyright header in the input lines.
+	If the file already contains a header, the years specified must be made up-to-date.
+	If there is none, a new one will be inserted in the first available safe spot.
+
+	The edits are recorded in text_lines.
+
+	Args:
+		text_lines (EditBuffer): Input text as a buffer of lines.
+		file_path (Path). The path to the file this text came from.
+			This is used when no header is present:
+			We use git to determine the file's creation date.
+		file_language (Language, optional): Language of the text.
+			Defaults to the language detected from file_path.
+	"""
+
+	if file_language is None:
+		file_language = get_language(file_path)
+
+	header_data = locate_header(text_lines, file_language)
+	logging.debug("header_data: %s", header_data)
+
+	if header_data is None:
+		# Need to add a new header
+		logging.debug("Header not found, adding new one.")
+		add_header(text_lines, file_path, file_language)
+		return
+
+	h_start, h_end, in_multiline = header_data
+	edit_count = text_lines.edit_count
+	update_header(text_lines, file_language, h_start, h_end, in_multiline)
+
+	if text_lines.edit_count == edit_count:
+		logging.debug("Existing header already up-to-date")
+	else:
+		logging.debug("Header updated !")
@@ -1,110 +1,125 @@
-"""
-Generate a filled-in header according to the template and specified years.
-"""
-
-# Imports
-import re
-import subprocess
-from datetime import date, datetime
-from pathlib import Path
-from typing import List, Optional
-
-from content_updates.utils import YEAR_RANGE_REGEX, date_range, parse_year_range
-
-#Globals
-COPYRIGHT_HEADER_TEMPLATE = (
-   " Copyright (C) {year_range} {company_name}, Inc. All Rights reserved.\n"
-  )
-  
-# XYZ acquisition year_range
-TRANSITION_YEAR = 2021
-
-# Global variables = evaluated once on file init
-YEAR_RANGE_MATCHER = re.compile(rf" (?P<year_range>{YEAR_RANGE_REGEX}) ")
-CURRENT_YEAR = date.today().year
-
-
-def get_creation_year_from_header(header_lines: List[str]) -> int:
-	"""Get the oldest year specified in the header"""
-	res = 9999
-	for line in header_lines:
-		match = re.search(YEAR_RANGE_MATCHER, line)
-		if match:
-			y1, _ = parse_year_range(match["year_range"])
-			res = min(res,y1)
-			
-	if res == 9999:
-		raise ValueError("Year not found in the input text !")
-		
-	return res
-	
-
-def get_creation_year_from_git(file_path: Path) -> int:
-	"""Parse the file's git history, getting the oldest mentioned year."""
-	"Can't use subprocess.run as git log outputs to an interactive text view"
-	result = subprocess.check_output(
-		["git", "log", "--follow", "--format=%aD", str(file_path.absolute())]
-	).decode("utf-8")
-	
-	if result.strip() == "":
-		raise ValueError("Could not get creation year from git. Is the file tracked?")
-		
-	result_lines = result.splitlines()
-	oldest_year = min(
-		datetime.strptime(date_line.strip(), "%a, %d %b %Y %H:%M:%S %z").year
-		for date_line in result_lines
-	)
-	
-	if oldest_year <2015:
-		# 2015 is the first release, does not make sense to have copyright before that
-		return 2015
-		
-	return oldest_year
-	
-	
-def get_header(start_year:int, end_year: Optional[int]) -> List[str]:
-	"""Get a properly formatted copyright header for the input year range."""
-	if end_year is None:
-		end_year = start_year
-		
-	if start_year > end_year:
-		raise ValueError("'end' must be greater than 'start' !")
-		
-	out = []
-	
-	if end_year <= TRANSITION_YEAR:
-		# Both years are before the XYZ acquisition
-		out.append(
-			COPYRIGHT_HEADER_TEMPLATE.format(
-				year_range = date_range(start_year, end_year), company_name = "XYZ"
-			)
-		)
-	elif start_year <= TRANSITION_YEAR:
-		# Year range straddles the acquisition
-		out.append(
-			COPYRIGHT_HEADER_TEMPLATE.format(
-				year_range = date_range(start_year, TRANSITION_YEAR),
-				company_name = "XYZ"
-			)
-		)
-		out.append(
-			COPYRIGHT_HEADER_TEMPLATE.format(
-				year_range = date_range(TRANSITION_YEAR+1, end_year),
-				company_name = "Advanced ABC"
-			)
-		)		
-	else:
-		# Both years are after the acquisition
-		out.append(
-			COPYRIGHT_HEADER_TEMPLATE.format(
-				year_range = date_range(start_year, end_year),
-				company_name = "Advanced ABC"
-			)
-		)
-
-	return out
-	
-	
-def get_current_header(start_year:int) -> List[str]:
-	"""Get a formatted header starting at the input year and ending in the current year."""
-	return get_header(start_year, CURRENT_YEAR)
+"""
+Generate a filled-in header according to the template and specified years.
+"""
+
+# Imports
+import re
+import subprocess
+from datetime import date, datetime
+from pathlib import Path
+from typing import List, Optional
+
+from content_updates.copyright_header.year_cache import get_year_cache
+from content_updates.utils import YEAR_RANGE_REGEX, date_range, parse_year_range
+
+#Globals
+COPYRIGHT_HEADER_TEMPLATE = (
+   " Copyright (C) {year_range} {company_name}, Inc. All Rights reserved.\n"
+  )
+
+# XYZ acquisition year_range
+TRANSITION_YEAR = 2021
+
+# 2015 is the first release, does not make sense to have copyright before that
+MIN_CREATION_YEAR = 2015
+
+# Global variables = evaluated once on file init
+YEAR_RANGE_MATCHER = re.compile(rf" (?P<year_range>{YEAR_RANGE_REGEX}) ")
+CURRENT_YEAR = date.today().year
+
+
+def get_creation_year_from_header(header_lines: List[str]) -> int:
+	"""Get the oldest year specified in the header"""
+	res = 9999
+	for line in header_lines:
+		match = re.search(YEAR_RANGE_MATCHER, line)
+		if match:
+			y1, _ = parse_year_range(match["year_range"])
+			res = min(res,y1)
+
+	if res == 9999:
+		raise ValueError("Year not found in the input text !")
+
+	return res
+
+
+def get_creation_year_from_git(file_path: Path) -> int:
+	"""
+	Parse the file's git history, getting the oldest mentioned year.
+	If a year cache is loaded, it is used first and updated with the result.
+	"""
+	year_cache = get_year_cache()
+	oldest_year = None if year_cache is None else year_cache.get(file_path)
+
+	if oldest_year is None:
+		"Can't use subprocess.run as git log outputs to an interactive text view"
+		# Run git from the file's directory: always in the context of the repo containing the file
+		result = subprocess.check_output(
+			["git", "log", "--follow", "--format=%aD", str(file_path.absolute())],
+			cwd=str(file_path.absolute().parent),
+		).decode("utf-8")
+
+		if result.strip() == "":
+			raise ValueError("Could not get creation year from git. Is the file tracked?")
+
+		result_lines = result.splitlines()
+		oldest_year = min(
+			datetime.strptime(date_line.strip(), "%a, %d %b %Y %H:%M:%S %z").year
+			for date_line in result_lines
+		)
+
+		if year_cache is not None:
+			year_cache.set(file_path, oldest_year)
+
+	if oldest_year < MIN_CREATION_YEAR:
+		return MIN_CREATION_YEAR
+
+	return oldest_year
+
+
+def get_header(start_year:int, end_year: Optional[int]) -> List[str]:
+	"""Get a properly formatted copyright header for the input year range."""
+	if end_year is None:
+		end_year = start_year
+
+	if start_year > end_year:
+		raise ValueError("'end' must be greater than 'start' !")
+
+	out = []
+
+	if end_year <= TRANSITION_YEAR:
+		# Both years are before the XYZ acquisition
+		out.append(
+			COPYRIGHT_HEADER_TEMPLATE.format(
+				year_range = date_range(start_year, end_year), company_name = "XYZ"
+			)
+		)
+	elif start_year <= TRANSITION_YEAR:
+		# Year range straddles the acquisition
+		out.append(
+			COPYRIGHT_HEADER_TEMPLATE.format(
+				year_range = date_range(start_year, TRANSITION_YEAR),
+				company_name = "XYZ"
+			)
+		)
+		out.append(
+			COPYRIGHT_HEADER_TEMPLATE.format(
+				year_range = date_range(TRANSITION_YEAR+1, end_year),
+				company_name = "Advanced ABC"
+			)
+		)		
+	else:
+		# Both years are after the acquisition
+		out.append(
+			COPYRIGHT_HEADER_TEMPLATE.format(
+				year_range = date_range(start_year, end_year),
+				company_name = "Advanced ABC"
+			)
+		)
+
+	return out
+
+
+def get_current_header(start_year:int) -> List[str]:
+	"""Get a formatted header starting at the input year and ending in the current year."""
+	return get_header(start_year, CURRENT_YEAR)
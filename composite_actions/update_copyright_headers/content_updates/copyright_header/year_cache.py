@@ -0,0 +1,218 @@
+"""
+Persistent cache of the creation years computed from the git history.
+Creation years never change for existing files: we store them along with the HEAD commit
+they were computed at, and only scan the history newer than that commit on the next run.
+"""
+# pylint: disable=locally-disabled, unspecified-encoding, global-statement
+
+# Imports
+import json
+import logging
+import subprocess
+from os import replace
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from git_plumbing import run_git
+
+# Globals
+YEAR_CACHE: Union[None, "YearCache"] = None
+
+# Bump this when the cache format changes: caches with another version are discarded
+YEAR_CACHE_VERSION = 1
+DEFAULT_YEAR_CACHE_NAME = "copyright_year_cache.json"
+
+
+class YearCache:
+	"""
+	Map of repository paths (relative to the repository root) to their creation year.
+	The years are the oldest years found in the history, before any clamping.
+	With cache_path=None, the cache is only kept in memory.
+	"""
+
+	def __init__(self, cache_path: Optional[Path], repo_root: Path) -> None:
+		self.cache_path = cache_path
+		self.repo_root = repo_root
+		# `git rev-parse --show-toplevel` resolves symlinks, but the root might come from elsewhere
+		self.resolved_root = repo_root.resolve()
+		self.commit: Optional[str] = None
+		self.years: Dict[str, int] = {}
+		# Years computed during this run, see merge()
+		self.new_years: Dict[str, int] = {}
+
+	def key(self, file_path: Path) -> Optional[str]:
+		"""Cache key for the given file, None if it is outside of the repository."""
+		file_path = Path(file_path).absolute()
+		try:
+			# Symlinked directories are resolved, like the root. Not the file itself: git tracks symlinks
+			return (file_path.parent.resolve() / file_path.name).relative_to(self.resolved_root).as_posix()
+		except ValueError:
+			return None
+
+	def get(self, file_path: Path) -> Optional[int]:
+		"""Get the cached creation year of a file, if known."""
+		key = self.key(file_path)
+		return None if key is None else self.years.get(key)
+
+	def set(self, file_path: Path, year: int) -> None:
+		"""Record the creation year of a file."""
+		key = self.key(file_path)
+		if key is not None:
+			self.years[key] = year
+			self.new_years[key] = year
+
+	def merge(self, new_years: Dict[str, int]) -> None:
+		"""Add years computed by another process (see new_years) to this cache."""
+		self.years.update(new_years)
+
+	def load(self) -> None:
+		"""
+		Load the cache file if it exists, and bring it up-to-date with the current HEAD.
+		Only the history between the cached commit and HEAD is scanned.
+		"""
+		head = run_git(self.repo_root, "rev-parse", "--verify", "HEAD")
+
+		try:
+			with open(self.cache_path) as cache_file:
+				cache_data = json.load(cache_file)
+		except FileNotFoundError:
+			logging.debug("No creation year cache found at %s", str(self.cache_path))
+			cache_data = None
+		except ValueError:
+			logging.warning("Ignoring corrupted year cache at %s", str(self.cache_path))
+			cache_data = None
+
+		if cache_data is None or cache_data.get("version") != YEAR_CACHE_VERSION:
+			self.commit = head
+			self.years = {}
+			return
+
+		self.commit = cache_data["commit"]
+		self.years = cache_data["years"]
+
+		if self.commit != head:
+			self.update(head)
+
+	def update(self, head: str) -> None:
+		"""
+		Apply the history between the cached commit and `head` to the cache:
+		add new paths, follow renames and drop deleted paths.
+		If the cached commit is not an ancestor of `head` (rewritten history...), start over.
+		"""
+		try:
+			run_git(self.repo_root, "merge-base", "--is-ancestor", str(self.commit), head)
+		except subprocess.CalledProcessError:
+			logging.info("Cached year cache commit is not in HEAD's history, discarding it.")
+			self.commit = head
+			self.years = {}
+			return
+
+		self.apply_history(f"{self.commit}..{head}")
+
+		logging.debug("Year cache updated from %s to %s", self.commit, head)
+		self.commit = head
+
+	def apply_history(self, revision_range: str) -> None:
+		"""
+		Scan the commits of revision_range (oldest first) with a single git command,
+		and record the creation years of the paths they add, rename or delete.
+		"""
+		history = run_git(
+			self.repo_root,
+			"-c",
+			"core.quotepath=off",
+			"log",
+			"--reverse",
+			"--name-status",
+			"-M",
+			"--date=format:%Y",
+			"--format=%x01%ad",
+			revision_range,
+		)
+
+		year = 0
+		for line in history.splitlines():
+			if line.startswith("\x01"):
+				year = int(line[1:])
+				continue
+
+			if not line.strip():
+				continue
+
+			status, *paths = line.split("\t")
+			if any(path.startswith('"') for path in paths):
+				# Quoted (unusual) paths: leave them out, they are computed on demand instead
+				continue
+
+			if status[0] == "A":
+				self.years[paths[0]] = min(self.years.get(paths[0], year), year)
+			elif status[0] in ("M", "T"):
+				if paths[0] in self.years:
+					self.years[paths[0]] = min(self.years[paths[0]], year)
+			elif status[0] == "D":
+				self.years.pop(paths[0], None)
+			elif status[0] == "R":
+				old_year = self.years.pop(paths[0], None)
+				if old_year is not None:
+					self.years[paths[1]] = min(old_year, year)
+
+	def save(self) -> None:
+		"""Atomically write the cache to its file."""
+		if self.cache_path is None:
+			return
+
+		tmp_path = self.cache_path.with_name(f"{self.cache_path.name}.tmp")
+		with open(tmp_path, "w") as cache_file:
+			json.dump(
+				{"version": YEAR_CACHE_VERSION, "commit": self.commit, "years": self.years},
+				cache_file,
+			)
+		replace(tmp_path, self.cache_path)
+
+
+def load_year_cache(
+	target_path: Union[str, Path], cache_path: Optional[Union[str, Path]] = None
+) -> Optional[YearCache]:
+	"""
+	Load the creation year cache for the repository containing target_path.
+	By default, the cache is stored in the repository's git directory (never committed).
+
+	Args:
+		target_path (Union[str, Path]): Any path inside the repository.
+		cache_path (Union[str, Path], optional): Path to the cache file.
+
+	Returns:
+		YEAR_CACHE (Optional[YearCache]): The loaded cache, or None if not in a git repository.
+	"""
+	global YEAR_CACHE
+
+	target_dir = Path(target_path)
+	if not target_dir.is_dir():
+		target_dir = target_dir.parent
+
+	try:
+		repo_root = Path(run_git(target_dir, "rev-parse", "--show-toplevel"))
+		if cache_path is None:
+			cache_path = target_dir.joinpath(
+				run_git(target_dir, "rev-parse", "--git-path", DEFAULT_YEAR_CACHE_NAME)
+			)
+		year_cache = YearCache(Path(cache_path).absolute(), repo_root)
+		year_cache.load()
+	except subprocess.CalledProcessError:
+		logging.warning("%s is not in a git repository, not using a year cache.", target_dir)
+		YEAR_CACHE = None
+		return None
+
+	YEAR_CACHE = year_cache
+	return YEAR_CACHE
+
+
+def get_year_cache() -> Optional[YearCache]:
+	"""Get the loaded creation year cache, if any."""
+	return YEAR_CACHE
+
+
+def save_year_cache() -> None:
+	"""Write the loaded creation year cache (if any) back to its file."""
+	if YEAR_CACHE is not None:
+		YEAR_CACHE.save()
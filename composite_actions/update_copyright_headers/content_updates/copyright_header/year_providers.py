@@ -0,0 +1,378 @@
+"""
+Creation year providers: where the creation year of files getting a new header comes from.
+
+Providers are chained (see YearProviderChain): each provider is only asked for the years
+the previous ones could not provide. Lookups are done in bulk, for many paths at once.
+Ex: "git,fixed" uses the git history, and the fixed default year for untracked files.
+"""
+# pylint: disable=locally-disabled, unspecified-encoding, global-statement
+
+# Imports
+import json
+import logging
+import os
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+from content_updates.copyright_header.update_header import (
+	CURRENT_YEAR,
+	MIN_CREATION_YEAR,
+	get_creation_year_from_git,
+)
+from content_updates.copyright_header.year_cache import YearCache, get_year_cache
+from git_plumbing import run_git
+from profiling import profile_stage
+
+# Globals
+YEAR_PROVIDER: Union[None, "YearProviderChain"] = None
+
+PROVIDER_NAMES = ("git", "map", "birthtime", "fixed")
+
+# Above this many unknown files, the git provider scans the whole history once,
+# instead of running `git log --follow` for each file
+GIT_BULK_THRESHOLD = 16
+
+# Number of files given to each `stat` command
+STAT_CHUNK_SIZE = 512
+
+
+class CreationYearProvider:
+	"""Base class for the creation year providers."""
+
+	name = ""
+
+	def years_for(self, paths: Sequence[Path]) -> Dict[Path, int]:
+		"""
+		Get the creation years of the given files, in bulk.
+		Files this provider knows nothing about are left out of the result.
+		"""
+		raise NotImplementedError
+
+
+class GitYearProvider(CreationYearProvider):
+	"""
+	Creation years from the git history, using the year cache when it is loaded.
+	In shallow clones, the history is truncated: files created before the oldest fetched commit
+	get its year. With skip_shallow, shallow clones are left to the next providers instead.
+	With a revision (see --from_tree), files are not read from the worktree: the history
+	of that revision is always scanned in bulk.
+	"""
+
+	name = "git"
+
+	def __init__(
+		self,
+		target_path: Optional[Path] = None,
+		revision: Optional[str] = None,
+		skip_shallow: bool = False,
+	) -> None:
+		self.target_path = target_path
+		self.revision = revision
+		self.skip_shallow = skip_shallow
+		self.repo_root: Optional[Path] = None
+		self.checked = False
+		# Years of all paths in the history, only computed for bulk lookups
+		self.history: Optional[YearCache] = None
+
+	def get_repo_root(self, paths: Sequence[Path]) -> Optional[Path]:
+		"""Get the root of the repository, or None if there is no (complete) history to use."""
+		if self.checked:
+			return self.repo_root
+		self.checked = True
+
+		target_dir = Path(self.target_path if self.target_path is not None else paths[0])
+		if not target_dir.is_dir():
+			target_dir = target_dir.parent
+
+		try:
+			if run_git(target_dir, "rev-parse", "--is-shallow-repository") == "true":
+				if self.skip_shallow:
+					logging.warning(
+						"%s is a shallow clone: not using its git history for creation years.",
+						str(target_dir),
+					)
+					return None
+				logging.warning(
+					"%s is a shallow clone: creation years come from its truncated history "
+					"(see --skip_shallow_history).",
+					str(target_dir),
+				)
+			if run_git(target_dir, "rev-parse", "--is-bare-repository") == "true":
+				# Paths in bare repositories are relative to the repository itself
+				self.repo_root = target_dir
+			else:
+				self.repo_root = Path(run_git(target_dir, "rev-parse", "--show-toplevel"))
+		except subprocess.CalledProcessError:
+			logging.warning("%s is not in a git repository: no git creation years.", str(target_dir))
+
+		return self.repo_root
+
+	def years_for(self, paths: Sequence[Path]) -> Dict[Path, int]:
+		if not paths or self.get_repo_root(paths) is None:
+			return {}
+
+		out = {}
+		year_cache = get_year_cache()
+		if year_cache is not None and year_cache.repo_root != self.repo_root:
+			year_cache = None
+
+		missing = []
+		for path in paths:
+			year = None if year_cache is None else year_cache.get(path)
+			if year is None:
+				missing.append(path)
+			else:
+				out[path] = year
+
+		if self.revision is None and len(missing) <= GIT_BULK_THRESHOLD:
+			out.update(self.years_from_log(missing))
+			return out
+
+		if self.history is None:
+			logging.info("Scanning the git history for %s creation years...", len(missing))
+			self.history = YearCache(None, self.repo_root)
+			try:
+				self.history.apply_history(self.revision or "HEAD")
+			except subprocess.CalledProcessError:
+				# Ex: a tree id, which has no history
+				logging.warning("Could not scan the history of %s for creation years.", self.revision)
+
+		not_found = []
+		for path in missing:
+			year = self.history.get(path)
+			if year is None:
+				not_found.append(path)
+				continue
+
+			out[path] = year
+			if year_cache is not None:
+				year_cache.set(path, year)
+
+		if self.revision is None:
+			# Left out of the scan (quoted paths, nested repositories) or not tracked: ask git for each
+			out.update(self.years_from_log(not_found))
+
+		return out
+
+	@staticmethod
+	def years_from_log(paths: Sequence[Path]) -> Dict[Path, int]:
+		"""Get the creation years of the given worktree files, running `git log --follow` for each."""
+		out = {}
+		for path in paths:
+			try:
+				out[path] = get_creation_year_from_git(path)
+			except (ValueError, subprocess.CalledProcessError):
+				# Not tracked: leave it to the next provider
+				pass
+
+		return out
+
+
+class MapFileYearProvider(CreationYearProvider):
+	"""
+	Creation years from a precomputed JSON map file.
+	Ex: {"src/main.c": 2019, "src/utils/strings.c": 2021}, paths relative to root.
+	"""
+
+	name = "map"
+
+	def __init__(self, map_path: Path, root: Path) -> None:
+		with open(map_path) as map_file:
+			self.years = {key: int(year) for key, year in json.load(map_file).items()}
+		self.root = root.resolve()
+
+	def years_for(self, paths: Sequence[Path]) -> Dict[Path, int]:
+		out = {}
+		for path in paths:
+			try:
+				# Symlinked directories are resolved, like the root. Not the file itself
+				path_dir = Path(path).absolute().parent.resolve()
+				key = (path_dir / Path(path).name).relative_to(self.root).as_posix()
+			except ValueError:
+				continue
+			if key in self.years:
+				out[path] = self.years[key]
+
+		return out
+
+
+class BirthTimeYearProvider(CreationYearProvider):
+	"""
+	Creation years from the files' birth time, when the filesystem records it.
+	On Linux, python does not expose it: GNU stat gets it through statx(), in bulk.
+	"""
+
+	name = "birthtime"
+
+	def years_for(self, paths: Sequence[Path]) -> Dict[Path, int]:
+		return {
+			path: datetime.fromtimestamp(timestamp).year
+			for path, timestamp in self.birth_times(paths).items()
+			if timestamp > 0
+		}
+
+	@staticmethod
+	def birth_times(paths: Sequence[Path]) -> Dict[Path, float]:
+		"""Get the birth timestamps of the files. 0 or missing if unknown."""
+		if hasattr(os.stat_result, "st_birthtime"):
+			return {path: os.stat(path).st_birthtime for path in paths}
+
+		out = {}
+		for i in range(0, len(paths), STAT_CHUNK_SIZE):
+			chunk = paths[i : i + STAT_CHUNK_SIZE]
+			try:
+				output = subprocess.check_output(
+					["stat", "--printf", "%W\\n", "--", *(str(path) for path in chunk)],
+					stderr=subprocess.DEVNULL,
+				)
+			except (OSError, subprocess.CalledProcessError):
+				# No GNU stat, or a file disappeared: no birth times for this chunk
+				continue
+
+			for path, timestamp in zip(chunk, output.decode().splitlines()):
+				if timestamp.isdigit():
+					out[path] = float(timestamp)
+
+		return out
+
+
+class FixedYearProvider(CreationYearProvider):
+	"""The same year for every file: usually the last provider of the chain."""
+
+	name = "fixed"
+
+	def __init__(self, year: int) -> None:
+		self.year = year
+
+	def years_for(self, paths: Sequence[Path]) -> Dict[Path, int]:
+		return {path: self.year for path in paths}
+
+
+class YearProviderChain:
+	"""
+	Ask each provider in turn for the years the previous ones could not provide.
+	Results are kept, and candidate files are looked up in bulk along with the first unknown file.
+	"""
+
+	def __init__(self, providers: List[CreationYearProvider]) -> None:
+		self.providers = providers
+		self.years: Dict[Path, int] = {}
+		# Files which might need a creation year, see add_candidates()
+		self.candidates: List[Path] = []
+
+	def add_candidates(self, paths: Iterable[Path]) -> None:
+		"""
+		Register files which might need a creation year later.
+		Nothing is looked up yet: if no file ever needs a creation year, nothing is computed.
+		"""
+		self.candidates.extend(Path(path).absolute() for path in paths)
+
+	def years_for(self, paths: Iterable[Path]) -> Dict[Path, int]:
+		"""Get the creation years of the given files from the providers, in bulk."""
+		paths = [Path(path).absolute() for path in paths]
+		missing = list(dict.fromkeys(path for path in paths if path not in self.years))
+
+		for provider in self.providers:
+			if not missing:
+				break
+
+			found = provider.years_for(missing)
+			logging.debug(
+				"Creation years from '%s': %s/%s files", provider.name, len(found), len(missing)
+			)
+			self.years.update(found)
+			missing = [path for path in missing if path not in found]
+
+		return {path: self.years[path] for path in paths if path in self.years}
+
+	def year_for(self, file_path: Path) -> Optional[int]:
+		"""Get the creation year of a file. On the first lookup, the candidates are looked up too."""
+		file_path = Path(file_path).absolute()
+		if file_path not in self.years:
+			self.years_for([file_path, *self.candidates])
+			self.candidates = []
+
+		return self.years.get(file_path)
+
+
+def make_year_provider(
+	names: Sequence[str],
+	target_path: Path,
+	year_map_path: Optional[Path] = None,
+	default_year: Optional[int] = None,
+	revision: Optional[str] = None,
+	skip_shallow_history: bool = False,
+) -> YearProviderChain:
+	"""
+	Build a provider chain from provider names, in order. See PROVIDER_NAMES.
+
+	Args:
+		names (Sequence[str]): Names of the providers, in the order they should be asked.
+		target_path (Path): Root of the processed files. Paths in the map file are relative to it.
+		year_map_path (Path, optional): JSON map file, for the "map" provider.
+		default_year (int, optional): Year of the "fixed" provider. Defaults to the current year.
+		revision (str, optional): Revision whose history the "git" provider scans,
+			instead of looking at the worktree (see --from_tree).
+		skip_shallow_history (bool, optional): Whether the "git" provider skips shallow clones,
+			instead of using their truncated history. Defaults to False.
+
+	Returns:
+		YEAR_PROVIDER (YearProviderChain): The provider chain.
+	"""
+	target_dir = target_path if target_path.is_dir() else target_path.parent
+
+	providers: List[CreationYearProvider] = []
+	for name in names:
+		if name == "git":
+			providers.append(GitYearProvider(target_path, revision, skip_shallow_history))
+		elif name == "map":
+			if year_map_path is None:
+				raise ValueError("The 'map' creation year provider needs a year map file !")
+			providers.append(MapFileYearProvider(year_map_path, target_dir))
+		elif name == "birthtime":
+			providers.append(BirthTimeYearProvider())
+		elif name == "fixed":
+			providers.append(FixedYearProvider(CURRENT_YEAR if default_year is None else default_year))
+		else:
+			raise ValueError(
+				f"Unknown creation year provider '{name}' ! Must be one of {PROVIDER_NAMES}."
+			)
+
+	return YearProviderChain(providers)
+
+
+def set_year_provider(provider: Optional[YearProviderChain]) -> None:
+	"""Set the creation year provider chain. None resets it to the default (git only)."""
+	global YEAR_PROVIDER
+	YEAR_PROVIDER = provider
+
+
+def get_year_provider() -> YearProviderChain:
+	"""Get the creation year provider chain, creating the default one if needed."""
+	global YEAR_PROVIDER
+	if YEAR_PROVIDER is None:
+		YEAR_PROVIDER = YearProviderChain([GitYearProvider()])
+	return YEAR_PROVIDER
+
+
+def add_creation_year_candidates(paths: Iterable[Path]) -> None:
+	"""Register files which might need a creation year, see YearProviderChain.add_candidates()."""
+	get_year_provider().add_candidates(paths)
+
+
+@profile_stage("git")
+def get_creation_year(file_path: Path) -> int:
+	"""Get the creation year of a file from the provider chain."""
+	provider = get_year_provider()
+	year = provider.year_for(file_path)
+
+	if year is None:
+		raise ValueError(
+			"Could not get creation year from any of the providers "
+			f"({', '.join(p.name for p in provider.providers)}). "
+			"Is the file tracked (see --year_providers and --skip_shallow_history) ?"
+		)
+
+	return max(year, MIN_CREATION_YEAR)
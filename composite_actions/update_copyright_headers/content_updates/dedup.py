@@ -0,0 +1,169 @@
+"""
+Within-run deduplication: group files which get the same update, to compute it only once.
+
+- Paths to the same file (hardlinks, symlinks) are always grouped, by (device, inode):
+	the file is only read and written once.
+- Optionally, byte-identical files (vendored copies, generated trees) are grouped too,
+	when they also have the same language, disclaimer decision and creation year:
+	the update is computed once, and written to each of them.
+"""
+# pylint: disable=locally-disabled, unspecified-encoding
+
+# Imports
+import logging
+import os
+from dataclasses import dataclass
+from hashlib import sha256
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from content_updates.copyright_header.year_providers import get_year_provider
+from language_support import get_language
+
+# Globals
+# Size of the blocks read to hash file contents
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+@dataclass
+class FileGroup:
+	"""
+	Files which get the same update: it is computed once, from the first path.
+	Each entry of inodes lists the paths to one file: only the first of them is written.
+	"""
+
+	do_disclaimer: bool
+	inodes: List[List[Path]]
+
+	@property
+	def path(self) -> Path:
+		"""The path the update is computed from."""
+		return self.inodes[0][0]
+
+	@property
+	def paths(self) -> List[Path]:
+		"""All paths of the group."""
+		return [path for paths in self.inodes for path in paths]
+
+	@property
+	def written_paths(self) -> List[Path]:
+		"""The paths written when the group is modified: one per file."""
+		return [paths[0] for paths in self.inodes]
+
+
+def hash_file(file_path: Path) -> str:
+	"""Get the SHA-256 of a file's content."""
+	digest = sha256()
+	with open(file_path, "rb") as file:
+		for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+			digest.update(block)
+	return digest.hexdigest()
+
+
+def group_by_inode(
+	to_update: Iterable[Tuple[Path, bool]]
+) -> Tuple[List[FileGroup], Dict[int, int]]:
+	"""
+	Group the paths to the same file. If they disagree on the disclaimer, the first one wins.
+
+	Returns:
+		GROUPS (Tuple[List[FileGroup], Dict[int, int]]): The groups, in the order of their
+			first path, and the file size of each group (by group index), if it could be read.
+	"""
+	groups: List[FileGroup] = []
+	sizes: Dict[int, int] = {}
+	by_inode: Dict[Hashable, FileGroup] = {}
+	for path, do_disclaimer in to_update:
+		try:
+			stat_result = os.stat(path)
+		except OSError:
+			# Processing the file will report the error
+			groups.append(FileGroup(do_disclaimer, [[path]]))
+			continue
+
+		key = (stat_result.st_dev, stat_result.st_ino)
+		group = by_inode.get(key)
+		if group is None:
+			group = FileGroup(do_disclaimer, [[path]])
+			by_inode[key] = group
+			sizes[len(groups)] = stat_result.st_size
+			groups.append(group)
+			continue
+
+		if group.do_disclaimer != do_disclaimer:
+			logging.warning(
+				"%s and %s are the same file, but disagree on the disclaimer: using the former.",
+				str(group.path),
+				str(path),
+			)
+		group.inodes[0].append(path)
+
+	for group in by_inode.values():
+		if len(group.inodes[0]) > 1:
+			# Write through a regular path: a safe write would replace a symlink with a file
+			group.inodes[0].sort(key=Path.is_symlink)
+
+	return groups, sizes
+
+
+def merge_identical(groups: List[FileGroup], sizes: Dict[int, int]) -> List[FileGroup]:
+	"""
+	Merge the groups of byte-identical files with the same language, disclaimer decision
+	and creation year. Only files with the same size as another one are hashed.
+	"""
+	by_size: Dict[int, List[int]] = {}
+	for index, size in sizes.items():
+		by_size.setdefault(size, []).append(index)
+
+	by_content: Dict[Hashable, List[int]] = {}
+	for indexes in by_size.values():
+		if len(indexes) < 2:
+			continue
+		for index in indexes:
+			group = groups[index]
+			try:
+				key = (hash_file(group.path), get_language(group.path).name, group.do_disclaimer)
+			except (OSError, ValueError):
+				continue
+			by_content.setdefault(key, []).append(index)
+
+	# Identical files only get the same header if they also get the same creation year
+	candidates = [
+		index for indexes in by_content.values() if len(indexes) > 1 for index in indexes
+	]
+	years = get_year_provider().years_for(groups[index].path for index in candidates)
+
+	merged_into: Dict[int, int] = {}
+	for indexes in by_content.values():
+		first_by_year: Dict[Optional[int], int] = {}
+		for index in indexes:
+			year = years.get(groups[index].path.absolute())
+			first = first_by_year.setdefault(year, index)
+			if first != index:
+				groups[first].inodes.extend(groups[index].inodes)
+				merged_into[index] = first
+
+	if merged_into:
+		logging.info(
+			"Deduplication: %s identical files merged into other groups", len(merged_into)
+		)
+	return [group for index, group in enumerate(groups) if index not in merged_into]
+
+
+def group_files(
+	to_update: Iterable[Tuple[Path, bool]], by_content: bool = False
+) -> List[FileGroup]:
+	"""
+	Group the files to update which get the same update. See the module docstring.
+
+	Args:
+		to_update (Iterable[Tuple[Path, bool]]): Files to update, see get_relevant_files().
+		by_content (bool, optional): Also group byte-identical files. Defaults to False.
+
+	Returns:
+		GROUPS (List[FileGroup]): The groups, in the order of their first path.
+	"""
+	groups, sizes = group_by_inode(to_update)
+	if by_content:
+		groups = merge_identical(groups, sizes)
+	return groups
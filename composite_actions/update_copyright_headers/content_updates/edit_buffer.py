@@ -0,0 +1,188 @@
+"""
+Edit buffer: the lines of a file, with the edits of all update stages recorded against them.
+
+The header and disclaimer stages only replace or insert a few lines at the top of the file:
+instead of copying the whole list of lines for each edit, the buffer keeps a list of pieces
+(ranges of the original lines, or of replacement lines), like a piece table.
+The final content is only built once, when the file is written.
+"""
+
+# Imports
+from itertools import chain
+from typing import Iterable, Iterator, List, MutableSequence, Optional, Tuple, Union, overload
+
+# (source, start, stop): the lines source[start:stop]
+Piece = Tuple[List[str], int, int]
+
+
+class EditBuffer(MutableSequence[str]):
+	"""
+	A mutable sequence of lines, recording edits instead of copying the original lines.
+	Supports the list operations used by the update stages: indexing, slicing,
+	slice assignment, insert() and iteration.
+
+	Ex:
+		buffer = EditBuffer(["a\\n", "b\\n"])
+		buffer[0:0] = ["// header\\n"]  # Recorded as an edit, the original list is untouched
+		buffer.materialize() == ["// header\\n", "a\\n", "b\\n"]
+	"""
+
+	__slots__ = ("original", "pieces", "length", "edit_count")
+
+	def __init__(self, lines: List[str]) -> None:
+		self.original = lines
+		self.pieces: List[Piece] = [(lines, 0, len(lines))] if lines else []
+		self.length = len(lines)
+		# Number of edits which actually changed the content
+		self.edit_count = 0
+
+	@property
+	def modified(self) -> bool:
+		"""Whether the content differs from the original lines."""
+		return self.edit_count > 0
+
+	def __len__(self) -> int:
+		return self.length
+
+	def __iter__(self) -> Iterator[str]:
+		return chain.from_iterable(
+			map(source.__getitem__, range(start, stop)) for source, start, stop in self.pieces
+		)
+
+	@overload
+	def __getitem__(self, index: int) -> str:
+		...
+
+	@overload
+	def __getitem__(self, index: slice) -> List[str]:
+		...
+
+	def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+		if isinstance(index, slice):
+			start, stop, step = index.indices(self.length)
+			if step != 1:
+				return list(self)[index]
+			return self.get_lines(start, stop)
+
+		if index < 0:
+			index += self.length
+		if not 0 <= index < self.length:
+			raise IndexError("EditBuffer index out of range")
+
+		position = 0
+		for source, start, stop in self.pieces:
+			if index < position + stop - start:
+				return source[start + index - position]
+			position += stop - start
+
+		raise IndexError("EditBuffer index out of range")
+
+	def __setitem__(self, index: Union[int, slice], value) -> None:
+		if isinstance(index, slice):
+			start, stop, step = index.indices(self.length)
+			if step != 1:
+				raise ValueError("EditBuffer does not support extended slices !")
+			self.replace(start, max(start, stop), value)
+			return
+
+		if index < 0:
+			index += self.length
+		if not 0 <= index < self.length:
+			raise IndexError("EditBuffer assignment index out of range")
+		self.replace(index, index + 1, [value])
+
+	def __delitem__(self, index: Union[int, slice]) -> None:
+		if isinstance(index, slice):
+			self.__setitem__(index, [])
+			return
+
+		if index < 0:
+			index += self.length
+		if not 0 <= index < self.length:
+			raise IndexError("EditBuffer assignment index out of range")
+		self.replace(index, index + 1, [])
+
+	def insert(self, index: int, value: str) -> None:
+		"""Insert a line before index, like list.insert()."""
+		start, _, _ = slice(index, None).indices(self.length)
+		self.replace(start, start, [value])
+
+	def get_lines(self, start: int, stop: int) -> List[str]:
+		"""Returns a copy of the lines between start and stop, without going through all pieces."""
+		out: List[str] = []
+		position = 0
+		for source, piece_start, piece_stop in self.pieces:
+			piece_end = position + piece_stop - piece_start
+			if piece_end > start and position < stop:
+				slice_start = piece_start + max(start - position, 0)
+				slice_stop = piece_start + min(stop, piece_end) - position
+				out.extend(source[slice_start:slice_stop])
+			if piece_end >= stop:
+				break
+			position = piece_end
+
+		return out
+
+	def replace(self, start: int, stop: int, new_lines: Iterable[str]) -> None:
+		"""
+		Replace the lines between start and stop (excluded) with new_lines.
+		Nothing is recorded if the lines are already equal to new_lines.
+		"""
+		new_lines = list(new_lines)
+		if self.get_lines(start, stop) == new_lines:
+			return
+
+		before: List[Piece] = []
+		after: List[Piece] = []
+		position = 0
+		for source, piece_start, piece_stop in self.pieces:
+			piece_end = position + piece_stop - piece_start
+			if position < start:
+				before.append((source, piece_start, piece_start + min(piece_end, start) - position))
+			if piece_end > stop:
+				after.append((source, piece_start + max(stop - position, 0), piece_stop))
+			position = piece_end
+
+		new_piece = [(new_lines, 0, len(new_lines))] if new_lines else []
+		self.pieces = before + new_piece + after
+		self.length += len(new_lines) - (stop - start)
+		self.edit_count += 1
+
+	def materialize(self) -> List[str]:
+		"""Build the final list of lines. Returns the original list itself if it was not modified."""
+		if not self.modified:
+			return self.original
+		return list(self)
+
+	def edited_span(self) -> Optional[Tuple[int, int, List[str]]]:
+		"""
+		Get the range of original lines covered by the edits, and the lines replacing it.
+
+		Returns:
+			SPAN (Optional[Tuple[int, int, List[str]]]): (start, stop, new lines):
+				original[start:stop] was replaced by the new lines. None if nothing was modified.
+		"""
+		if not self.modified:
+			return None
+
+		first, last = 0, len(self.pieces)
+		start, stop = 0, len(self.original)
+
+		# Unchanged original lines at the start and end of the buffer are not part of the span
+		if last > first and self.pieces[0][0] is self.original and self.pieces[0][1] == 0:
+			start = self.pieces[0][2]
+			first += 1
+		if (
+			last > first
+			and self.pieces[-1][0] is self.original
+			and self.pieces[-1][2] == len(self.original)
+		):
+			stop = self.pieces[-1][1]
+			last -= 1
+
+		new_lines = [
+			source[index]
+			for source, piece_start, piece_stop in self.pieces[first:last]
+			for index in range(piece_start, piece_stop)
+		]
+		return start, max(start, stop), new_lines
@@ -1,59 +1,169 @@
-"""
-Define the 'main' function for this module: process_file(().
-This function handles all the header and disclaimer manipulation.
-"""
-# pylint: disable=locally-disabled, unspecified-encoding, global-statement
-
-import logging
-from pathlib import Path
-
-from content_updates.copyright_disclaimer import process_disclaimer
-from content_updates.copyright_header import process_header
-from language_support import get_language
-
-
-# Main function
-def process_file(
-	file_path: Path, do_disclaimer: bool = False, dry_run: bool = False
-) -> None:
-	"""
-	Update the specified file:
-	- Add/Update the copyright header ("(c) Copyright xxxx ACME, Inc. All Rights reserved.")
-	- Optionally add/update the copyright disclaimer (Long disclaimer text). See do_disclaimer arg.
-	
-	
-	If the file alreday contains a header, the years specified will be made up-to-date.
-		--> We assume the earliest year in the header is the year for which the copyright applies.
-		
-	If there is none, a new header will be inserted in the first available safe spot.
-		--> The creation year will be determined using the file's git history.
-		
-	If do_disclaimer is True, we also ass/update a long copyright disclaimer to the file.
-	If the file lareday contains a disclaimer, it will be replaced.
-	If there is none, a new one will be inserted just after the copyright header.
-		--> Such a header must alreday exist !
-		
-	Modifies the specified file.
-	
-	Args:
-		file_path (Path): The path to the file to update.
-		do_disclaimer (bool, optional): Whether to update the copyright discliamer.
-			Defaults to False.
-		dry_run (bool, optional): Dry run: print all changes to be made, but do not write anything.
-			Defaults to False.
-	"""
-	
-	with open(file_path) as file:
-		lines = file.readlines()
-		
-	logging.info("Processing header...")
-	lines = process_header(lines, file_path)
-	
-	if do_disclaimer:
-		file_language = get_language(file_path)
-		logging.info("Processing disclaimer...")
-		lines = process_disclaimer(lines, file_language)
-		
-	if not dry_run:
-		with open(file_path, "w") as file:
-			file.writelines(lines)
+"""
+Define the 'main' function for this module: process_file(().
+This function handles all the header and disclaimer manipulation.
+"""
+# pylint: disable=locally-disabled, unspecified-encoding, global-statement
+
+import logging
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from content_updates.copyright_disclaimer import process_disclaimer
+from content_updates.config import do_rollover
+from content_updates.copyright_header import get_header_index, process_header
+from content_updates.dedup import FileGroup
+from content_updates.edit_buffer import EditBuffer
+from content_updates.write_file import write_file
+from language_support import Language, get_language
+from profiling import profile_stage
+
+
+# Main function
+def update_lines(
+	lines: List[str],
+	file_path: Path,
+	do_disclaimer: bool = False,
+	file_language: Optional[Language] = None,
+) -> EditBuffer:
+	"""
+	Compute the updated content of the specified file's lines, without writing anything.
+	See process_file() for details on the updates done.
+	The lines are not copied: the updates are recorded as edits in the returned buffer.
+	The language is detected from file_path, unless file_language is given.
+	"""
+	new_lines = EditBuffer(lines)
+	if file_language is None:
+		file_language = get_language(file_path)
+
+	logging.debug("Processing header...")
+	process_header(new_lines, file_path, file_language)
+
+	if do_disclaimer:
+		logging.debug("Processing disclaimer...")
+		process_disclaimer(new_lines, file_language)
+
+	return new_lines
+
+
+@profile_stage("read")
+def read_file(file_path: Path) -> Tuple[List[str], bool, str]:
+	"""
+	Read the lines of the specified file.
+
+	Args:
+		file_path (Path): The path to the file to read.
+
+	Returns:
+		CONTENT (Tuple[List[str], bool, str]): The lines of the file, whether they map exactly
+			to the file's bytes (only '\\n' line endings), and the encoding used to read them.
+	"""
+	with open(file_path) as file:
+		lines = file.readlines()
+		# If only '\n' line endings were read, the lines map exactly to the file's bytes
+		exact_newlines = file.newlines in (None, "\n")
+		encoding = file.encoding
+
+	return lines, exact_newlines, encoding
+
+
+def get_updated_lines(
+	file_path: Path, do_disclaimer: bool = False
+) -> Tuple[List[str], EditBuffer]:
+	"""
+	Compute the updated content of the specified file, without writing anything.
+	See process_file() for details on the updates done.
+
+	Args:
+		file_path (Path): The path to the file to update.
+		do_disclaimer (bool, optional): Whether to update the copyright discliamer.
+			Defaults to False.
+
+	Returns:
+		LINES (Tuple[List[str], EditBuffer]): The original and updated lines of the file.
+	"""
+
+	lines, _, _ = read_file(file_path)
+	return lines, update_lines(lines, file_path, do_disclaimer)
+
+
+def process_file(
+	file_path: Path, do_disclaimer: bool = False, dry_run: bool = False
+) -> bool:
+	"""
+	Update the specified file:
+	- Add/Update the copyright header ("(c) Copyright xxxx ACME, Inc. All Rights reserved.")
+	- Optionally add/update the copyright disclaimer (Long disclaimer text). See do_disclaimer arg.
+
+
+	If the file alreday contains a header, the years specified will be made up-to-date.
+		--> We assume the earliest year in the header is the year for which the copyright applies.
+
+	If there is none, a new header will be inserted in the first available safe spot.
+		--> The creation year will be determined using the file's git history.
+
+	If do_disclaimer is True, we also ass/update a long copyright disclaimer to the file.
+	If the file lareday contains a disclaimer, it will be replaced.
+	If there is none, a new one will be inserted just after the copyright header.
+		--> Such a header must alreday exist !
+
+	Modifies the specified file.
+
+	Args:
+		file_path (Path): The path to the file to update.
+		do_disclaimer (bool, optional): Whether to update the copyright discliamer.
+			Defaults to False.
+		dry_run (bool, optional): Dry run: print all changes to be made, but do not write anything.
+			Defaults to False.
+
+	Returns:
+		MODIFIED (bool): Whether the file content was changed by the update.
+	"""
+
+	lines, exact_newlines, encoding = read_file(file_path)
+	new_lines = update_lines(lines, file_path, do_disclaimer)
+
+	if new_lines.modified and not dry_run:
+		write_file(file_path, new_lines, encoding, exact_newlines)
+
+	return new_lines.modified
+
+
+def process_group(group: FileGroup, dry_run: bool = False) -> bool:
+	"""
+	Update all files of a group (see group_files()): the update is computed once,
+	from the group's first path, and written once to each file of the group.
+
+	Args:
+		group (FileGroup): The files to update.
+		dry_run (bool, optional): Dry run: do not write anything. Defaults to False.
+
+	Returns:
+		MODIFIED (bool): Whether the files content was changed by the update.
+	"""
+	header_index = get_header_index()
+	if header_index is not None and do_rollover():
+		# Rollover: only bump the end year of indexed headers, if all files of the group are valid.
+		# All entries are checked before writing anything: otherwise, the full update below would
+		# read a patched file, and find nothing left to update in the others
+		results = [header_index.rollover(path, dry_run=True) for path in group.written_paths]
+		if None not in results:
+			if not dry_run:
+				for path, needs_rollover in zip(group.written_paths, results):
+					if needs_rollover:
+						header_index.rollover(path)
+			return any(results)
+
+	lines, exact_newlines, encoding = read_file(group.path)
+	file_language = get_language(group.path)
+	new_lines = update_lines(lines, group.path, group.do_disclaimer, file_language)
+
+	if new_lines.modified and not dry_run:
+		for path in group.written_paths:
+			write_file(path, new_lines, encoding, exact_newlines)
+
+	if header_index is not None and exact_newlines and not dry_run:
+		# The files now contain new_lines: index them for the next rollover
+		for path in group.written_paths:
+			header_index.record(path, new_lines, file_language, encoding)
+
+	return new_lines.modified
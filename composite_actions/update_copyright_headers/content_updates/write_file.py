@@ -0,0 +1,138 @@
+"""
+Write the updated lines back to the file.
+When the update is a same-size replacement (ex: a year bump '2022 - 2023' -> '2022 - 2024'),
+only the changed bytes are overwritten in place instead of rewriting the whole file.
+"""
+# pylint: disable=locally-disabled, unspecified-encoding
+
+# Imports
+import logging
+import os
+from pathlib import Path
+from shutil import copymode
+from typing import Optional, Tuple
+
+from content_updates.config import do_safe_writes
+from content_updates.edit_buffer import EditBuffer
+from profiling import profile_stage
+
+# Globals
+# Headers (and their surrounding blank lines) are never longer than this
+MAX_EDITED_LINES = 8
+
+
+def get_same_size_edit(
+	new_lines: EditBuffer, encoding: str
+) -> Optional[Tuple[int, bytes, bytes]]:
+	"""
+	Check whether the edits recorded in new_lines are a same-size (in bytes) replacement,
+	spanning at most MAX_EDITED_LINES lines.
+
+	Returns:
+		EDIT (Optional[Tuple[int, bytes, bytes]]): (byte offset, old bytes, new bytes)
+			of the changed byte range, or None if the edit is not a same-size replacement.
+	"""
+	span = new_lines.edited_span()
+	if span is None:
+		return None
+
+	# The edits are recorded against the original lines: no need to compare the whole file
+	first, stop, replacement_lines = span
+	if stop - first > MAX_EDITED_LINES or len(replacement_lines) > MAX_EDITED_LINES:
+		return None
+
+	lines = new_lines.original
+	old_bytes = "".join(lines[first:stop]).encode(encoding)
+	new_bytes = "".join(replacement_lines).encode(encoding)
+	if len(old_bytes) != len(new_bytes) or old_bytes == new_bytes:
+		return None
+
+	# Only keep the bytes which actually changed
+	start = 0
+	while old_bytes[start] == new_bytes[start]:
+		start += 1
+	end = len(old_bytes)
+	while old_bytes[end - 1] == new_bytes[end - 1]:
+		end -= 1
+
+	offset = len("".join(lines[:first]).encode(encoding)) + start
+	return offset, old_bytes[start:end], new_bytes[start:end]
+
+
+def write_in_place(file_path: Path, offset: int, old_bytes: bytes, new_bytes: bytes) -> bool:
+	"""
+	Overwrite old_bytes with new_bytes at the given offset in the file.
+	The current content is checked first: returns False (without writing) if it does not match.
+	"""
+	file_descriptor = os.open(file_path, os.O_RDWR)
+	try:
+		if os.pread(file_descriptor, len(old_bytes), offset) != old_bytes:
+			return False
+
+		os.pwrite(file_descriptor, new_bytes, offset)
+		if do_safe_writes():
+			os.fsync(file_descriptor)
+	finally:
+		os.close(file_descriptor)
+
+	return True
+
+
+def write_lines(file_path: Path, new_lines: EditBuffer) -> None:
+	"""
+	Rewrite the whole file with the new lines: they are streamed from the buffer, never copied.
+	With safe writes enabled, a temporary file is written, synced, then renamed over the file:
+	a crash can never leave a partially written file behind.
+	Hardlinked files are rewritten (and synced) in place instead: a rename would detach them
+	from their other paths.
+	"""
+	# Rename next to the actual file: a symlink must stay a symlink
+	file_path = file_path.resolve()
+
+	if not do_safe_writes() or os.stat(file_path).st_nlink > 1:
+		with open(file_path, "w") as file:
+			file.writelines(new_lines)
+			if do_safe_writes():
+				file.flush()
+				os.fsync(file.fileno())
+		return
+
+	tmp_path = file_path.with_name(f".{file_path.name}.{os.getpid()}.tmp")
+	try:
+		with open(tmp_path, "w") as file:
+			file.writelines(new_lines)
+			file.flush()
+			os.fsync(file.fileno())
+		copymode(file_path, tmp_path)
+		os.replace(tmp_path, file_path)
+	finally:
+		if tmp_path.exists():
+			tmp_path.unlink()
+
+
+@profile_stage("write")
+def write_file(
+	file_path: Path,
+	new_lines: EditBuffer,
+	encoding: str,
+	exact_newlines: bool,
+) -> None:
+	"""
+	Write new_lines to the file, which currently contains new_lines.original.
+	Use the in-place fast path when possible, and fall back to a full rewrite otherwise.
+
+	Args:
+		file_path (Path): The path to the file to update.
+		new_lines (EditBuffer): New content of the file, as edits of its current content.
+		encoding (str): Encoding the file was read with.
+		exact_newlines (bool): Whether the file only had '\\n' line endings when read:
+			otherwise, the text in memory does not map exactly to the bytes in the file.
+	"""
+	# pwrite is POSIX only
+	if exact_newlines and hasattr(os, "pwrite"):
+		edit = get_same_size_edit(new_lines, encoding)
+		if edit is not None and write_in_place(file_path, *edit):
+			logging.debug("Wrote %s bytes in place at offset %s", len(edit[2]), edit[0])
+			return
+
+	write_lines(file_path, new_lines)
@@ -1,6 +1,17 @@
-"""
-Recursively get all files to process. This takes into account:
-- the file extensions for which Language objects are defined
-- the patterns in the 'excludes' file.
-"""
-from file_walk.walk import get_exclude_patterns, get_relevant_files
+"""
+Recursively get all files to process. This takes into account:
+- the file extensions for which Language objects are defined
+- the patterns in the 'excludes' file, and in the nested excludes files of the subdirectories.
+"""
+from file_walk.walk import (
+	DEFAULT_NESTED_EXCLUDES_NAME,
+	DEFAULT_WALK_THREADS,
+	check_file,
+	clear_nested_excludes,
+	get_exclude_patterns,
+	get_excludes_chain,
+	get_relevant_files,
+	scan_dir,
+	set_nested_excludes_name,
+	set_walk_threads,
+)
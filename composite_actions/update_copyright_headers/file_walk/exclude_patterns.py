@@ -0,0 +1,158 @@
+"""
+Compiled exclude patterns, using the CODEOWNERS syntax.
+We only keep the compiled rules from codeowners.CodeOwners: that way, they can be
+serialized in the config cache, and loaded without importing (or re-parsing with) codeowners.
+
+Excludes files nested in subdirectories apply to their subtree, like .gitignore files:
+ExcludesChain evaluates the files of a directory's ancestors, deepest first.
+"""
+
+# Imports
+from functools import lru_cache
+from typing import List, Optional, Pattern, Tuple
+
+# (owner_type, owner) - ex: ("USERNAME", "@exclude")
+OwnerTuple = Tuple[str, str]
+
+# Owners which can make check_file() include a file
+INCLUDE_OWNERS = ("@include", "@disclaimer")
+
+# Characters ending the literal start of a rule regex
+REGEX_SPECIAL_CHARS = ".[(*?+{|^$"
+
+
+@lru_cache(maxsize=None)
+def get_anchored_prefix(regex: str) -> Optional[str]:
+	"""
+	Get the literal path start of an anchored rule regex (see codeowners.path_to_regex()).
+	Ex: the regex of the rule "docs/api/*.md" starts with "docs/api/"
+
+	Returns:
+		PREFIX (Optional[str]): Text all matched paths start with, None if the rule is not anchored.
+	"""
+	if not regex.startswith(r"\A"):
+		return None
+
+	prefix = []
+	chars = iter(regex[2:])
+	for char in chars:
+		if char == "\\":
+			prefix.append(next(chars, ""))
+		elif char in REGEX_SPECIAL_CHARS:
+			break
+		else:
+			prefix.append(char)
+	return "".join(prefix)
+
+
+class ExcludePatterns:
+	"""
+	Exclude rules, matching paths exactly like codeowners.CodeOwners.of() would.
+
+	Ex: ExcludePatterns(".git/ @exclude").of(".git/config") == [("USERNAME", "@exclude")]
+	"""
+
+	__slots__ = ("rules", "space_mask")
+
+	def __init__(self, excludes_text: str) -> None:
+		# Imported here: codeowners is slow to import, and not needed when the config cache is warm
+		# pylint: disable-next=import-outside-toplevel
+		import codeowners
+
+		code_owners = codeowners.CodeOwners(excludes_text)
+
+		# CodeOwners.paths are already ordered by priority (last rule in the file first)
+		self.rules: List[Tuple[Pattern[str], List[OwnerTuple]]] = [
+			(pattern, owners) for pattern, _, owners, _, _ in code_owners.paths
+		]
+		# Spaces in paths are replaced before matching, see codeowners.CodeOwners
+		self.space_mask: str = codeowners.MASK
+
+	def __getstate__(self) -> Tuple[List[Tuple[Pattern[str], List[OwnerTuple]]], str]:
+		return self.rules, self.space_mask
+
+	def __setstate__(self, state: Tuple[List[Tuple[Pattern[str], List[OwnerTuple]]], str]):
+		self.rules, self.space_mask = state
+
+	def match(self, filepath: str) -> Optional[List[OwnerTuple]]:
+		"""Get the owners of the last rule matching filepath (a new list), None if no rule does."""
+		masked_path = filepath.replace(" ", self.space_mask)
+		for pattern, owners in self.rules:
+			if pattern.search(masked_path) is not None:
+				return list(owners)
+
+		return None
+
+	def of(self, filepath: str) -> List[OwnerTuple]:
+		"""Get the owners of the last rule matching filepath. Returns a new list."""
+		owners = self.match(filepath)
+		return [] if owners is None else owners
+
+	def excludes_dir(self, dirpath: str) -> Optional[bool]:
+		"""
+		Whether all paths under a directory are excluded, so that it does not need to be explored.
+
+		Rules match paths up to a '/' or their end: a rule matching "<dirpath>/" matches all paths
+		under the directory. They are excluded if that rule excludes (it has owners, none of
+		INCLUDE_OWNERS), and if no rule of higher priority which includes can match under it.
+
+		Returns:
+			EXCLUDED (Optional[bool]): True if all paths are excluded, False if a rule might include
+				some of them, None if neither: the paths not excluded match no rule.
+		"""
+		masked_path = dirpath.replace(" ", self.space_mask) + "/"
+		for pattern, owners in self.rules:
+			if not owners or any(owner in INCLUDE_OWNERS for _, owner in owners):
+				prefix = get_anchored_prefix(pattern.pattern)
+				if prefix is None or prefix.startswith(masked_path) or masked_path.startswith(prefix):
+					return False
+			elif pattern.search(masked_path) is not None:
+				return True
+
+		return None
+
+
+class ExcludesChain:
+	"""
+	Exclude patterns applying under a directory: those of the excludes files in the directory and
+	in its parents, deepest first, down to the global exclude patterns (whose prefix is "").
+
+	Paths are relative to the root, and each file's rules are matched relative to its directory.
+	The deepest file with a rule matching a path decides: the rules of the other files are not
+	evaluated, so the matching cost depends on the depth of the path, not on the number of files.
+	"""
+
+	__slots__ = ("levels",)
+
+	def __init__(self, levels: Tuple[Tuple[str, ExcludePatterns], ...]) -> None:
+		"""
+		Args:
+			levels (Tuple[Tuple[str, ExcludePatterns], ...]): The patterns of each excludes file,
+				deepest first, with the path of its directory relative to the root, ending with "/".
+		"""
+		self.levels = levels
+
+	def child(self, dir_prefix: str, exclude_patterns: ExcludePatterns) -> "ExcludesChain":
+		"""Get the chain of a subdirectory with its own excludes file. dir_prefix ends with "/"."""
+		return ExcludesChain(((dir_prefix, exclude_patterns),) + self.levels)
+
+	def of(self, filepath: str) -> List[OwnerTuple]:
+		"""Get the owners of the deepest rule matching filepath. Returns a new list."""
+		for dir_prefix, exclude_patterns in self.levels:
+			owners = exclude_patterns.match(filepath[len(dir_prefix) :])
+			if owners is not None:
+				return owners
+
+		return []
+
+	def excludes_dir(self, dirpath: str) -> bool:
+		"""
+		Whether all paths under a directory are excluded, see ExcludePatterns.excludes_dir().
+		Like with .gitignore files, the excludes files under an excluded directory are never read.
+		"""
+		for dir_prefix, exclude_patterns in self.levels:
+			excluded = exclude_patterns.excludes_dir(dirpath[len(dir_prefix) :])
+			if excluded is not None:
+				return excluded
+
+		return False
@@ -1,112 +1,300 @@
-"""Get all files to process. We use a CODEOWNERS-like syntax for the config file."""
-# pylint: disable=locally-disabled, unspecified encoding, global statement
-
-
-import logging
-
-# Imports
-from os import walk
-from pathlib import Path
-from typing import Generator, Optional, Tuple, Union
-
-# Change the name as we are not using this as "real" codeowners
-# pylint disagress with isort on the order of this import...
-# pylint : disable-next=wrong-import-order
-from codeowners import CodeOwners as ExcludePatterns
-from language_support import get_language
-
-# Globals - mostly config values loaded only once on file init
-EXCLUDE_PATTERNS: Union[None, ExcludePatterns] = None
-
-
-# Helper functions
-def get_exclude_patterns(
-	excludes_file_path: Optional[Union[str, Path]] = None
-) -> ExcludePatterns:
-	"""
-	Load the exclude patterns defined in the specified file.
-	The file is only read on the first call to this function, the value is then cached.
-	The return value is a set of re.Pattern objects matching files and directories to exclude.
-	
-	Ex: get_exclude_patterns() == {re.compile(r"exclude_this_dir/.*"), ...)
-	
-	Args:
-		config_path (Union[str, Path], optional): Path to a config file to load.
-			Needs to be specified atleast on the first call to the function.
-			
-	Returns:
-		EXCLUDE_PATTERNS (Set[re.Pattern]): Set containing all the exclude patterns.
-	"""
-	global EXCLUDE_PATTERNS
-	if EXCLUDE_PATTERNS:
-		return EXCLUDE_PATTERNS
-		
-	if excludes_file_path is None:
-		raise ValueError(
-			"Excluded patterns not loaded yet ! Please provide an excludes_file_path."
-		)
-		
-	with open(excludes_file_path) as excludes_file:
-		excludes_text = excludes_file.read()
-		
-	exclude_patterns = ExcludePatterns(excludes_text)
-	EXCLUDE_PATTERNS = exclude_patterns
-	
-	return EXCLUDE_PATTERNS
-	
-	
-def get_relevant_files(
-	root: Union[str, Path], disclaimer_mode: str = "never"
-) -> Generator[Tuple[Path, bool], None, None]:
-	"""
-	Walk the root directory passed in argument.
-	Outputs all files that need to be processed, that is files:
-	- Existing under the root path passed in as argument.
-	- That have a supported language extension (see language_support.py)
-	- That do not match any of the exclusion patterns defined here.
-	
-	The return value of this function is a generator.
-	The directory tree is lazily explored as the generator is consumed.
-	
-	Args:
-		root (Union[str, Path]): Root path to start the exploration.
-		disclaimer_mode (str, optional): See script arg of the same name.
-		
-	Returns:
-		TO_PROGRESS (Generator[Tuple[Path, bool], None, None]): Generator over all relevant files.
-			The boolean represents whether to do disclaimer updates for this file or not.
-	"""
-	
-	root = Path(root).absolute()
-	
-	for dirpath, _, filenames in walk(root, topdown=True):
-		curr_dir = Path(dirpath)
-		
-		for filename in filenames:
-			curr_file = curr_dir.joinpath(filename).absolute()
-			try:
-				_ = get_language(curr_file)
-			except ValueError:
-				# If we get a ValueError, that means this file's language is not supported
-				logging.debug("Ignoring %s... (unsupported language)", str(curr_file))
-				continue
-				
-			matching_patterns = get_exclude_patterns().of(
-				str(curr_file.relative_to(root))
-			)
-			
-			do_disclaimer = False
-			if disclaimer_mode == "config":
-				if ("USERNAME", "@disclaimer") in matching_patterns:
-					do_disclaimer = True
-					matching_patterns.remove("USERNAME", "@disclaimer")
-			elif disclaimer_mode == "always":
-				do_disclaimer = True
-				
-			if ("USERNAME", "@include") in matching_patterns or not matching_patterns:
-				logging.debug("Including %s !", str(curr_file))
-				yield curr_file, do_disclaimer
-				
-				# If we get here, we have some dummy owner - exclude the file.
-				logging.debug("Ignoring %s... (excluded by pattern)", str(curr_file))
-				
+"""Get all files to process. We use a CODEOWNERS-like syntax for the config file."""
+# pylint: disable=locally-disabled, unspecified encoding, global statement
+
+
+import logging
+
+# Imports
+from concurrent.futures import Future, ThreadPoolExecutor
+from os import scandir
+from pathlib import Path
+from typing import Dict, Generator, List, Optional, Tuple, Union
+
+from config_cache import load_cached_config
+from file_walk.exclude_patterns import ExcludePatterns, ExcludesChain
+from language_support import get_language
+
+# Globals - mostly config values loaded only once on file init
+EXCLUDE_PATTERNS: Union[None, ExcludePatterns] = None
+EXCLUDES_FILE_PATH: Optional[Path] = None
+
+# Name of the excludes files applying to their directory's subtree, like .gitignore files
+DEFAULT_NESTED_EXCLUDES_NAME = "COPYRIGHT_EXCLUDES"
+NESTED_EXCLUDES_NAME = DEFAULT_NESTED_EXCLUDES_NAME
+
+# (root, directory) -> exclude patterns applying in the directory, None if it is excluded.
+# Each nested excludes file is loaded once, when its directory is first reached
+EXCLUDES_CHAINS: Dict[Tuple[Path, Path], Optional[ExcludesChain]] = {}
+
+# Number of threads listing directories concurrently (round trips are slow on network filesystems)
+DEFAULT_WALK_THREADS = 8
+WALK_THREADS = DEFAULT_WALK_THREADS
+
+# Entry marking the root of a git repository: a directory, or a file for submodules and worktrees
+GIT_ENTRY = ".git"
+
+
+# Helper functions
+def set_walk_threads(value: int) -> None:
+	"""Set the number of threads listing directories in get_relevant_files(). At least 1."""
+	global WALK_THREADS
+	WALK_THREADS = max(1, value)
+
+
+def set_nested_excludes_name(value: Optional[str]) -> None:
+	"""Set the name of the nested excludes files. None (or "") disables them."""
+	global NESTED_EXCLUDES_NAME
+	NESTED_EXCLUDES_NAME = value or None
+	EXCLUDES_CHAINS.clear()
+
+
+def clear_nested_excludes() -> None:
+	"""Forget the loaded nested excludes files, so that they are read again when needed."""
+	EXCLUDES_CHAINS.clear()
+
+
+def get_exclude_patterns(
+	excludes_file_path: Optional[Union[str, Path]] = None, force_reload: bool = False
+) -> ExcludePatterns:
+	"""
+	Load the exclude patterns defined in the specified file.
+	The file is only read on the first call to this function, the value is then cached.
+	The return value is a set of re.Pattern objects matching files and directories to exclude.
+
+	Ex: get_exclude_patterns() == {re.compile(r"exclude_this_dir/.*"), ...)
+
+	Args:
+		config_path (Union[str, Path], optional): Path to a config file to load.
+			Needs to be specified atleast on the first call to the function.
+		force_reload (bool, optional): Discard the cached value and load excludes_file_path.
+			Defaults to False.
+
+	Returns:
+		EXCLUDE_PATTERNS (Set[re.Pattern]): Set containing all the exclude patterns.
+	"""
+	global EXCLUDE_PATTERNS, EXCLUDES_FILE_PATH
+	if EXCLUDE_PATTERNS and not force_reload:
+		return EXCLUDE_PATTERNS
+
+	if excludes_file_path is None:
+		raise ValueError(
+			"Excluded patterns not loaded yet ! Please provide an excludes_file_path."
+		)
+
+	# Compiled patterns are cached: warm runs skip parsing the rules (and importing codeowners)
+	exclude_patterns = load_cached_config(excludes_file_path, ExcludePatterns)
+	EXCLUDE_PATTERNS = exclude_patterns
+	EXCLUDES_FILE_PATH = Path(excludes_file_path).absolute()
+	# Chains end with the global patterns
+	EXCLUDES_CHAINS.clear()
+
+	return EXCLUDE_PATTERNS
+
+
+def get_excludes_chain(
+	dir_path: Path, root: Path, has_excludes_file: Optional[bool] = None
+) -> Optional[ExcludesChain]:
+	"""
+	Get the exclude patterns applying in a directory: the global ones, and those of the nested
+	excludes files (see NESTED_EXCLUDES_NAME) in the directory and its parents, up to the root.
+	The value is cached per directory, so each nested excludes file is only loaded once.
+
+	Args:
+		dir_path (Path): Absolute path to the directory.
+		root (Path): Absolute root path, exclude patterns are matched relative to it.
+		has_excludes_file (bool, optional): Whether the directory has a nested excludes file,
+			if already known from its listing. Checked on disk otherwise.
+
+	Returns:
+		EXCLUDES_CHAIN (Optional[ExcludesChain]): The patterns, None if the whole directory
+			is excluded (see ExcludesChain.excludes_dir()).
+	"""
+	key = (root, dir_path)
+	if key in EXCLUDES_CHAINS:
+		return EXCLUDES_CHAINS[key]
+
+	# Raises a ValueError for directories outside of the root
+	rel_path = str(dir_path.relative_to(root))
+	chain: Optional[ExcludesChain]
+	if dir_path == root:
+		# The root's own excludes file is the global one (see --excludes_path)
+		chain = ExcludesChain((("", get_exclude_patterns()),))
+	else:
+		chain = get_excludes_chain(dir_path.parent, root)
+		if chain is not None and chain.excludes_dir(rel_path):
+			chain = None
+
+		if chain is not None and NESTED_EXCLUDES_NAME is not None:
+			excludes_path = dir_path.joinpath(NESTED_EXCLUDES_NAME)
+			if has_excludes_file is None:
+				has_excludes_file = excludes_path.is_file()
+			# The global excludes file might be in the tree: it already applies everywhere
+			if has_excludes_file and excludes_path != EXCLUDES_FILE_PATH:
+				logging.debug("Loading nested exclude patterns from %s", str(excludes_path))
+				chain = chain.child(f"{rel_path}/", load_cached_config(excludes_path, ExcludePatterns))
+
+	EXCLUDES_CHAINS[key] = chain
+	return chain
+
+
+def check_file(
+	file_path: Path, root: Path, disclaimer_mode: str = "never"
+) -> Optional[bool]:
+	"""
+	Check whether a file needs to be processed: see get_relevant_files().
+
+	Args:
+		file_path (Path): Absolute path to the file.
+		root (Path): Absolute root path, exclude patterns are matched relative to it.
+		disclaimer_mode (str, optional): See script arg of the same name.
+
+	Returns:
+		DO_DISCLAIMER (Optional[bool]): None if the file must not be processed,
+			else whether to do disclaimer updates for this file.
+	"""
+	try:
+		_ = get_language(file_path)
+	except ValueError:
+		# If we get a ValueError, that means this file's language is not supported
+		logging.debug("Ignoring %s... (unsupported language)", str(file_path))
+		return None
+
+	excludes_chain = get_excludes_chain(file_path.parent, root)
+	if excludes_chain is None:
+		logging.debug("Ignoring %s... (excluded directory)", str(file_path))
+		return None
+
+	matching_patterns = excludes_chain.of(
+		str(file_path.relative_to(root))
+	)
+
+	do_disclaimer = False
+	if disclaimer_mode == "config":
+		if ("USERNAME", "@disclaimer") in matching_patterns:
+			do_disclaimer = True
+			matching_patterns.remove("USERNAME", "@disclaimer")
+	elif disclaimer_mode == "always":
+		do_disclaimer = True
+
+	if ("USERNAME", "@include") in matching_patterns or not matching_patterns:
+		logging.debug("Including %s !", str(file_path))
+		return do_disclaimer
+
+	# If we get here, we have some dummy owner - exclude the file.
+	logging.debug("Ignoring %s... (excluded by pattern)", str(file_path))
+	return None
+
+
+def scan_dir(dir_path: str) -> Tuple[List[str], List[str]]:
+	"""
+	List a directory: the names of its files, and of its subdirectories to explore, sorted.
+	Entry types come from the listing itself (d_type) when the filesystem provides them: no stat.
+	Like os.walk(), symlinks to directories are not explored, and unreadable directories are skipped.
+	"""
+	filenames = []
+	dirnames = []
+	try:
+		with scandir(dir_path) as entries:
+			for entry in entries:
+				try:
+					is_dir = entry.is_dir()
+				except OSError:
+					is_dir = False
+				if not is_dir:
+					filenames.append(entry.name)
+				elif not entry.is_symlink():
+					dirnames.append(entry.name)
+	except OSError as exc:
+		logging.debug("Could not list %s: %s", dir_path, exc)
+
+	filenames.sort()
+	dirnames.sort()
+	return filenames, dirnames
+
+
+def get_relevant_files(
+	root: Union[str, Path],
+	disclaimer_mode: str = "never",
+	start: Optional[Union[str, Path]] = None,
+	nested_repos: Optional[List[Path]] = None,
+) -> Generator[Tuple[Path, bool], None, None]:
+	"""
+	Walk the root directory passed in argument.
+	Outputs all files that need to be processed, that is files:
+	- Existing under the root path passed in as argument.
+	- That have a supported language extension (see language_support.py)
+	- That do not match any of the exclusion patterns defined here.
+
+	The return value of this function is a generator.
+	Directories are listed by a pool of WALK_THREADS threads, ahead of the generator's consumer.
+	Files are still yielded in a stable order: depth-first, sorted by name in each directory.
+	Directories whose paths are all excluded are not explored, see ExcludePatterns.excludes_dir().
+	Nested excludes files (see NESTED_EXCLUDES_NAME) apply to their directory's subtree.
+
+	Args:
+		root (Union[str, Path]): Root path to start the exploration.
+		disclaimer_mode (str, optional): See script arg of the same name.
+		start (Union[str, Path], optional): Only explore this directory under root.
+			Exclude patterns still apply relative to root. Defaults to root.
+		nested_repos (List[Path], optional): If given, the roots of the git repositories nested
+			under root (submodules, or other clones) are appended to it, as they are found.
+			Their files are still yielded.
+
+	Returns:
+		TO_PROGRESS (Generator[Tuple[Path, bool], None, None]): Generator over all relevant files.
+			The boolean represents whether to do disclaimer updates for this file or not.
+	"""
+
+	root = Path(root).absolute()
+	start = root if start is None else Path(start).absolute()
+
+	executor = ThreadPoolExecutor(max_workers=WALK_THREADS, thread_name_prefix="file_walk")
+	# Stack of directories to explore, with their pending listing: a directory's subdirectories
+	# are submitted as soon as it is reached, then explored depth-first in order
+	pending: List[Tuple[Path, "Future[Tuple[List[str], List[str]]]"]] = [
+		(start, executor.submit(scan_dir, str(start)))
+	]
+	try:
+		while pending:
+			curr_dir, listing = pending.pop()
+			filenames, dirnames = listing.result()
+			# Submodules have a .git file, other clones a .git directory
+			if nested_repos is not None and curr_dir != root and (
+				GIT_ENTRY in filenames or GIT_ENTRY in dirnames
+			):
+				logging.debug("Found nested repository %s", str(curr_dir))
+				nested_repos.append(curr_dir)
+			if GIT_ENTRY in filenames:
+				# A gitfile (submodules, worktrees) pointing to the repository: never a source file
+				filenames = [filename for filename in filenames if filename != GIT_ENTRY]
+
+			excludes_chain = get_excludes_chain(
+				curr_dir, root, NESTED_EXCLUDES_NAME is not None and NESTED_EXCLUDES_NAME in filenames
+			)
+			if excludes_chain is None:
+				# Only the start directory can be excluded: subdirectories are checked below
+				logging.debug("Ignoring %s... (excluded directory)", str(curr_dir))
+				continue
+
+			subdirs = []
+			for dirname in dirnames:
+				subdir = curr_dir.joinpath(dirname)
+				if excludes_chain.excludes_dir(str(subdir.relative_to(root))):
+					logging.debug("Ignoring %s... (excluded directory)", str(subdir))
+				else:
+					subdirs.append(subdir)
+			pending.extend(
+				(subdir, executor.submit(scan_dir, str(subdir))) for subdir in reversed(subdirs)
+			)
+
+			for filename in filenames:
+				curr_file = curr_dir.joinpath(filename)
+				do_disclaimer = check_file(curr_file, root, disclaimer_mode)
+				if do_disclaimer is not None:
+					yield curr_file, do_disclaimer
+	finally:
+		# The consumer might stop early: do not list the remaining directories
+		for _, listing in pending:
+			listing.cancel()
+		executor.shutdown()
+
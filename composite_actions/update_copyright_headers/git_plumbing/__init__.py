@@ -0,0 +1,6 @@
+"""
+Low-level git helpers, talking directly to git's plumbing commands.
+This allows creating commits, and reading files, without going through the worktree and the index.
+"""
+from git_plumbing.cat_file import TreeEntry, blob_id, iter_blobs, list_tree
+from git_plumbing.fast_import import FastImportCommitter, run_git
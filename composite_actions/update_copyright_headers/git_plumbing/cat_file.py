@@ -0,0 +1,112 @@
+"""
+Read files straight from git objects, without a worktree: list the files of a tree-ish
+with `git ls-tree`, and read their blobs through a single `git cat-file --batch` process.
+"""
+
+# Imports
+import logging
+import subprocess
+from dataclasses import dataclass
+from hashlib import sha1
+from pathlib import Path
+from threading import Thread
+from typing import IO, Generator, List, Sequence, Tuple, Union
+
+# Globals
+# Modes of the tree entries read as files: symlinks and submodules are left out
+REGULAR_FILE_MODES = ("100644", "100755")
+
+
+@dataclass(frozen=True)
+class TreeEntry:
+	"""A regular file in a tree: its mode, blob id and path (relative to the repository root)."""
+
+	mode: str
+	object_id: str
+	path: str
+
+
+def blob_id(content: bytes) -> str:
+	"""Compute the id git gives to a blob with this content, without writing it."""
+	return sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+def list_tree(repo_path: Union[str, Path], tree_ish: str) -> List[TreeEntry]:
+	"""
+	List the regular files of a tree-ish (commit, tag or tree), recursively.
+
+	Args:
+		repo_path (Union[str, Path]): Path to the repository (its worktree or git directory).
+		tree_ish (str): The tree-ish to list. Ex: "HEAD", "origin/main", "v1.2:src"
+
+	Returns:
+		ENTRIES (List[TreeEntry]): The files of the tree, in git's order.
+	"""
+	output = subprocess.check_output(
+		["git", "ls-tree", "-r", "-z", "--full-tree", tree_ish], cwd=str(repo_path)
+	)
+
+	entries = []
+	for record in output.decode("utf-8", "surrogateescape").split("\0"):
+		if not record:
+			continue
+		info, path = record.split("\t", 1)
+		mode, object_type, object_id = info.split(" ")
+		if object_type == "blob" and mode in REGULAR_FILE_MODES:
+			entries.append(TreeEntry(mode, object_id, path))
+		else:
+			logging.debug("Ignoring %s... (%s %s)", path, object_type, mode)
+
+	return entries
+
+
+def _write_requests(stream: IO[bytes], object_ids: Sequence[str]) -> None:
+	"""Send all object ids to cat-file, then close its input. Runs in its own thread."""
+	try:
+		for object_id in object_ids:
+			stream.write(f"{object_id}\n".encode("ascii"))
+		stream.close()
+	except (BrokenPipeError, ValueError):
+		# The reader stopped early, and cat-file was killed
+		pass
+
+
+def iter_blobs(
+	repo_path: Union[str, Path], object_ids: Sequence[str]
+) -> Generator[Tuple[str, bytes], None, None]:
+	"""
+	Read the content of many blobs through a single `git cat-file --batch` process.
+	Requests are streamed from another thread, so git never waits for the next id.
+
+	Args:
+		repo_path (Union[str, Path]): Path to the repository (its worktree or git directory).
+		object_ids (Sequence[str]): Ids of the blobs to read.
+
+	Returns:
+		BLOBS (Generator[Tuple[str, bytes], None, None]): (object id, content), in the same order.
+	"""
+	# pylint: disable-next=consider-using-with
+	process = subprocess.Popen(
+		["git", "cat-file", "--batch"],
+		cwd=str(repo_path),
+		stdin=subprocess.PIPE,
+		stdout=subprocess.PIPE,
+	)
+	writer = Thread(target=_write_requests, args=(process.stdin, object_ids), daemon=True)
+	writer.start()
+
+	stream: IO[bytes] = process.stdout  # type: ignore
+	try:
+		for object_id in object_ids:
+			# "<id> <type> <size>\n<content>\n", or "<id> missing\n"
+			header = stream.readline().decode("ascii").split()
+			if len(header) != 3:
+				raise ValueError(f"Could not read object {object_id} from git !")
+			content = stream.read(int(header[2]))
+			stream.read(1)
+			yield object_id, content
+	finally:
+		stream.close()
+		process.kill()
+		process.wait()
+		writer.join()
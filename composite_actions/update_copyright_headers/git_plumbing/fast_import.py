@@ -0,0 +1,150 @@
+"""
+Commit updated files by streaming them into `git fast-import`.
+The commit is created directly on top of HEAD (or another commit): the worktree and the index
+are never touched. This also works in bare repositories, see add_blob().
+"""
+
+# Imports
+import logging
+import subprocess
+from os import stat
+from pathlib import Path
+from stat import S_ISLNK, S_IXUSR
+from typing import IO, Optional, Union
+
+
+# Helper functions
+def run_git(repo_path: Union[str, Path], *args: str) -> str:
+	"""Run a git command in the specified repository, and return its stripped output."""
+	return (
+		subprocess.check_output(["git", *args], cwd=str(repo_path))
+		.decode("utf-8")
+		.strip()
+	)
+
+
+def quote_path(path: str) -> str:
+	"""Quote a path for fast-import, if needed (C-style quoting, see `git help fast-import`)."""
+	if not path.startswith('"') and "\n" not in path:
+		return path
+
+	escaped = path.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+	return f'"{escaped}"'
+
+
+class FastImportCommitter:
+	"""
+	Create a single commit on a branch, from the updated content of some files.
+
+	`git fast-import` is only started when the first file is added:
+	if no file is ever added, no commit (and no branch) is created.
+
+	Ex:
+		committer = FastImportCommitter(repo, "copyright_update", "Update headers")
+		committer.add_file(repo / "main.py", b"# Copyright ...")
+		commit_sha = committer.close()
+	"""
+
+	def __init__(
+		self, repo_path: Union[str, Path], branch: str, message: str, parent: str = "HEAD"
+	) -> None:
+		self.repo_path = Path(repo_path).absolute()
+		self.branch = branch
+		self.message = message
+		self.parent = parent
+		self.n_files = 0
+
+		# Paths in the commit are relative to the repository root, not to repo_path.
+		# Only needed by add_file(): bare repositories have no root.
+		self.repo_root: Optional[Path] = None
+
+		self._process: Optional[subprocess.Popen] = None
+
+	@property
+	def _stream(self) -> IO[bytes]:
+		"""Standard input of the fast-import process."""
+		return self._process.stdin # type: ignore
+
+	def _write_data(self, data: bytes) -> None:
+		"""Write a `data` command, using the exact byte count format."""
+		self._stream.write(b"data %d\n" % len(data))
+		self._stream.write(data)
+		self._stream.write(b"\n")
+
+	def _start(self) -> None:
+		"""Start the fast-import process and open the commit, on top of the parent commit."""
+		parent = run_git(self.repo_path, "rev-parse", "--verify", f"{self.parent}^{{commit}}")
+		# Formatted as "Name <email> timestamp timezone", exactly what fast-import expects
+		committer = run_git(self.repo_path, "var", "GIT_COMMITTER_IDENT")
+
+		logging.debug("Starting git fast-import for branch %s", self.branch)
+		# pylint: disable-next=consider-using-with
+		self._process = subprocess.Popen(
+			["git", "fast-import", "--quiet", "--done"],
+			cwd=str(self.repo_path),
+			stdin=subprocess.PIPE,
+		)
+
+		self._stream.write(f"commit refs/heads/{self.branch}\n".encode("utf-8"))
+		self._stream.write(f"committer {committer}\n".encode("utf-8"))
+		self._write_data(self.message.encode("utf-8"))
+		self._stream.write(f"from {parent}\n".encode("utf-8"))
+
+	def add_file(self, file_path: Path, content: bytes) -> None:
+		"""
+		Stream the new content of a file into the commit.
+		The file mode (executable or not) is kept from the file on disk.
+		"""
+		file_path = Path(file_path).absolute()
+		file_stat = stat(file_path, follow_symlinks=False)
+		if S_ISLNK(file_stat.st_mode):
+			raise ValueError(
+				f"Cannot commit {file_path!s} through fast-import: it is a symlink !"
+			)
+
+		if self.repo_root is None:
+			self.repo_root = Path(run_git(self.repo_path, "rev-parse", "--show-toplevel"))
+
+		mode = "100755" if file_stat.st_mode & S_IXUSR else "100644"
+		self.add_blob(file_path.relative_to(self.repo_root).as_posix(), mode, content)
+
+	def add_blob(self, rel_path: str, mode: str, content: bytes) -> None:
+		"""
+		Stream the new content of a file into the commit, without looking at the worktree.
+
+		Args:
+			rel_path (str): Path of the file, relative to the repository root.
+			mode (str): Git mode of the file. Ex: "100644"
+			content (bytes): New content of the file.
+		"""
+		if self._process is None:
+			self._start()
+
+		self._stream.write(f"M {mode} inline {quote_path(rel_path)}\n".encode("utf-8"))
+		self._write_data(content)
+		self.n_files += 1
+
+	def close(self) -> Optional[str]:
+		"""
+		Finish the commit and wait for fast-import to complete.
+
+		Returns:
+			COMMIT_SHA (Optional[str]): The sha of the new commit, or None if no file was added.
+		"""
+		if self._process is None:
+			logging.info("No file updated, no commit created.")
+			return None
+
+		self._stream.write(b"\ndone\n")
+		self._stream.close()
+		return_code = self._process.wait()
+		self._process = None
+
+		if return_code != 0:
+			raise RuntimeError(f"git fast-import failed with code {return_code} !")
+
+		commit_sha = run_git(self.repo_path, "rev-parse", f"refs/heads/{self.branch}")
+		logging.info(
+			"Committed %s files to branch %s (%s)", self.n_files, self.branch, commit_sha
+		)
+		return commit_sha
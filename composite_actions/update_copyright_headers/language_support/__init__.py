@@ -1,12 +1,22 @@
-"""
-Define how different language's comments should be handled.
-All the configuration values should be loaded in a separate yaml config file.
-"""
-
-from language_support.languages import(
-	Language,
-	get_commented_blocks,
-	get_language,
-	load_languages,
-	set_inner_pad,
-)
+"""
+Define how different language's comments should be handled.
+All the configuration values should be loaded in a separate yaml config file.
+"""
+
+from language_support.languages import(
+	DEFAULT_SCAN_WINDOW_CODE_LINES,
+	DEFAULT_SCAN_WINDOW_SIZE,
+	CommentBlock,
+	Language,
+	get_comment_block_regex,
+	get_comment_spans,
+	get_commented_blocks,
+	get_language,
+	get_language_by_name,
+	is_past_scan_window,
+	iter_commented_blocks,
+	iter_commented_blocks_per_line,
+	load_languages,
+	set_inner_pad,
+	set_scan_window,
+)
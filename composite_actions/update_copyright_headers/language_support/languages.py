@@ -1,338 +1,651 @@
-"""Load the languages configs, specify how to handle each languages comments."""
-
-# pylint: disable=loclly-dsiabled, unspecified-encoding
-
-import logging
-import re
-
-# Imports
-from dataclasses import dataclass, field
-from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple, Union
-
-import yaml
-
-
-# Class definition
-@dataclass
-class Language:
-	"""Represents relevant comment-related information for a particular language"""
-	
-	name: str
-	
-	# Single-line comment marker
-	comment_marker: str
-	
-	# Multiline comment markers - some languages do not support them
-	multiline_start: Optional[str] = None
-	multiline_end: Optional[str] = None
-	
-	# Some languages (like XML or HTML) require
-	# something to close their comments, even single-line ones.
-	single_line_end: Optional[str] = None
-
-	# File extensions identifying files of this language
-	extensions: Set[str] = field(default_factory=set)
-	
-	# Filename pattern identifying files of this language
-	# NOTE: THE FILE EXTENSION IS NOT CONSIDERED PART OF THE Filename
-	# --> It should not be located in the pattern
-	filename_pattern: Optional[re.Pattern] = None
-
-	# It is possible to specify both non-empty extensions and a filename_pattern:
-	# If both are specified, a file must have both a valid extensions
-	# AND match the filename_pattern to be considered "of this language"
-	# If filename_pattern is not specified, it is sufficient to have a valid extensions
-	# If extenson is empty, it is sufficient to match filename_pattern
-	# aka the extensions does not matter
-	# If both are unspecified, throw an error
-	
-	def __post_init__(self):
-		"""Validate the class fields"""
-		
-		# Add any missing leading .'s and transform to set
-		self.extensions = {
-			ext if ext.startswith(".") or ext == "" else f".{ext}"
-			for ext in self.extensions
-		}
-		
-		# Compile filename_pattern if it was specified
-		if self.filename_pattern is not None:
-			self.filename_pattern = re.compile(self.filename_pattern)
-			
-		if not self.extensions and not self.filename_pattern:
-			raise ValueError(
-				# pylint: disable-next = line-too-long
-				"Please provide a non-empty `extensions` set (or a filename pattern) for this language."
-			)
-			
-		# Either both multiline markers are nOne, or neither of them are - use xor (^)
-		if (self.multiline_start is None) ^ (self.multiline_end is None):
-			raise ValueError(
-				"Please provide both multiline_start and multiline_end, or neither of them."
-			)
-			
-		# Check values are not empty
-		if self.comment_marker == "":
-			raise ValueError("Comment_marker cannot be empty ! ")
-		
-		if self.multiline_start == "":
-			raise ValueError("multiline_start cannot be empty ! ")
-		
-		if self.multiline_end == "":
-			raise ValueError("multiline_end cannot be empty ! ")
-		
-		if self.single_line_end is None:
-			self.single_line_end = ""
-			
-	def comment_text(self, text:str, disable_multiline: bool = False):
-		"""Comment out the input text according to this language's syntax"""
-		return "".join(self.comment_text_lines(text.splitlines(), disable_multiline))
-		
-	def comment_text_lines(
-		self, lines: List[str], disable_multiline: bool = False
-	) -> List[str]:
-		"""
-		Comment out the input text according to this language's syntax.
-		Takes and returns text as a list of lines.
-		"""
-		out = []
-		
-		if len(lines) > 1 and self.multiline_start and not disable_multiline:
-			# If the language supports multiline comments, and they are enabled, use them
-			out.append(f"{self.multiline_start}\n")
-			out.extend(f"{' '*COMMENT_INNER_PAD}{line.strip()}\n" for line in lines)
-			out.append(f"{self.multiline_end}\n") # type: ignore[arg-type]
-		else:
-			out.extend(
-				# pylint: disable-next=line-too-long
-				f"{self.comment_marker}{''*COMMENT_INNER_PAD}{line.strip()}{self.single_line_end}\n"
-				for line in lines
-			)
-			
-		return out
-		
-		
-# Globals - mostly config values loaded only once on file init
-LANGUAGES: Dict[Union[str, None], Tuple[Language, ...]] = {}
-COMMENT_INNER_PAD: int = 1
-
-
-def set_inner_pad(value: int) -> None:
-	# pylint: disable-next=global-statement
-	global COMMENT_INNER_PAD
-	COMMENT_INNER_PAD = value
-	
-	
-def load_languages(
-	languages_config_path: Optional[Union[str, Path]] = None
-) -> Dict[Union[str, None], Tuple[Language, ...]]:
-	"""
-	Load the languages defined in the config file as Language objects.
-	The file is only read on the first call to this function, the value is then cached.
-	
-	Also see 'get_language'
-	
-	The return value is a dictionary associating file extensions to tuples of Language objects:
-	- Each extension can be associated with multiple languages.
-		--> In this case they must all have a filename_pattern defined, to differentiate them.
-	- The empty string is a valid extension (no extension)
-	- None is a valid key to this dict, for Languages which have an empty `extensions` set.
-		--> Note that this is distinct from  defining an empty extension ({''} != {})
-		--> All these languages must be defined a filename_pattern
-		
-	Ex: get_languages()['.py'] == (Language('Python', ...),)
-	
-	Args:
-		config_path (Union[str, Path], optional): Path to a config file to load.
-			Needs to be specified at least on the first call to the function.
-			
-	Returns:
-		Languages (Dict[Union[str, None], Tuple[Language, ...]]):
-			dictionary associating file extensions to Language objects.
-	"""
-	if LANGUAGES:
-		return LANGUAGES
-		
-	if languages_config_path is None:
-		raise ValueError(
-			"Languages are not loaded yet ! Please specify a `languages_config_path`."
-		)
-		
-	with open(languages_config_path) as config_file:
-		language_configs = yaml.safe_load(config_file)["languages"]
-		
-	languages: Dict[Union[str, None], List[Language]] = {}
-	
-	for language_config in language_configs:
-		language_obj = Language(**language_config)
-		
-		# If extensions is empty, use None as the dict key
-		# Also supress a false mypy complaint
-		extensions = language_obj.extensions or {None} # type: ignore
-		
-		for ext in extensions:
-			if ext in languages:
-				languages[ext].append(language_obj)
-			else:
-				languages[ext] = [language_obj]
-				
-		# Convert all lists to tuples and check filename_patterns are defined where they must
-		for ext, languages_list in languages.items(): # type: ignore
-			# If multiple languages corresponds to the same extension, check they have a filename_pattern
-			if len(languages_list) > 1 and any(
-				lang.filename_pattern is None for lang in languages_list
-			):
-				raise ValueError(
-					f"Multiple languages correspond to extension '{ext}'."
-					+ "Make sure to define `filename_pattern` fo them all to differentiate the !"
-				)
-				
-			LANGUAGES[ext] = tuple(languages_list)
-			
-		return LANGUAGES
-		
-		
-# Helper functions
-
-
-def get_language(file_path: Path) -> Language:
-	"""
-	Get the appropriate Language object for the specified file, based on its path.
-	load_languages() must have been called at least once before calling this function.
-	
-	Ex: get_language(Path("./example.py")) == Langugae('Python', ...)
-	
-	Args:
-		file_path (Path): Path to the file.
-		
-	Returns:
-		file_language (Language): Language object for this file.
-	"""
-	
-	languages = load_languages()
-	suffix = file_path.suffix
-	
-	# First, try to get the language by the file's extension
-	try:
-		candidates = languages[suffix]
-		logging.debug("get_language: File extension match for %s", str(file_path))
-	except KeyError as exc:
-		# No language matches this extension
-		# look for `filename_pattern` matches in extensionless languages
-		if None not in languages:
-			raise ValueError(
-				f"No language matches extension '{suffix}' for file {file_path!s},\
-					and no extensionless languages were defined !"
-			) from exc
-			
-		logging.debug(
-			"get_language: No extension match for %s - checking extensionlesss languages...",
-			str(file_path),
-		)
-		candidates = languages[None]
-		
-	# Among these candidates, either there is only one,
-	# or have to differentiate via filename_pattern
-	if len(candidates) == 1:
-		return candidates[0]
-		
-	logging.debug(
-		"get_language: multiple candidate languages, checking filename_patterns..."
-	)
-	filename = file_path.name
-	filtered_candidates = [
-		candidate
-		for candidate in candidates
-		if re.match(candidate.filename_pattern, filename) # type: ignore
-	]
-	
-	if len(filtered_candidates) == 1:
-		return filtered_candidates[0]
-		
-	# If we get here, there is no way to differentiate furthet
-	raise ValueError(
-		f"Multiple languages match file {file_path!s} !: {filtered_candidates}"
-	)
-	
-	
-def get_commented_blocks(
-	lines: List[str], language: Language
-) -> List[Tuple[int, int, List[str], bool]]:
-	"""
-	Get all comment blocks in the input text.
-	A "block" is a continguos segment of commented-out lines, as large as possible.
-	
-	Note: A block cannot contain both multiline comments and single-line comments !
-	The following will be interpreted as two blocks:
-	
-	/*
-		Block 1
-	*/
-	// Block 2
-	
-	Args:
-		lines (List[str]): List of lines to process.
-		language (Language): The language used in the input lines.
-		
-	Returns:
-		COMMENT_BLOCKS (List[Tuple[int, int, List[str], bool]]): List of all comment blocks.
-		 Each block is represented as (start_line, end_line, text, is_multiline) tuple.
-		  The text is represented as a list of strings, one per line.
-	"""
-	out: List[Tuple[int, int, List[str], bool]] = []
-	buff: List[str] = []
-	
-	in_multiline = False
-	block_start = 0
-	
-	# Inline define flush()
-	def flush_buffer():
-		nonlocal buff # Fancy - allows write access to vars from outer function
-		if buff:
-			block = block_start, block_start + len(buff) -1, buff, in_multiline
-			out.append(block)
-		buff = []
-		
-	for i, line in enumerate(lines):
-		if in_multiline:
-			buff.append(line)
-			if line.strip().endswith(language.multiline_end): #type: ignore	
-				# End of multiline string, need to flush
-				flush_buffer()
-				block_start = i+1
-				in_multiline = False
-			continue
-			
-		if language.multiline_start and line.strip().startswith(
-			language.multiline_start
-		):
-			# Possible start of multiline string:
-			# Might have a one line multiline string
-			# (common for XML comments since comment_marker = multiline_start)
-			
-			# Remove the first instance of multiline_start before proceeding
-			# otherwise when multiline_start == multiline_end the multiline immediately ends
-			line_copy = line.replace(language.multiline_start, "",1) 
-			
-			if not line_copy.strip().endswith(language.multiline_end): #type: ignore	
-				# In this case, we have a real multiline start - flush and set in_multiline
-				flush_buffer()
-				block_start = i
-				in_multiline = True
-				
-			buff.append(line)
-			continue
-			
-		if line.startswith(language.comment_marker):
-			buff.append(line)
-			continue
-			
-		# If we get here, the line is not commented: flush the buffer
-		flush_buffer()
-		block_start = i+1
-		
-	# The buffer might be full after the loop
-	flush_buffer()
-	logging.debug("Blocks: %s", out)
-	return out
+"""Load the languages configs, specify how to handle each languages comments."""
+
+# pylint: disable=loclly-dsiabled, unspecified-encoding
+
+import logging
+import re
+
+# Imports
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from itertools import accumulate, repeat
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from config_cache import load_cached_config
+from profiling import profile_stage
+
+
+# Class definition
+@dataclass
+class Language:
+	"""Represents relevant comment-related information for a particular language"""
+
+	name: str
+
+	# Single-line comment marker
+	comment_marker: str
+
+	# Multiline comment markers - some languages do not support them
+	multiline_start: Optional[str] = None
+	multiline_end: Optional[str] = None
+
+	# Some languages (like XML or HTML) require
+	# something to close their comments, even single-line ones.
+	single_line_end: Optional[str] = None
+
+	# File extensions identifying files of this language
+	extensions: Set[str] = field(default_factory=set)
+
+	# Filename pattern identifying files of this language
+	# NOTE: THE FILE EXTENSION IS NOT CONSIDERED PART OF THE Filename
+	# --> It should not be located in the pattern
+	filename_pattern: Optional[re.Pattern] = None
+
+	# It is possible to specify both non-empty extensions and a filename_pattern:
+	# If both are specified, a file must have both a valid extensions
+	# AND match the filename_pattern to be considered "of this language"
+	# If filename_pattern is not specified, it is sufficient to have a valid extensions
+	# If extenson is empty, it is sufficient to match filename_pattern
+	# aka the extensions does not matter
+	# If both are unspecified, throw an error
+
+	def __post_init__(self):
+		"""Validate the class fields"""
+
+		# Add any missing leading .'s and transform to set
+		self.extensions = {
+			ext if ext.startswith(".") or ext == "" else f".{ext}"
+			for ext in self.extensions
+		}
+
+		# Compile filename_pattern if it was specified
+		if self.filename_pattern is not None:
+			self.filename_pattern = re.compile(self.filename_pattern)
+
+		if not self.extensions and not self.filename_pattern:
+			raise ValueError(
+				# pylint: disable-next = line-too-long
+				"Please provide a non-empty `extensions` set (or a filename pattern) for this language."
+			)
+
+		# Either both multiline markers are nOne, or neither of them are - use xor (^)
+		if (self.multiline_start is None) ^ (self.multiline_end is None):
+			raise ValueError(
+				"Please provide both multiline_start and multiline_end, or neither of them."
+			)
+
+		# Check values are not empty
+		if self.comment_marker == "":
+			raise ValueError("Comment_marker cannot be empty ! ")
+
+		if self.multiline_start == "":
+			raise ValueError("multiline_start cannot be empty ! ")
+
+		if self.multiline_end == "":
+			raise ValueError("multiline_end cannot be empty ! ")
+
+		if self.single_line_end is None:
+			self.single_line_end = ""
+
+	def comment_text(self, text:str, disable_multiline: bool = False):
+		"""Comment out the input text according to this language's syntax"""
+		return "".join(self.comment_text_lines(text.splitlines(), disable_multiline))
+
+	def comment_text_lines(
+		self, lines: List[str], disable_multiline: bool = False
+	) -> List[str]:
+		"""
+		Comment out the input text according to this language's syntax.
+		Takes and returns text as a list of lines.
+		"""
+		out = []
+
+		if len(lines) > 1 and self.multiline_start and not disable_multiline:
+			# If the language supports multiline comments, and they are enabled, use them
+			out.append(f"{self.multiline_start}\n")
+			out.extend(f"{' '*COMMENT_INNER_PAD}{line.strip()}\n" for line in lines)
+			out.append(f"{self.multiline_end}\n") # type: ignore[arg-type]
+		else:
+			out.extend(
+				# pylint: disable-next=line-too-long
+				f"{self.comment_marker}{' '*COMMENT_INNER_PAD}{line.strip()}{self.single_line_end}\n"
+				for line in lines
+			)
+
+		return out
+
+
+class CommentBlock:
+	"""
+	A comment block: a span of lines of a shared buffer (usually the file's lines), never copied.
+	The block stays valid as long as the buffer is not modified.
+
+	Its text normalized for scoring (stripped lines joined by spaces, lowercase) is only built
+	the first time it is needed, then cached.
+	"""
+
+	__slots__ = ("buffer", "start_line", "end_line", "is_multiline", "_normalized_text")
+
+	def __init__(
+		self, buffer: Sequence[str], start_line: int, end_line: int, is_multiline: bool
+	) -> None:
+		"""
+		Args:
+			buffer (Sequence[str]): Lines the block is part of.
+			start_line (int): Index of the first line of the block in the buffer.
+			end_line (int): Index of the last line of the block in the buffer (included).
+			is_multiline (bool): Whether the block is a multiline comment.
+		"""
+		self.buffer = buffer
+		self.start_line = start_line
+		self.end_line = end_line
+		self.is_multiline = is_multiline
+		self._normalized_text: Optional[str] = None
+
+	def __len__(self) -> int:
+		return self.end_line - self.start_line + 1
+
+	def __repr__(self) -> str:
+		return (
+			f"CommentBlock(start_line={self.start_line}, end_line={self.end_line}, "
+			f"is_multiline={self.is_multiline})"
+		)
+
+	def iter_lines(self) -> Iterator[str]:
+		"""Iterate over the lines of the block, read from the buffer."""
+		return map(self.buffer.__getitem__, range(self.start_line, self.end_line + 1))
+
+	@property
+	def lines(self) -> List[str]:
+		"""The lines of the block, as a new list."""
+		return list(self.iter_lines())
+
+	@property
+	def normalized_text(self) -> str:
+		"""The stripped lines of the block joined by spaces, in lowercase. Cached."""
+		if self._normalized_text is None:
+			self._normalized_text = " ".join(line.strip() for line in self.iter_lines()).lower()
+		return self._normalized_text
+
+
+# Globals - mostly config values loaded only once on file init
+LANGUAGES: Dict[Union[str, None], Tuple[Language, ...]] = {}
+COMMENT_INNER_PAD: int = 1
+
+# Top-of-file window searched for comment blocks and prologs (xml declaration, yaml '---')
+# Scanning stops after this many code lines (not blank, not commented)...
+DEFAULT_SCAN_WINDOW_CODE_LINES = 100
+# ... or after this many characters. None means unbounded
+DEFAULT_SCAN_WINDOW_SIZE = 64 * 1024
+SCAN_WINDOW_CODE_LINES: Optional[int] = DEFAULT_SCAN_WINDOW_CODE_LINES
+SCAN_WINDOW_SIZE: Optional[int] = DEFAULT_SCAN_WINDOW_SIZE
+
+# Comment block regexes, per language comment markers (see get_comment_block_regex())
+# Number of top lines scanned first by iter_commented_blocks(), multiplied by 4 until the window ends
+SCAN_CHUNK_LINES = 128
+# Comment lines matched at once by a comment block regex: longer runs are matched in several
+# pieces, merged by get_comment_spans(). The regex engine keeps a backtracking state per
+# repetition: unbounded, it takes several times the size of the run in memory
+COMMENT_RUN_MATCH_LINES = 256
+COMMENT_BLOCK_REGEXES: Dict[Tuple[str, Optional[str], Optional[str]], Optional[re.Pattern]] = {}
+
+
+def set_inner_pad(value: int) -> None:
+	# pylint: disable-next=global-statement
+	global COMMENT_INNER_PAD
+	COMMENT_INNER_PAD = value
+
+
+def set_scan_window(code_lines: Optional[int], size: Optional[int]) -> None:
+	"""Set the top-of-file scan window limits. None means no limit."""
+	# pylint: disable-next=global-statement
+	global SCAN_WINDOW_CODE_LINES, SCAN_WINDOW_SIZE
+	SCAN_WINDOW_CODE_LINES = code_lines
+	SCAN_WINDOW_SIZE = size
+
+
+def is_past_scan_window(code_lines: int, size: int) -> bool:
+	"""Returns True once a scan went through more code lines or characters than the window."""
+	return (SCAN_WINDOW_CODE_LINES is not None and code_lines > SCAN_WINDOW_CODE_LINES) or (
+		SCAN_WINDOW_SIZE is not None and size > SCAN_WINDOW_SIZE
+	)
+
+
+def load_languages(
+	languages_config_path: Optional[Union[str, Path]] = None, force_reload: bool = False
+) -> Dict[Union[str, None], Tuple[Language, ...]]:
+	"""
+	Load the languages defined in the config file as Language objects.
+	The file is only read on the first call to this function, the value is then cached.
+
+	Also see 'get_language'
+
+	The return value is a dictionary associating file extensions to tuples of Language objects:
+	- Each extension can be associated with multiple languages.
+		--> In this case they must all have a filename_pattern defined, to differentiate them.
+	- The empty string is a valid extension (no extension)
+	- None is a valid key to this dict, for Languages which have an empty `extensions` set.
+		--> Note that this is distinct from  defining an empty extension ({''} != {})
+		--> All these languages must be defined a filename_pattern
+
+	Ex: get_languages()['.py'] == (Language('Python', ...),)
+
+	Args:
+		config_path (Union[str, Path], optional): Path to a config file to load.
+			Needs to be specified at least on the first call to the function.
+		force_reload (bool, optional): Discard the loaded languages and load languages_config_path.
+			Defaults to False.
+
+	Returns:
+		Languages (Dict[Union[str, None], Tuple[Language, ...]]):
+			dictionary associating file extensions to Language objects.
+	"""
+	if LANGUAGES and not force_reload:
+		return LANGUAGES
+
+	if languages_config_path is None:
+		raise ValueError(
+			"Languages are not loaded yet ! Please specify a `languages_config_path`."
+		)
+
+	# Parsed languages are cached: warm runs skip both the YAML and the Language objects creation
+	LANGUAGES.clear()
+	LANGUAGES.update(load_cached_config(languages_config_path, parse_languages))
+
+	return LANGUAGES
+
+
+def parse_languages(
+	config_text: str,
+) -> Dict[Union[str, None], Tuple[Language, ...]]:
+	"""
+	Parse the content of a languages config file. See load_languages() for the return value.
+	"""
+	# Imported here: yaml is slow to import, and not needed when the config cache is warm
+	# pylint: disable-next=import-outside-toplevel
+	import yaml
+
+	language_configs = yaml.safe_load(config_text)["languages"]
+
+	languages: Dict[Union[str, None], List[Language]] = {}
+	out: Dict[Union[str, None], Tuple[Language, ...]] = {}
+
+	for language_config in language_configs:
+		language_obj = Language(**language_config)
+
+		# If extensions is empty, use None as the dict key
+		# Also supress a false mypy complaint
+		extensions = language_obj.extensions or {None} # type: ignore
+
+		for ext in extensions:
+			if ext in languages:
+				languages[ext].append(language_obj)
+			else:
+				languages[ext] = [language_obj]
+
+	# Convert all lists to tuples and check filename_patterns are defined where they must
+	for ext, languages_list in languages.items(): # type: ignore
+		# If multiple languages corresponds to the same extension, check they have a filename_pattern
+		if len(languages_list) > 1 and any(
+			lang.filename_pattern is None for lang in languages_list
+		):
+			raise ValueError(
+				f"Multiple languages correspond to extension '{ext}'."
+				+ "Make sure to define `filename_pattern` fo them all to differentiate the !"
+			)
+
+		out[ext] = tuple(languages_list)
+
+	return out
+
+
+# Helper functions
+
+
+def get_language_by_name(name: str) -> Language:
+	"""
+	Get the loaded Language object with the specified name (case insensitive).
+
+	Ex: get_language_by_name("python") == Language('Python', ...)
+	"""
+	for candidates in load_languages().values():
+		for language in candidates:
+			if language.name.lower() == name.lower():
+				return language
+
+	raise ValueError(f"No language named '{name}' is defined !")
+
+
+@profile_stage("language")
+def get_language(file_path: Path) -> Language:
+	"""
+	Get the appropriate Language object for the specified file, based on its path.
+	load_languages() must have been called at least once before calling this function.
+
+	Ex: get_language(Path("./example.py")) == Langugae('Python', ...)
+
+	Args:
+		file_path (Path): Path to the file.
+
+	Returns:
+		file_language (Language): Language object for this file.
+	"""
+
+	languages = load_languages()
+	suffix = file_path.suffix
+
+	# First, try to get the language by the file's extension
+	try:
+		candidates = languages[suffix]
+		logging.debug("get_language: File extension match for %s", str(file_path))
+	except KeyError as exc:
+		# No language matches this extension
+		# look for `filename_pattern` matches in extensionless languages
+		if None not in languages:
+			raise ValueError(
+				f"No language matches extension '{suffix}' for file {file_path!s},\
+					and no extensionless languages were defined !"
+			) from exc
+
+		logging.debug(
+			"get_language: No extension match for %s - checking extensionlesss languages...",
+			str(file_path),
+		)
+		candidates = languages[None]
+
+	# Among these candidates, either there is only one,
+	# or have to differentiate via filename_pattern
+	if len(candidates) == 1:
+		return candidates[0]
+
+	logging.debug(
+		"get_language: multiple candidate languages, checking filename_patterns..."
+	)
+	filename = file_path.name
+	filtered_candidates = [
+		candidate
+		for candidate in candidates
+		if re.match(candidate.filename_pattern, filename) # type: ignore
+	]
+
+	if len(filtered_candidates) == 1:
+		return filtered_candidates[0]
+
+	# If we get here, there is no way to differentiate furthet
+	raise ValueError(
+		f"Multiple languages match file {file_path!s} !: {filtered_candidates}"
+	)
+
+
+def get_comment_block_regex(language: Language) -> Optional[re.Pattern]:
+	"""
+	Get the regex splitting a text in comment blocks, blank lines and code lines.
+	Each match is one of (see the group names):
+	- comments: a run of single-line comments, and one-line multiline comments (common in XML).
+	- multiline: a multiline comment, up to the first line ending with multiline_end.
+	- blank: a run of blank lines.
+	- code: a single line of code.
+	Lines are classified with the same rules as iter_commented_blocks_per_line().
+
+	The regex is compiled once per language, from its comment markers.
+	Returns None for markers with leading or trailing whitespace: the rules are not regular then.
+	"""
+	# Key on the markers, not the name: different configs can define the same language name
+	markers = (language.comment_marker, language.multiline_start, language.multiline_end)
+	if markers in COMMENT_BLOCK_REGEXES:
+		return COMMENT_BLOCK_REGEXES[markers]
+
+	if any(marker is not None and marker != marker.strip() for marker in markers):
+		COMMENT_BLOCK_REGEXES[markers] = None
+		return None
+
+	wspace = r"[^\S\n]*"
+	line_end = r"(?:\n|\Z)"
+	comment_line = rf"{re.escape(language.comment_marker)}.*{line_end}"
+	multiline = ""
+
+	if language.multiline_start:
+		m_start = re.escape(language.multiline_start)
+		m_end = re.escape(language.multiline_end) # type: ignore
+		# A line starting with multiline_start is a comment line if it also ends with multiline_end,
+		# after the start marker: when both markers are the same, a lone marker starts a comment
+		comment_line = (
+			rf"{wspace}{m_start}.*{m_end}{wspace}{line_end}|(?!{wspace}{m_start}){comment_line}"
+		)
+		# The start line is never an end line: the lines after it are, up to the first one ending
+		# with multiline_end (included), or the end of the text
+		multiline = (
+			rf"|(?P<multiline>{wspace}{m_start}.*"
+			+ rf"(?:\n(?!.*{m_end}{wspace}{line_end}).*)*(?:\n.*{m_end}{wspace})?{line_end})"
+		)
+
+	COMMENT_BLOCK_REGEXES[markers] = re.compile(
+		# Never match the empty string at the end of the text
+		rf"(?=[\s\S])(?:(?P<comments>(?:{comment_line}){{1,{COMMENT_RUN_MATCH_LINES}}}){multiline}"
+		+ rf"|(?P<blank>(?:{wspace}\n|[^\S\n]+\Z)+)|(?P<code>.*{line_end}))"
+	)
+	return COMMENT_BLOCK_REGEXES[markers]
+
+
+def get_comment_spans(
+	text: str, language: Language
+) -> Tuple[List[Tuple[int, int, bool]], int]:
+	"""
+	Get the comment blocks in the scan window of a text, as character spans.
+	The text is scanned by the language's comment block regex, see get_comment_block_regex().
+
+	Args:
+		text (str): Text to process, with '\\n' line endings.
+		language (Language): The language used in the input text. Its comment block regex
+			must exist, see get_comment_block_regex().
+
+	Returns:
+		COMMENT_SPANS (Tuple[List[Tuple[int, int, bool]], int]): Comment blocks, in order,
+			and the offset where the scan stopped: before the end of the text if the window did.
+			Each block is represented as (start, end, is_multiline): text[start:end] is the block,
+			including the newline of its last line.
+	"""
+	comment_block_regex = get_comment_block_regex(language)
+
+	# Only the lines which fit entirely in the window are scanned
+	window_end = len(text)
+	if SCAN_WINDOW_SIZE is not None and window_end > SCAN_WINDOW_SIZE:
+		window_end = text.rfind("\n", 0, SCAN_WINDOW_SIZE) + 1
+
+	spans = []
+	code_lines = 0
+	for match in comment_block_regex.finditer(text, 0, window_end): # type: ignore[union-attr]
+		kind = match.lastgroup
+		if kind == "code":
+			code_lines += 1
+			if is_past_scan_window(code_lines, 0):
+				return spans, match.end()
+		elif kind == "comments" and spans and spans[-1][1] == match.start() and not spans[-1][2]:
+			# Long runs of comment lines are matched in several pieces
+			spans[-1] = (spans[-1][0], match.end(), False)
+		elif kind != "blank":
+			spans.append((match.start(), match.end(), kind == "multiline"))
+
+	return spans, window_end
+
+
+def iter_commented_blocks(
+	lines: Sequence[str], language: Language
+) -> Iterator[CommentBlock]:
+	"""
+	Lazily get the comment blocks in the input text, from the top of the file.
+	A "block" is a continguos segment of commented-out lines, as large as possible.
+
+	Only the top-of-file scan window is searched (see set_scan_window()):
+	the scan stops after SCAN_WINDOW_CODE_LINES code lines, or SCAN_WINDOW_SIZE characters.
+	In the last case, the last block might be cut short.
+
+	Note: A block cannot contain both multiline comments and single-line comments !
+	The following will be interpreted as two blocks:
+
+	/*
+		Block 1
+	*/
+	// Block 2
+
+	The top lines are joined and scanned at once by the language's comment block regex
+	(see get_comment_spans()), then the spans are mapped back to lines. If the scan window
+	goes on after them, the scan starts over with 4 times as many lines.
+	Lines which do not map to a text (empty, '\\n' missing or in the middle of a line) are
+	classified one by one instead, see iter_commented_blocks_per_line().
+
+	Args:
+		lines (Sequence[str]): Lines to process.
+		language (Language): The language used in the input lines.
+
+	Returns:
+		COMMENT_BLOCKS (Iterator[CommentBlock]): Comment blocks, in order.
+			Each block is a span of the input lines, see CommentBlock.
+	"""
+	if get_comment_block_regex(language) is None:
+		yield from iter_commented_blocks_per_line(lines, language)
+		return
+
+	# Most files have enough code lines to end the window in their first lines:
+	# only join more lines if it goes on after them
+	n_lines = SCAN_CHUNK_LINES
+	while True:
+		window = lines[:n_lines]
+		is_complete = n_lines >= len(lines)
+		# Offset of the end of each line, to map the spans back to lines.
+		# The window ends with the last line which fits entirely in it
+		line_ends = list(accumulate(map(len, window)))
+		if SCAN_WINDOW_SIZE is not None and line_ends and line_ends[-1] > SCAN_WINDOW_SIZE:
+			del line_ends[bisect_right(line_ends, SCAN_WINDOW_SIZE) :]
+			window = window[: len(line_ends)]
+			is_complete = True
+		text = "".join(window)
+
+		n_newlines = len(window) - (not window[-1].endswith("\n")) if window else 0
+		if (
+			(window and not window[-1])
+			or text.count("\n") != n_newlines
+			or not all(map(str.endswith, window[:-1], repeat("\n")))
+		):
+			yield from iter_commented_blocks_per_line(lines, language)
+			return
+
+		spans, scan_end = get_comment_spans(text, language)
+		if is_complete or scan_end < len(text):
+			break
+		n_lines *= 4
+
+	blocks = [
+		CommentBlock(lines, bisect_right(line_ends, start), bisect_left(line_ends, end), is_multiline)
+		for start, end, is_multiline in spans
+	]
+	# The blocks only point to the input lines: release the joined text while they are used
+	del window, text, line_ends
+	yield from blocks
+
+
+def iter_commented_blocks_per_line(
+	lines: Sequence[str], language: Language
+) -> Iterator[CommentBlock]:
+	"""
+	Reference implementation of iter_commented_blocks(), classifying the lines one by one.
+	Used for inputs the comment block regex cannot scan (see iter_commented_blocks()).
+
+	Lazily get the comment blocks in the input text, from the top of the file.
+	A "block" is a continguos segment of commented-out lines, as large as possible.
+
+	Only the top-of-file scan window is searched (see set_scan_window()):
+	the scan stops after SCAN_WINDOW_CODE_LINES code lines, or SCAN_WINDOW_SIZE characters.
+	In the last case, the last block might be cut short.
+
+	Note: A block cannot contain both multiline comments and single-line comments !
+	The following will be interpreted as two blocks:
+
+	/*
+		Block 1
+	*/
+	// Block 2
+
+	Args:
+		lines (Sequence[str]): Lines to process.
+		language (Language): The language used in the input lines.
+
+	Returns:
+		COMMENT_BLOCKS (Iterator[CommentBlock]): Comment blocks, in order.
+			Each block is a span of the input lines, see CommentBlock.
+	"""
+	# Number of lines in the current block
+	block_len = 0
+
+	in_multiline = False
+	block_start = 0
+
+	# Scan window counters
+	code_lines = 0
+	size = 0
+
+	for i, line in enumerate(lines):
+		size += len(line)
+		if is_past_scan_window(code_lines, size):
+			break
+
+		if in_multiline:
+			block_len += 1
+			if line.strip().endswith(language.multiline_end): #type: ignore	
+				# End of multiline string, need to flush
+				yield CommentBlock(lines, block_start, block_start + block_len - 1, in_multiline)
+				block_len = 0
+				block_start = i+1
+				in_multiline = False
+			continue
+
+		if language.multiline_start and line.strip().startswith(
+			language.multiline_start
+		):
+			# Possible start of multiline string:
+			# Might have a one line multiline string
+			# (common for XML comments since comment_marker = multiline_start)
+
+			# Remove the first instance of multiline_start before proceeding
+			# otherwise when multiline_start == multiline_end the multiline immediately ends
+			line_copy = line.replace(language.multiline_start, "",1) 
+
+			if not line_copy.strip().endswith(language.multiline_end): #type: ignore	
+				# In this case, we have a real multiline start - flush and set in_multiline
+				if block_len:
+					yield CommentBlock(lines, block_start, block_start + block_len - 1, in_multiline)
+					block_len = 0
+				block_start = i
+				in_multiline = True
+
+			block_len += 1
+			continue
+
+		if line.startswith(language.comment_marker):
+			block_len += 1
+			continue
+
+		# If we get here, the line is not commented: flush the block
+		if block_len:
+			yield CommentBlock(lines, block_start, block_start + block_len - 1, in_multiline)
+			block_len = 0
+		block_start = i+1
+		if line.strip():
+			code_lines += 1
+
+	# The block might still be open after the loop
+	if block_len:
+		yield CommentBlock(lines, block_start, block_start + block_len - 1, in_multiline)
+
+
+def get_commented_blocks(
+	lines: Sequence[str], language: Language
+) -> List[CommentBlock]:
+	"""
+	Get all comment blocks in the scan window of the input text, as a list.
+	See iter_commented_blocks() for details.
+	"""
+	out = list(iter_commented_blocks(lines, language))
+	logging.debug("Blocks: %s", out)
+	return out
@@ -0,0 +1,10 @@
+"""
+Opt-in profiling of a run (see --profile): cProfile stats, tracemalloc snapshots,
+and the time spent in each processing stage for the slowest files.
+"""
+from profiling.profiler import (
+	PROFILE_STAGES,
+	get_profiler,
+	profile_stage,
+	start_profiler,
+)
@@ -0,0 +1,227 @@
+"""
+Collect profiling data for a run, and write it to an output directory:
+- profile.pstats / profile.txt: cProfile stats of the whole run, or of sampled files only.
+- memory.snapshot / memory_top.txt: tracemalloc snapshot at the end of the run, if enabled.
+- slowest_files.json: the slowest files, with the time spent in each stage (see PROFILE_STAGES).
+"""
+# pylint: disable=locally-disabled, unspecified-encoding, global-statement
+
+# Imports
+import cProfile
+import heapq
+import json
+import logging
+import pstats
+import tracemalloc
+from dataclasses import dataclass, field
+from functools import wraps
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+# Globals
+PROFILER: Optional["RunProfiler"] = None
+
+# Stages timed for each file. Time spent in a nested stage is not counted in its parent.
+# "git" is the creation year lookup, which usually goes through the git history.
+PROFILE_STAGES = ("read", "language", "header", "git", "disclaimer", "write")
+
+# Number of lines in the text summaries
+N_SUMMARY_LINES = 40
+
+FunctionType = TypeVar("FunctionType", bound=Callable[..., Any])
+
+
+@dataclass
+class FileTimings:
+	"""Time spent processing one file, in seconds, in total and per stage."""
+
+	path: str
+	total: float = 0.0
+	stages: Dict[str, float] = field(default_factory=dict)
+
+
+class RunProfiler:
+	"""
+	Profile a run: the main loop calls start_file() and end_file() around each file,
+	and the stage timers (see profile_stage()) record the time spent in each stage.
+	"""
+
+	def __init__(
+		self, output_dir: Path, sample_every: int, trace_memory: bool, top_n: int
+	) -> None:
+		"""
+		Args:
+			output_dir (Path): Directory where the profiling data is written.
+			sample_every (int): Only run cProfile for one file out of sample_every.
+				0 profiles the whole run instead.
+			trace_memory (bool): Whether to trace memory allocations with tracemalloc.
+			top_n (int): Number of slowest files to report.
+		"""
+		self.output_dir = output_dir
+		self.sample_every = sample_every
+		self.trace_memory = trace_memory
+		self.top_n = top_n
+
+		self.profile = cProfile.Profile()
+		self.n_files = 0
+		self.stage_totals: Dict[str, float] = dict.fromkeys(PROFILE_STAGES, 0.0)
+		# Min-heap of (total time, file index, timings): the slowest files seen so far
+		self.slowest: List[Tuple[float, int, FileTimings]] = []
+
+		# File being processed, and its stack of running stages: [stage, start time]
+		self.current: Optional[FileTimings] = None
+		self.file_start = 0.0
+		self.stack: List[List[Any]] = []
+		self.sampling = False
+
+	def start(self) -> None:
+		"""Start profiling the run."""
+		self.output_dir.mkdir(parents=True, exist_ok=True)
+		if self.trace_memory:
+			tracemalloc.start()
+		if self.sample_every == 0:
+			self.profile.enable()
+
+	def start_file(self, path_str: str) -> None:
+		"""Start timing a file."""
+		self.current = FileTimings(path_str)
+		self.stack = []
+		self.sampling = self.sample_every > 0 and self.n_files % self.sample_every == 0
+		if self.sampling:
+			self.profile.enable()
+		self.file_start = perf_counter()
+
+	def end_file(self) -> None:
+		"""Stop timing the current file, and keep its timings if it is one of the slowest."""
+		if self.current is None:
+			return
+
+		self.current.total = perf_counter() - self.file_start
+		if self.sampling:
+			self.profile.disable()
+
+		for stage, duration in self.current.stages.items():
+			self.stage_totals[stage] += duration
+
+		entry = (self.current.total, self.n_files, self.current)
+		if len(self.slowest) < self.top_n:
+			heapq.heappush(self.slowest, entry)
+		elif self.top_n > 0:
+			heapq.heappushpop(self.slowest, entry)
+
+		self.n_files += 1
+		self.current = None
+
+	def stage_start(self, stage: str) -> None:
+		"""Start a stage of the current file. The running stage (if any) is paused."""
+		now = perf_counter()
+		if self.stack:
+			self.add_stage_time(self.stack[-1][0], now - self.stack[-1][1])
+		self.stack.append([stage, now])
+
+	def stage_end(self) -> None:
+		"""End the running stage of the current file, and resume its parent."""
+		now = perf_counter()
+		stage, start = self.stack.pop()
+		self.add_stage_time(stage, now - start)
+		if self.stack:
+			self.stack[-1][1] = now
+
+	def add_stage_time(self, stage: str, duration: float) -> None:
+		"""Add time spent in a stage to the current file."""
+		if self.current is not None:
+			self.current.stages[stage] = self.current.stages.get(stage, 0.0) + duration
+
+	def finish(self) -> None:
+		"""Stop profiling, and write all collected data to the output directory."""
+		self.profile.disable()
+
+		# Snapshot first, so that the allocations done to write the stats are not in it
+		if self.trace_memory:
+			snapshot = tracemalloc.take_snapshot()
+			tracemalloc.stop()
+			snapshot.dump(str(self.output_dir.joinpath("memory.snapshot")))
+			with open(self.output_dir.joinpath("memory_top.txt"), "w") as memory_file:
+				for statistic in snapshot.statistics("lineno")[:N_SUMMARY_LINES]:
+					memory_file.write(f"{statistic}\n")
+
+		profile_path = self.output_dir.joinpath("profile.pstats")
+		self.profile.dump_stats(str(profile_path))
+		with open(self.output_dir.joinpath("profile.txt"), "w") as summary_file:
+			try:
+				stats = pstats.Stats(str(profile_path), stream=summary_file)
+				stats.sort_stats("cumulative").print_stats(N_SUMMARY_LINES)
+			except TypeError:
+				# Nothing was profiled (ex: sampling with no files)
+				summary_file.write("No profiling data.\n")
+
+		slowest = [
+			{
+				"path": timings.path,
+				"total_ms": timings.total * 1000,
+				"stages_ms": {stage: duration * 1000 for stage, duration in timings.stages.items()},
+			}
+			for _, _, timings in sorted(self.slowest, reverse=True)
+		]
+		with open(self.output_dir.joinpath("slowest_files.json"), "w") as slowest_file:
+			json.dump(
+				{
+					"n_files": self.n_files,
+					"sample_every": self.sample_every,
+					"stage_totals_ms": {
+						stage: duration * 1000 for stage, duration in self.stage_totals.items()
+					},
+					"slowest": slowest,
+				},
+				slowest_file,
+				indent=2,
+			)
+
+		logging.info("Profiling data written to %s", str(self.output_dir))
+		for entry in slowest[:5]:
+			logging.info(
+				"Slow file: %s (%.1f ms): %s",
+				entry["path"],
+				entry["total_ms"],
+				", ".join(f"{stage} {ms:.1f} ms" for stage, ms in entry["stages_ms"].items()),
+			)
+
+
+def start_profiler(
+	output_dir: Path, sample_every: int = 0, trace_memory: bool = False, top_n: int = 20
+) -> RunProfiler:
+	"""Create and start the run profiler. See RunProfiler for the arguments."""
+	global PROFILER
+	PROFILER = RunProfiler(output_dir, sample_every, trace_memory, top_n)
+	PROFILER.start()
+	return PROFILER
+
+
+def get_profiler() -> Optional[RunProfiler]:
+	"""Get the run profiler, None if profiling is disabled."""
+	return PROFILER
+
+
+def profile_stage(stage: str) -> Callable[[FunctionType], FunctionType]:
+	"""
+	Decorator: count the time spent in the function as the given stage of the current file.
+	Without a running profiler, the only overhead is a global lookup.
+	"""
+
+	def decorator(function: FunctionType) -> FunctionType:
+		@wraps(function)
+		def wrapper(*args, **kwargs):
+			profiler = PROFILER
+			if profiler is None or profiler.current is None:
+				return function(*args, **kwargs)
+
+			profiler.stage_start(stage)
+			try:
+				return function(*args, **kwargs)
+			finally:
+				profiler.stage_end()
+
+		return wrapper  # type: ignore[return-value]
+
+	return decorator
@@ -0,0 +1,12 @@
+"""
+Progress reporting for long runs: a compact status line at a fixed interval,
+instead of several log lines per file, and an optional JSONL file of per-file events.
+"""
+from progress_reporting.event_writer import EventWriter
+from progress_reporting.reporter import (
+	DEFAULT_PROGRESS_INTERVAL,
+	STATUS_ERROR,
+	STATUS_MODIFIED,
+	STATUS_SKIPPED,
+	ProgressReporter,
+)
@@ -0,0 +1,61 @@
+"""
+Write per-file events as JSON lines, from a background thread:
+the processing loop only pushes events to a queue, serializing and writing them happens in parallel.
+"""
+# pylint: disable=locally-disabled, unspecified-encoding
+
+# Imports
+import json
+import logging
+from pathlib import Path
+from queue import SimpleQueue
+from threading import Thread
+from typing import Any, Dict, Optional
+
+# Globals
+# Size of the output file buffer, in bytes
+EVENT_BUFFER_SIZE = 1024 * 1024
+
+
+class EventWriter:
+	"""
+	Buffered JSONL writer, running in a background thread.
+
+	Ex:
+		writer = EventWriter(Path("events.jsonl"))
+		writer.write({"path": "src/main.c", "status": "modified"})
+		writer.close()  # Flushes all pending events
+	"""
+
+	def __init__(self, output_path: Path) -> None:
+		self.output_path = output_path
+		self.queue: "SimpleQueue[Optional[Dict[str, Any]]]" = SimpleQueue()
+		# Opened here, so that an invalid path fails before processing starts
+		self.output_file = open(output_path, "w", buffering=EVENT_BUFFER_SIZE)
+		self.thread = Thread(target=self.run, name="event-writer", daemon=True)
+		self.thread.start()
+
+	def write(self, event: Dict[str, Any]) -> None:
+		"""Queue an event to be written."""
+		self.queue.put(event)
+
+	def run(self) -> None:
+		"""Background thread: write queued events until close() is called."""
+		try:
+			while True:
+				event = self.queue.get()
+				if event is None:
+					break
+				self.output_file.write(json.dumps(event, separators=(",", ":")))
+				self.output_file.write("\n")
+		# pylint: disable-next=broad-exception-caught
+		except Exception as exc:
+			# Never block the run because of the event file: drop the remaining events
+			logging.error("Error while writing events to %s !: %s", str(self.output_path), exc)
+		finally:
+			self.output_file.close()
+
+	def close(self) -> None:
+		"""Write all pending events, and close the file."""
+		self.queue.put(None)
+		self.thread.join()
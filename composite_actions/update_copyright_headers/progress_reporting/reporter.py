@@ -0,0 +1,148 @@
+"""
+Report the progress of a run as a single status line, at most once per interval:
+files/s, ETA, and the number of modified, skipped (already up-to-date) and failed files.
+Per-file details are only logged at the DEBUG level, or written to an event file (see EventWriter).
+"""
+
+# Imports
+import logging
+from time import monotonic
+from typing import Optional
+
+from progress_reporting.event_writer import EventWriter
+
+# Globals
+# Seconds between two status lines
+DEFAULT_PROGRESS_INTERVAL = 10.0
+
+STATUS_MODIFIED = "modified"
+STATUS_SKIPPED = "skipped"
+STATUS_ERROR = "error"
+
+
+def format_duration(seconds: float) -> str:
+	"""Format a duration for the status line. Ex: 3725 -> '1h02m05s'."""
+	minutes, seconds = divmod(int(seconds), 60)
+	hours, minutes = divmod(minutes, 60)
+	if hours:
+		return f"{hours}h{minutes:02d}m{seconds:02d}s"
+	if minutes:
+		return f"{minutes}m{seconds:02d}s"
+	return f"{seconds}s"
+
+
+class ProgressReporter:
+	"""
+	Count processed files, and log a status line when the interval has elapsed.
+
+	Ex:
+		[10012 ms] Progress: 21500/500000 files (4.3%), 2150.0 files/s, ETA 3m42s:
+		    310 modified, 21188 skipped, 2 errors
+	"""
+
+	def __init__(
+		self,
+		total: int = 0,
+		interval: float = DEFAULT_PROGRESS_INTERVAL,
+		event_writer: Optional[EventWriter] = None,
+	) -> None:
+		"""
+		Args:
+			total (int, optional): Number of files to process, for the percentage and ETA.
+				More can be added later with add_total(). Defaults to 0.
+			interval (float, optional): Minimum number of seconds between two status lines.
+				0 logs a status line after every file. Defaults to DEFAULT_PROGRESS_INTERVAL.
+			event_writer (EventWriter, optional): Where per-file events are written, if any.
+		"""
+		self.total = total
+		self.interval = interval
+		self.event_writer = event_writer
+
+		self.n_done = 0
+		self.n_modified = 0
+		self.n_skipped = 0
+		self.n_errors = 0
+
+		self.start_time = monotonic()
+		self.last_report = self.start_time
+		# Number of processed files in the last status line
+		self.reported_done = -1
+
+	def add_total(self, n_files: int) -> None:
+		"""Add files to process, when they are not all known at the start."""
+		self.total += n_files
+
+	def file_done(
+		self, path_str: str, status: str, duration: float = 0.0, error: Optional[str] = None
+	) -> None:
+		"""
+		Record a processed file.
+
+		Args:
+			path_str (str): Path of the file, for the event file and the debug log.
+			status (str): One of STATUS_MODIFIED, STATUS_SKIPPED or STATUS_ERROR.
+			duration (float, optional): Time spent processing the file, in seconds.
+			error (str, optional): Description of the error, if status is STATUS_ERROR.
+		"""
+		logging.debug("%s: %s", path_str, status)
+		if self.event_writer is not None:
+			event = {
+				"path": path_str,
+				"status": status,
+				"duration_ms": round(duration * 1000, 3),
+			}
+			if error is not None:
+				event["error"] = error
+			self.event_writer.write(event)
+
+		self.add_done(
+			modified=status == STATUS_MODIFIED,
+			skipped=status == STATUS_SKIPPED,
+			errors=status == STATUS_ERROR,
+		)
+
+	def add_done(self, modified: int = 0, skipped: int = 0, errors: int = 0) -> None:
+		"""Record processed files by count only (ex: a whole chunk processed by a worker)."""
+		self.n_modified += modified
+		self.n_skipped += skipped
+		self.n_errors += errors
+		self.n_done += modified + skipped + errors
+
+		now = monotonic()
+		if now - self.last_report >= self.interval:
+			self.last_report = now
+			self.report(now)
+
+	def report(self, now: Optional[float] = None) -> None:
+		"""Log the status line."""
+		self.reported_done = self.n_done
+		elapsed = (monotonic() if now is None else now) - self.start_time
+		rate = self.n_done / elapsed if elapsed > 0 else 0.0
+
+		if self.total > 0:
+			progress = f"{self.n_done}/{self.total} files ({100 * self.n_done / self.total:.1f}%)"
+		else:
+			progress = f"{self.n_done} files"
+		eta = (
+			f", ETA {format_duration((self.total - self.n_done) / rate)}"
+			if rate > 0 and self.total > self.n_done
+			else ""
+		)
+
+		logging.info(
+			"Progress: %s, %.1f files/s%s: %s modified, %s skipped, %s errors",
+			progress,
+			rate,
+			eta,
+			self.n_modified,
+			self.n_skipped,
+			self.n_errors,
+		)
+
+	def finish(self) -> None:
+		"""Log the final status line (unless it was just logged), and write all pending events."""
+		if self.reported_done != self.n_done:
+			self.report()
+		logging.info("Total time: %s", format_duration(monotonic() - self.start_time))
+		if self.event_writer is not None:
+			self.event_writer.close()
@@ -0,0 +1,7 @@
+"""
+Resumable sweeps, for repositories too large to process within a single job:
+a time budget stopping the run cleanly, a journal of the files already processed
+to resume from on the next run, and an order processing the most valuable files first.
+"""
+from resumable_sweeps.journal import DEFAULT_FSYNC_INTERVAL, SweepJournal
+from resumable_sweeps.priority import prioritize_groups, sweep_priority
@@ -0,0 +1,159 @@
+"""
+Journal of a sweep: the files already processed, so that the next run resumes after them.
+
+The journal is a JSON lines file, only ever appended to:
+- a header: {"version": 1, "target": "/path/to/target"}
+- one line per processed file: its path relative to the target, as a JSON string.
+- a completion marker once all files were processed: {"complete": true}
+The next run after a complete sweep starts a new one. A torn last line (killed run) is ignored.
+"""
+# pylint: disable=locally-disabled, unspecified-encoding
+
+# Imports
+import json
+import logging
+import os
+from pathlib import Path
+from time import monotonic
+from typing import IO, Iterable, Optional, Set
+
+# Globals
+# Bump this when the journal format changes: journals with another version are discarded
+JOURNAL_VERSION = 1
+
+# Seconds between two syncs of the journal to disk. Lines are flushed to the OS on every write,
+# so a killed run loses nothing: syncing only protects from the host going down
+DEFAULT_FSYNC_INTERVAL = 5.0
+
+
+class SweepJournal:
+	"""
+	Journal of the files processed by a sweep, see the module docstring.
+
+	Ex:
+		journal = SweepJournal(Path("sweep.journal"), target_path)
+		journal.open()
+		if not journal.is_done(path):
+			...
+			journal.add([path])
+		journal.close(complete=True)
+	"""
+
+	def __init__(
+		self, journal_path: Path, root: Path, fsync_interval: float = DEFAULT_FSYNC_INTERVAL
+	) -> None:
+		"""
+		Args:
+			journal_path (Path): Path to the journal file.
+			root (Path): The target path: journaled paths are relative to it.
+			fsync_interval (float, optional): Seconds between two syncs to disk.
+				Defaults to DEFAULT_FSYNC_INTERVAL.
+		"""
+		self.journal_path = journal_path
+		self.root = root
+		self.fsync_interval = fsync_interval
+
+		self.done: Set[str] = set()
+		self.journal_file: Optional[IO[str]] = None
+		self.last_sync = 0.0
+
+	def key(self, file_path: Path) -> str:
+		"""Journal key of a file: its path relative to the target."""
+		return file_path.absolute().relative_to(self.root).as_posix()
+
+	def load(self) -> bool:
+		"""
+		Read the files done by the previous runs of the sweep.
+
+		Returns:
+			RESUMED (bool): Whether an unfinished sweep is resumed.
+				Otherwise, the journal is started over when opened.
+		"""
+		self.done = set()
+		try:
+			with open(self.journal_path, encoding="utf-8") as journal_file:
+				lines = journal_file.read().split("\n")
+		except FileNotFoundError:
+			logging.debug("No sweep journal found at %s", str(self.journal_path))
+			return False
+
+		try:
+			header = json.loads(lines[0])
+		except ValueError:
+			header = None
+		if header != {"version": JOURNAL_VERSION, "target": str(self.root)}:
+			logging.warning(
+				"Starting the sweep journal at %s over: it is from another target or version",
+				str(self.journal_path),
+			)
+			return False
+
+		# The last line is complete only if the file ends with a newline: it is then empty
+		for line in lines[1:-1]:
+			if not line:
+				continue
+			try:
+				entry = json.loads(line)
+			except ValueError:
+				logging.warning("Ignoring a corrupted line of the sweep journal: %r", line)
+				continue
+			if isinstance(entry, str):
+				self.done.add(entry)
+			elif entry == {"complete": True}:
+				logging.info("The previous sweep is complete: starting a new one")
+				self.done = set()
+				return False
+
+		return True
+
+	def open(self) -> None:
+		"""Load the journal, and open it for appending. A complete or invalid journal is started over."""
+		resumed = self.load()
+		self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+		# pylint: disable-next=consider-using-with
+		self.journal_file = open(self.journal_path, "a" if resumed else "w", encoding="utf-8")
+		if resumed:
+			# Terminate a torn last line, so that it is not merged with the next one
+			self.journal_file.write("\n")
+		else:
+			self.write_line({"version": JOURNAL_VERSION, "target": str(self.root)})
+		self.sync()
+
+	def is_done(self, file_path: Path) -> bool:
+		"""Whether a file was already processed by this sweep."""
+		return self.key(file_path) in self.done
+
+	def add(self, file_paths: Iterable[Path]) -> None:
+		"""Record processed files. The journal is synced to disk at most every fsync_interval."""
+		for file_path in file_paths:
+			key = self.key(file_path)
+			self.done.add(key)
+			self.write_line(key)
+		self.journal_file.flush()  # type: ignore[union-attr]
+		if monotonic() - self.last_sync >= self.fsync_interval:
+			self.sync()
+
+	def write_line(self, entry: object) -> None:
+		"""Append a JSON line to the journal."""
+		self.journal_file.write(json.dumps(entry) + "\n")  # type: ignore[union-attr]
+
+	def sync(self) -> None:
+		"""Flush the journal, and sync it to disk."""
+		self.journal_file.flush()  # type: ignore[union-attr]
+		os.fsync(self.journal_file.fileno())  # type: ignore[union-attr]
+		self.last_sync = monotonic()
+
+	def close(self, complete: bool) -> None:
+		"""
+		Sync and close the journal.
+
+		Args:
+			complete (bool): Whether all files of the sweep were processed: the next run starts over.
+		"""
+		if self.journal_file is None:
+			return
+		if complete:
+			self.write_line({"complete": True})
+		self.sync()
+		self.journal_file.close()
+		self.journal_file = None
@@ -0,0 +1,34 @@
+"""
+Order of the files in a time-budgeted sweep: the most valuable updates first,
+so that a run stopped by its budget did the most useful part of the work.
+"""
+
+# Imports
+from typing import Iterable, List, Tuple
+
+import content_updates
+
+
+def sweep_priority(group: content_updates.FileGroup) -> Tuple[bool, float]:
+	"""
+	Sort key of a file group: lowest first.
+	Files whose header is not in the header index (if loaded, see --header_index) come first:
+	their header is missing, or was never checked. Then the most recently modified files,
+	which are the most likely to need a new year.
+	"""
+	header_index = content_updates.get_header_index()
+	has_indexed_header = (
+		header_index is not None and header_index.key(group.path) in header_index.entries
+	)
+	try:
+		mtime = group.path.stat().st_mtime
+	except OSError:
+		mtime = 0.0
+	return has_indexed_header, -mtime
+
+
+def prioritize_groups(
+	groups: Iterable[content_updates.FileGroup],
+) -> List[content_updates.FileGroup]:
+	"""Sort file groups by sweep_priority(). Groups with the same priority keep their order."""
+	return sorted(groups, key=sweep_priority)
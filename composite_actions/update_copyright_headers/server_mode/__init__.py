@@ -0,0 +1,6 @@
+"""
+Server mode: a long-running process answering JSON-RPC requests on a local Unix socket,
+for editors and hooks. Configs are loaded once, and requests are answered by a warm process.
+"""
+from server_mode.server import serve
+from server_mode.session import SessionConfig, activate_session, make_session_config
@@ -0,0 +1,291 @@
+"""
+JSON-RPC 2.0 server on a local Unix socket. Each line received is a request, each line sent back
+is its response. Requests are processed one at a time, each with its own session config.
+
+Methods:
+- process_paths: update files on disk.
+	params: {"paths": [...], "dry_run": false, "config": {...}}
+	Paths are relative to the target (or absolute), directories are explored recursively.
+	result: {"modified": [...], "ignored": [...], "errors": [{"path": ..., "error": ...}]}
+- transform_buffer: update a text buffer, without writing anything. For editors.
+	params: {"text": "...", "path": "...", "language": "Python", "do_disclaimer": false,
+		"config": {...}}
+	path is used to detect the language (unless language is given), and for the creation year.
+	result: {"text": "...", "modified": true}
+- shutdown: stop the server.
+
+"config" is optional: see session.SESSION_OPTIONS for the options a request can override.
+
+Ex: echo '{"jsonrpc": "2.0", "id": 1, "method": "process_paths", "params": {"paths": ["src"]}}' \\
+	| socat - UNIX-CONNECT:/tmp/copyright.sock
+"""
+# pylint: disable=locally-disabled, unspecified-encoding
+
+# Imports
+import json
+import logging
+import os
+import stat
+from argparse import Namespace
+from pathlib import Path
+from socketserver import StreamRequestHandler, ThreadingUnixStreamServer
+from threading import Lock, Thread
+from traceback import format_exc
+from typing import Any, Callable, Dict, Optional, Union
+
+import content_updates
+import file_walk
+import language_support
+from server_mode.session import activate_session, make_session_config
+
+# Globals
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+
+class RpcError(Exception):
+	"""An error sent back to the client as a JSON-RPC error object."""
+
+	def __init__(self, code: int, message: str) -> None:
+		super().__init__(message)
+		self.code = code
+		self.message = message
+
+
+# Methods
+def process_paths(params: Dict[str, Any], defaults: Namespace) -> Dict[str, Any]:
+	"""Update the given files and directories on disk. See the module docstring."""
+	paths = params.get("paths")
+	if not isinstance(paths, list):
+		raise RpcError(INVALID_PARAMS, "'paths' must be a list of paths !")
+	dry_run = bool(params.get("dry_run", False))
+
+	session = make_session_config(defaults, params.get("config"))
+	# The repository might have changed since the previous request
+	activate_session(session, check_changes=True)
+	root = session.repo.target_path
+	disclaimer_mode = session.repo.disclaimer_mode
+	# Nested excludes files might have been edited since the last request
+	file_walk.clear_nested_excludes()
+
+	# Files to update, in order and without duplicates: {path: do_disclaimer}
+	to_update: Dict[Path, bool] = {}
+	ignored = []
+	for path_str in paths:
+		path = root.joinpath(path_str).absolute()
+		if path.is_dir():
+			to_update.update(file_walk.get_relevant_files(root, disclaimer_mode, start=path))
+			continue
+
+		do_disclaimer = None
+		if path.exists():
+			do_disclaimer = file_walk.check_file(path, root, disclaimer_mode)
+		if do_disclaimer is None:
+			ignored.append(path_str)
+		else:
+			to_update[path] = do_disclaimer
+
+	content_updates.add_creation_year_candidates(to_update)
+
+	modified = []
+	errors = []
+	for group in content_updates.group_files(to_update.items(), defaults.dedup_content):
+		path_strs = [str(path.relative_to(root)) for path in group.paths]
+		try:
+			if content_updates.process_group(group, dry_run):
+				modified.extend(path_strs)
+		# pylint: disable-next=broad-exception-caught
+		except Exception as exc:
+			logging.debug("Error while processing %s !: %s\n%s", path_strs[0], exc, format_exc())
+			errors.extend({"path": path_str, "error": str(exc)} for path_str in path_strs)
+
+	if not dry_run:
+		year_cache = content_updates.get_year_cache()
+		if year_cache is not None and year_cache.new_years:
+			year_cache.save()
+			year_cache.new_years = {}
+
+	logging.info(
+		"process_paths: %s files, %s modified, %s errors",
+		len(to_update),
+		len(modified),
+		len(errors),
+	)
+	return {"modified": modified, "ignored": ignored, "errors": errors}
+
+
+def transform_buffer(params: Dict[str, Any], defaults: Namespace) -> Dict[str, Any]:
+	"""Update a text buffer, without writing anything. See the module docstring."""
+	text = params.get("text")
+	path_str = params.get("path")
+	if not isinstance(text, str) or not isinstance(path_str, str):
+		raise RpcError(INVALID_PARAMS, "'text' and 'path' must be strings !")
+
+	session = make_session_config(defaults, params.get("config"))
+	activate_session(session, check_changes=True)
+	path = session.repo.target_path.joinpath(path_str).absolute()
+
+	file_language = None
+	if params.get("language") is not None:
+		file_language = language_support.get_language_by_name(params["language"])
+
+	do_disclaimer = params.get("do_disclaimer")
+	if do_disclaimer is None:
+		do_disclaimer = session.repo.disclaimer_mode == "always"
+
+	# Lines are processed with '\n' endings, like when reading a file
+	newline = "\r\n" if "\r\n" in text else "\n"
+	lines = text.replace("\r\n", "\n").splitlines(keepends=True)
+
+	new_lines = content_updates.update_lines(lines, path, bool(do_disclaimer), file_language)
+	new_text = "".join(new_lines)
+	if newline != "\n":
+		new_text = new_text.replace("\n", newline)
+
+	logging.info("transform_buffer: %s, modified: %s", path_str, new_lines.modified)
+	return {"text": new_text, "modified": new_lines.modified}
+
+
+def shutdown(_: Dict[str, Any], __: Namespace) -> Dict[str, Any]:
+	"""Stop the server: it stops once the response is sent, see RequestHandler.handle()."""
+	return {}
+
+
+METHODS: Dict[str, Callable[[Dict[str, Any], Namespace], Dict[str, Any]]] = {
+	"process_paths": process_paths,
+	"transform_buffer": transform_buffer,
+	"shutdown": shutdown,
+}
+
+
+# Server
+class CopyrightServer(ThreadingUnixStreamServer):
+	"""Unix socket server holding the default config. Requests are processed one at a time."""
+
+	daemon_threads = True
+
+	def __init__(self, socket_path: Path, defaults: Namespace) -> None:
+		self.defaults = defaults
+		# The configuration getters are process-wide: only one request runs at a time
+		self.lock = Lock()
+		# Set by the shutdown method: the server stops once its response is sent
+		self.shutdown_requested = False
+		super().__init__(str(socket_path), RequestHandler)
+
+	def handle_message(self, message: Union[str, bytes]) -> Optional[Dict[str, Any]]:
+		"""
+		Process one JSON-RPC message.
+
+		Returns:
+			RESPONSE (Optional[Dict[str, Any]]): The response, or None for notifications (no id).
+		"""
+		request_id = None
+		is_notification = False
+		try:
+			try:
+				request = json.loads(message)
+			except ValueError as exc:
+				raise RpcError(PARSE_ERROR, f"Invalid JSON: {exc}") from exc
+
+			if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+				raise RpcError(INVALID_REQUEST, "Expected an object with a 'method' !")
+			request_id = request.get("id")
+			is_notification = "id" not in request
+
+			method = METHODS.get(request["method"])
+			if method is None:
+				raise RpcError(METHOD_NOT_FOUND, f"Unknown method '{request['method']}' !")
+
+			params = request.get("params", {})
+			if not isinstance(params, dict):
+				raise RpcError(INVALID_PARAMS, "'params' must be an object !")
+
+			with self.lock:
+				try:
+					result = method(params, self.defaults)
+				except (ValueError, FileNotFoundError) as exc:
+					raise RpcError(INVALID_PARAMS, str(exc)) from exc
+
+			if method is shutdown:
+				self.shutdown_requested = True
+
+			response: Dict[str, Any] = {"jsonrpc": "2.0", "id": request_id, "result": result}
+		except RpcError as exc:
+			response = {
+				"jsonrpc": "2.0",
+				"id": request_id,
+				"error": {"code": exc.code, "message": exc.message},
+			}
+		# pylint: disable-next=broad-exception-caught
+		except Exception as exc:
+			logging.error("Error while processing request !: %s\n%s", exc, format_exc())
+			response = {
+				"jsonrpc": "2.0",
+				"id": request_id,
+				"error": {"code": SERVER_ERROR, "message": repr(exc)},
+			}
+
+		# Notifications (requests without an id) never get a response
+		return None if is_notification else response
+
+
+class RequestHandler(StreamRequestHandler):
+	"""Handle a client connection: one JSON-RPC message per line."""
+
+	server: CopyrightServer
+
+	def handle(self) -> None:
+		for line in self.rfile:
+			if not line.strip():
+				continue
+			response = self.server.handle_message(line)
+			if response is not None:
+				self.wfile.write(json.dumps(response).encode() + b"\n")
+				self.wfile.flush()
+			if self.server.shutdown_requested:
+				# Only once the response is sent: the process exits when serve_forever() returns.
+				# shutdown() blocks until it does: call it from another thread
+				Thread(target=self.server.shutdown).start()
+				return
+
+
+def remove_stale_socket(socket_path: Path) -> None:
+	"""Remove a socket file left by a previous server. Any other file is left alone."""
+	try:
+		mode = os.lstat(socket_path).st_mode
+	except FileNotFoundError:
+		return
+
+	if not stat.S_ISSOCK(mode):
+		raise FileExistsError(f"Specified socket path '{socket_path!s}' exists and is not a socket !")
+	socket_path.unlink()
+
+
+def serve(socket_path: Path, defaults: Namespace) -> int:
+	"""
+	Serve requests on the Unix socket until the shutdown method is called (or Ctrl+C).
+
+	Args:
+		socket_path (Path): Path of the Unix socket to create.
+		defaults (Namespace): Parsed command-line arguments, the default config of the requests.
+
+	Returns:
+		EXIT_CODE (int): 0.
+	"""
+	remove_stale_socket(socket_path)
+
+	with CopyrightServer(socket_path, defaults) as server:
+		logging.info("Listening on %s", str(socket_path))
+		try:
+			server.serve_forever()
+		except KeyboardInterrupt:
+			pass
+		finally:
+			socket_path.unlink(missing_ok=True)
+
+	logging.info("Server stopped.")
+	return 0
@@ -0,0 +1,134 @@
+"""
+Sessions: the configuration a request is processed with.
+
+Each request is processed with a SessionConfig: the server's defaults (command-line arguments),
+with the overrides given in the request's "config" parameter.
+The processing code reads its configuration through the module getters: activating a session
+applies its values there, and only reloads the config files when the repository changes.
+"""
+
+# Imports
+from argparse import Namespace
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import content_updates
+import language_support
+from batch_mode import RepoConfig, configure_repo
+
+# Helper functions
+def to_names(value: Any) -> tuple:
+	"""Convert a list of names, or a comma-separated string of names, to a tuple."""
+	return tuple(value.split(",")) if isinstance(value, str) else tuple(value)
+
+
+# Globals
+# Options a request can override, and how to convert their JSON value
+SESSION_OPTIONS = {
+	"target_path": Path,
+	"languages_path": Path,
+	"excludes_path": Path,
+	"disclaimer_path": Path,
+	"disclaimer_mode": str,
+	"padding": int,
+	"whitespace_surround": bool,
+	"safe_writes": bool,
+	"scan_window_lines": int,
+	"scan_window_size": int,
+	"year_providers": to_names,
+	"year_map_path": Path,
+	"default_year": int,
+	"skip_shallow_history": bool,
+}
+
+
+@dataclass(frozen=True)
+class SessionConfig:
+	"""Configuration used to process a request. All paths are absolute."""
+
+	repo: RepoConfig
+	padding: int = 1
+	whitespace_surround: bool = False
+	safe_writes: bool = False
+	# None means no limit
+	scan_window_lines: Optional[int] = language_support.DEFAULT_SCAN_WINDOW_CODE_LINES
+	scan_window_size: Optional[int] = language_support.DEFAULT_SCAN_WINDOW_SIZE
+	use_year_cache: bool = True
+
+
+def make_session_config(
+	defaults: Namespace, overrides: Optional[Dict[str, Any]] = None
+) -> SessionConfig:
+	"""
+	Build the configuration of a request: the server's defaults, with the request's overrides.
+	Paths are resolved like the command-line arguments: config paths are relative to target_path.
+
+	Args:
+		defaults (Namespace): Parsed command-line arguments of the server.
+		overrides (Dict[str, Any], optional): Values given in the request. See SESSION_OPTIONS.
+
+	Returns:
+		SESSION_CONFIG (SessionConfig): The configuration of the request.
+	"""
+	options = {name: getattr(defaults, name) for name in SESSION_OPTIONS}
+	for name, value in (overrides or {}).items():
+		if name not in SESSION_OPTIONS:
+			raise ValueError(
+				f"Unknown config option '{name}' ! Must be one of {tuple(SESSION_OPTIONS)}."
+			)
+		options[name] = None if value is None else SESSION_OPTIONS[name](value)
+
+	target_path = Path(options["target_path"]).absolute()
+	if not target_path.exists():
+		raise FileNotFoundError(f"Specified target path '{target_path!s}' does not exist !")
+
+	paths = {}
+	for name in ("languages_path", "excludes_path", "disclaimer_path", "year_map_path"):
+		if options[name] is None:
+			paths[name] = None
+			continue
+		paths[name] = target_path.joinpath(options[name])
+		if not paths[name].exists():
+			raise FileNotFoundError(
+				f"Specified path '{paths[name]!s}' for option '{name}' does not exist !"
+			)
+
+	# The year cache location is not a per-request option: only the server's own target uses it
+	year_cache_path = (
+		defaults.year_cache_path if target_path == defaults.target_path else None
+	)
+
+	return SessionConfig(
+		repo=RepoConfig(
+			target_path=target_path,
+			disclaimer_mode=options["disclaimer_mode"],
+			year_cache_path=year_cache_path,
+			year_providers=tuple(options["year_providers"]),
+			default_year=options["default_year"],
+			skip_shallow_history=options["skip_shallow_history"],
+			**paths,
+		),
+		padding=options["padding"],
+		whitespace_surround=options["whitespace_surround"],
+		safe_writes=options["safe_writes"],
+		scan_window_lines=options["scan_window_lines"] or None,
+		scan_window_size=options["scan_window_size"] or None,
+		use_year_cache=not defaults.no_year_cache,
+	)
+
+
+def activate_session(session: SessionConfig, check_changes: bool = False) -> None:
+	"""
+	Apply the configuration of a session before processing a request.
+	The config files are only reloaded if the session is for another repository (or config files)
+	than the previous one: consecutive requests for the same repository reuse the loaded configs,
+	and the creation years already looked up.
+	With check_changes, they are also reloaded if a config file was edited, or a commit was made,
+	since they were loaded (see batch_mode.configure_repo()).
+	"""
+	language_support.set_inner_pad(session.padding)
+	language_support.set_scan_window(session.scan_window_lines, session.scan_window_size)
+	content_updates.set_whitespace_surround(session.whitespace_surround)
+	content_updates.set_safe_writes(session.safe_writes)
+	configure_repo(session.repo, session.use_year_cache, check_changes)
@@ -0,0 +1,13 @@
+"""
+Tree mode: update the files of a git tree-ish without a worktree, for bare repositories,
+sparse checkouts and partial clones. Blobs are read from git, updated in memory,
+and the result is written as a patch or a plan, or committed as new blobs.
+"""
+from tree_mode.run_tree import (
+	TREE_OUTPUTS,
+	TreeResult,
+	TreeUpdate,
+	run_tree,
+	write_patch,
+	write_plan,
+)
@@ -0,0 +1,187 @@
+"""
+Update the files of a tree-ish (see --from_tree), reading them from git objects only.
+
+Files are listed with `git ls-tree`, filtered like on disk (languages and exclude patterns,
+matched on their path under the target), read through a single `git cat-file --batch` process,
+and updated in memory with the same header and disclaimer transforms.
+
+Outputs (see --tree_output):
+- patch: a unified diff of the updates, to `git apply` from the repository root.
+- plan: a JSON summary of the updates: old and new blob id of each modified file, and the errors.
+With --fast_import_branch, the new blobs are also committed on top of the tree-ish.
+"""
+# pylint: disable=locally-disabled, unspecified-encoding
+
+# Imports
+import difflib
+import json
+import logging
+from dataclasses import dataclass, field
+from io import BytesIO, TextIOWrapper
+from locale import getpreferredencoding
+from pathlib import Path
+from time import perf_counter
+from traceback import format_exc
+from typing import BinaryIO, List, Optional, Tuple
+
+import content_updates
+import file_walk
+import git_plumbing
+import progress_reporting
+
+# Globals
+TREE_OUTPUTS = ("patch", "plan")
+
+NO_NEWLINE_MARKER = b"\\ No newline at end of file\n"
+
+
+@dataclass
+class TreeUpdate:
+	"""A modified file of the tree: its entry, and its old and new content."""
+
+	entry: git_plumbing.TreeEntry
+	old_content: bytes
+	new_content: bytes
+
+
+@dataclass
+class TreeResult:
+	"""Results of a tree mode run."""
+
+	tree_ish: str
+	n_files: int = 0
+	updates: List[TreeUpdate] = field(default_factory=list)
+	# (path, exception, traceback)
+	errors: List[Tuple[str, str, str]] = field(default_factory=list)
+
+
+def decode_blob(content: bytes) -> Tuple[List[str], str]:
+	"""
+	Decode the lines of a blob exactly like read_file() reads a file:
+	same encoding, and universal newlines.
+
+	Returns:
+		CONTENT (Tuple[List[str], str]): The lines of the blob, and the encoding used.
+	"""
+	encoding = getpreferredencoding(False)
+	with TextIOWrapper(BytesIO(content), encoding=encoding) as text:
+		return text.readlines(), encoding
+
+
+def update_blob(file_path: Path, content: bytes, do_disclaimer: bool) -> bytes:
+	"""Compute the updated content of a blob. file_path is only used for its language and year."""
+	lines, encoding = decode_blob(content)
+	new_lines = content_updates.update_lines(lines, file_path, do_disclaimer)
+	if not new_lines.modified:
+		return content
+	# Encode the same way open() would have when writing the file
+	return "".join(new_lines).encode(encoding)
+
+
+def run_tree(
+	target_path: Path,
+	tree_ish: str,
+	disclaimer_mode: str = "never",
+	progress: Optional[progress_reporting.ProgressReporter] = None,
+) -> TreeResult:
+	"""
+	Update the files of a tree-ish in memory. Errors are collected, they never stop the run.
+
+	Args:
+		target_path (Path): Root of the repository: its worktree, or its git directory if bare.
+		tree_ish (str): The tree-ish whose files are updated. Ex: "HEAD", "origin/main"
+		disclaimer_mode (str, optional): See script arg of the same name.
+		progress (ProgressReporter, optional): Where processed files are counted.
+
+	Returns:
+		RESULT (TreeResult): The updated files, and the errors.
+	"""
+	if git_plumbing.run_git(target_path, "rev-parse", "--show-prefix"):
+		raise ValueError(
+			f"Specified target path '{target_path!s}' is not the root of its repository !"
+		)
+
+	result = TreeResult(tree_ish)
+	logging.info("Listing the files of %s...", tree_ish)
+	to_update = []
+	for entry in git_plumbing.list_tree(target_path, tree_ish):
+		do_disclaimer = file_walk.check_file(
+			target_path.joinpath(entry.path), target_path, disclaimer_mode
+		)
+		if do_disclaimer is not None:
+			to_update.append((entry, do_disclaimer))
+
+	result.n_files = len(to_update)
+	if progress is not None:
+		progress.add_total(len(to_update))
+	content_updates.add_creation_year_candidates(
+		target_path.joinpath(entry.path) for entry, _ in to_update
+	)
+
+	blobs = git_plumbing.iter_blobs(target_path, [entry.object_id for entry, _ in to_update])
+	for (entry, do_disclaimer), (_, content) in zip(to_update, blobs):
+		logging.debug("====Processing blob %s ====", entry.path)
+		file_start = perf_counter()
+		error = None
+		try:
+			new_content = update_blob(target_path.joinpath(entry.path), content, do_disclaimer)
+			if new_content != content:
+				result.updates.append(TreeUpdate(entry, content, new_content))
+				status = progress_reporting.STATUS_MODIFIED
+			else:
+				status = progress_reporting.STATUS_SKIPPED
+		# pylint: disable-next=broad-exception-caught
+		except Exception as exc:
+			logging.error("Error while processing %s !: %s", entry.path, exc)
+			result.errors.append((entry.path, repr(exc), format_exc()))
+			status = progress_reporting.STATUS_ERROR
+			error = repr(exc)
+
+		if progress is not None:
+			progress.file_done(entry.path, status, perf_counter() - file_start, error)
+
+	return result
+
+
+def write_patch(result: TreeResult, output: BinaryIO) -> None:
+	"""Write the updates as a unified diff, to `git apply` from the repository root."""
+	for update in result.updates:
+		path = update.entry.path.encode("utf-8", "surrogateescape")
+		output.write(b"diff --git a/%s b/%s\n" % (path, path))
+		output.write(
+			b"index %s..%s %s\n"
+			% (
+				update.entry.object_id[:12].encode("ascii"),
+				git_plumbing.blob_id(update.new_content)[:12].encode("ascii"),
+				update.entry.mode.encode("ascii"),
+			)
+		)
+		for line in difflib.diff_bytes(
+			difflib.unified_diff,
+			update.old_content.splitlines(keepends=True),
+			update.new_content.splitlines(keepends=True),
+			b"a/" + path,
+			b"b/" + path,
+		):
+			output.write(line)
+			if not line.endswith(b"\n"):
+				output.write(b"\n" + NO_NEWLINE_MARKER)
+
+
+def write_plan(result: TreeResult, output: BinaryIO) -> None:
+	"""Write a JSON summary of the updates: old and new blob ids of the modified files, and errors."""
+	plan = {
+		"tree_ish": result.tree_ish,
+		"n_files": result.n_files,
+		"modified": [
+			{
+				"path": update.entry.path,
+				"mode": update.entry.mode,
+				"old_blob": update.entry.object_id,
+				"new_blob": git_plumbing.blob_id(update.new_content),
+			}
+			for update in result.updates
+		],
+		"errors": [{"path": path, "error": error} for path, error, _ in result.errors],
+	}
+	output.write(json.dumps(plan, indent=2).encode("utf-8") + b"\n")
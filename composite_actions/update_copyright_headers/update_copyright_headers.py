@@ -1,218 +1,1059 @@
-#!/usr/bin/env python3
-"""
-Update XYZ/ABC copyright headers and copyright disclaimers in all given files.
-Configuration for this script can be specified via yaml-formatted config files:
-language definitions, inserted text etc, - all values have a default.
-
-By default, the script acts recursively on every file that has a supported language.
-Exclusion patterns can be defined via --excludes file.
-"""
-
-# Imports
-import logging
-from argparse import ArgumentParser, Namespace
-from os import chdir
-from pathlib import Path
-from sys import exit as s_exit
-from traceback import format_exc
-
-import content_updates
-import file_walk
-import language_support
-
-
-# Main functions
-def parse_arguments() -> Namespace:
-	"""Parse and Validate command-line arguments"""
-	parser = ArgumentParser(description=__doc__)
-	parser.add_argument(
-		"-t",
-		"--target",
-		dest="target_path",
-		help="Path to a file or directory to update",
-		type=Path,
-		required=True,
-	)
-	parser.add_argument(
-		"-l",
-		"--languages_path",
-		help="Path to a language definition config file",
-		type=Path,
-		default=Path(language_support.__file__).parent.joinpath(
-			"default_languages.yml"
-		),
-	)
-	parser.add_argument(
-		"-e",
-		"--excludes_path",
-		dest="excludes_path",
-		help="Path to a file containing a file exclusion list",
-		type=Path,
-		default=Path(file_walk.__file__).parent.joinpath("DEFAULT_COPYRIGHT_EXCLUDES"),
-	)
-	parser.add_argument(
-		"-d",
-		"--disclaimer_mode",
-		help="""Choose under what conditions the disclaimer text is added.
-		'config' allows specifying on a per file basis. See excludes file syntax for details.""",
-		choices=["never","always","config"],
-	)
-	parser.add_argument(
-		"--disclaimer_path",
-		help="Path to a text file with the copyright disclaimer",
-		type=Path,
-		default=Path(content_updates.__file__).parent.joinpath(
-			"default_disclaimer.txt"
-		),
-	)
-	parser.add_argument(
-		"-p",
-		"--padding",
-		help="Amount of white spaces padding to add between the comment marker and text.",
-		type=int,
-		required=False,
-		default=1,
-	)
-	parser.add_argument(
-		"--whitespace_surround",
-		help="If set, copyright messages will get surrounded by empty lines for readability.",
-		action="store_true",
-	)
-	parser.add_argument(
-		"-v",
-		"--verbose",
-		help="Verbose mode. Printing additional logging debug messages.",
-		action="store_true",
-	)
-	parser.add_argument(
-		"-q",
-		"--quiet",
-		help="Quiet mode. Only logs above info level.",
-		action="store_true",
-	)
-	parser.add_argument(
-		"--dry-run",
-		help="Dry run. Print all edits to file, but dont write anything.",
-		action="store_true",
-	)
-	
-	out = parser.parse_args()
-	
-	if out.quiet and out.verbose:
-		raise ValueError("Please only specify one of 'quiet' or 'verbose' !")
-		
-	out.target_path = out.target_path.absolute()
-	
-	if not out.target_path.exists():
-		raise FileNotFoundError(
-			f"Specified target path '(out.target_path!s)' does not exist !"
-		)
-		
-	for arg_name in (
-		"languages_path",
-		"disclaimer_path",
-		"excludes_path",
-	):
-		# Calculate full path
-		path: Path = out.target_path.joinpath(getattr(out, arg_name))
-		if not path.exists():
-			raise FileNotFoundError(
-				f"Specified path '{path!s}' for argument '{arg_name}' does not exist !"
-			)
-		setattr(out, arg_name, path)
-		
-	return out
-	
-
-def config_setup(args: Namespace) -> None:
-	"""Load all config files and initialize needed variables."""
-	# Initialize logging
-	level = (
-		logging.DEBUG
-		if args.verbose
-		else (logging.WARNING if args.quiet else logging.INFO)
-	)
-	logging.basicConfig(format="[%(relativeCreated)d ms] %(message)s", level=level)
-	
-	# Load config and content files
-	logging.info("Loading languages from %s", str(args.languages_path))
-	language_support.load_languages(languages_config_path=args.languages_path)
-	logging.debug("Loaded langugaes: %s", language_support.load_languages())
-	
-	logging.info("loading exclude patterns from %s", str(args.excludes_path))
-	file_walk.get_exclude_patterns(excludes_file_path=args.excludes_path)
-	logging.debug("Loaded exclude patterns: %s", file_walk.get_exclude_patterns())
-	
-	# Only load disclaimer if we will use it
-	if args.disclaimer_mode in ("always", "config"):
-		logging.info("Loading copyright disclaimer from %s", str(args.disclaimer_path))
-		content_updates.get_disclaimer_text(disclaimer_file_path=args.disclaimer_path)
-		logging.debug(
-			"Loaded copyright disclaimer: %s",
-			"\n".join(content_updates.get_disclaimer_text()),
-		)
-		
-	# Setup whitespace-related configs
-	logging.info(
-		"Setting padding amount to: %s space.%s",
-		args.padding,
-		"Enabling whitespace_surround function." if args.whitespace_surround else "",
-	)
-	language_support.set_inner_pad(args.padding)
-	content_updates.set_whitespace_surround(args.whitespace_surround)
-	
-	
-def main() -> int:
-	"""Main function"""
-	args = parse_arguments()
-	
-	config_setup(args)
-	
-	logging.info("Locating files to update in %s...", str(args.target_path))
-	to_update = list(
-		file_walk.get_relevant_files(args.target_path, args.disclaimer_mode)
-	)
-	# Change dir to target_path: needed for git commands to execute in the right context
-	chdir(args.target_path)
-	
-	n_files = len(to_update)
-	errors = []
-	
-	for i, (path, do_disclaimer) in enumerate(to_update):
-		path_str = str(path.relative_to(args.target_path))
-		logging.info(
-			"====Processing file %s%s (%s%%): %s ==== ",
-			i,
-			n_files,
-			f"{100*i/n_files:.2f}",
-			path_str,
-		)
-		try:
-			content_updates.process_file(path, do_disclaimer, args.dry_run)
-		# pylint: disable-next=braod-exception-caught
-		except Exception as exc:
-			traceback = format_exc()
-			logging.error(
-				"Error while processing %s !: %s. See end for full traceback.",
-				path_str,
-				exc,
-			)
-			errors.append((path_str, exc, traceback))
-			
-	logging.info("Done !")
-	if errors:
-		logging.error("Errors occured ! Full tracebacks:")
-		for path_str, exception, traceback in errors:
-			logging.error(
-				"==== %s ===== \nException: %s. Traceback:\n%s",
-				path_str,
-				exception,
-				traceback,
-			)
-		return 1
-		
-	return 0
-	
-	
-if __name__ == "__main__":
-	s_exit(main())
+#!/usr/bin/env python3
+"""
+Update XYZ/ABC copyright headers and copyright disclaimers in all given files.
+Configuration for this script can be specified via yaml-formatted config files:
+language definitions, inserted text etc, - all values have a default.
+
+By default, the script acts recursively on every file that has a supported language.
+Exclusion patterns can be defined via --excludes file.
+"""
+
+# Imports
+# Measure startup time as early as possible, see --startup_budget_ms
+# pylint: disable-next=wrong-import-order
+from time import perf_counter
+
+START_TIME = perf_counter()
+
+# pylint: disable=wrong-import-position
+import logging
+import os
+from argparse import ArgumentParser, Namespace
+from locale import getpreferredencoding
+from os import cpu_count
+from pathlib import Path
+from sys import exit as s_exit
+from sys import stdout
+from traceback import format_exc
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+import config_cache
+import content_updates
+import file_walk
+import git_plumbing
+import language_support
+import profiling
+import progress_reporting
+
+# The other modes (batch, server, cluster, tree, resumable sweeps) are imported when used:
+# they pull in multiprocessing and concurrent.futures, which would double the startup time
+if TYPE_CHECKING:
+	import batch_mode
+
+# Globals
+# Maximum expected time between the script start and the end of config_setup()
+DEFAULT_STARTUP_BUDGET_MS = 150
+
+
+# Main functions
+def parse_arguments() -> Namespace:
+	"""Parse and Validate command-line arguments"""
+	parser = ArgumentParser(description=__doc__)
+	parser.add_argument(
+		"-t",
+		"--target",
+		dest="target_path",
+		help="Path to a file or directory to update. Required unless --batch_manifest or --worker is used.",
+		type=Path,
+		default=None,
+	)
+	parser.add_argument(
+		"-l",
+		"--languages_path",
+		help="Path to a language definition config file",
+		type=Path,
+		default=Path(language_support.__file__).parent.joinpath(
+			"default_languages.yml"
+		),
+	)
+	parser.add_argument(
+		"-e",
+		"--excludes_path",
+		dest="excludes_path",
+		help="Path to a file containing a file exclusion list",
+		type=Path,
+		default=Path(file_walk.__file__).parent.joinpath("DEFAULT_COPYRIGHT_EXCLUDES"),
+	)
+	parser.add_argument(
+		"--nested_excludes_name",
+		help="""Name of the excludes files found in subdirectories, applying to their subtree
+		like .gitignore files: their patterns are relative to their directory, and take priority
+		over those of parent directories. Files under an excluded directory cannot be included
+		again. Empty to disable.""",
+		default=file_walk.DEFAULT_NESTED_EXCLUDES_NAME,
+	)
+	parser.add_argument(
+		"-d",
+		"--disclaimer_mode",
+		help="""Choose under what conditions the disclaimer text is added.
+		'config' allows specifying on a per file basis. See excludes file syntax for details.""",
+		choices=["never","always","config"],
+	)
+	parser.add_argument(
+		"--disclaimer_path",
+		help="Path to a text file with the copyright disclaimer",
+		type=Path,
+		default=Path(content_updates.__file__).parent.joinpath(
+			"default_disclaimer.txt"
+		),
+	)
+	parser.add_argument(
+		"-p",
+		"--padding",
+		help="Amount of white spaces padding to add between the comment marker and text.",
+		type=int,
+		required=False,
+		default=1,
+	)
+	parser.add_argument(
+		"--scan_window_lines",
+		help="""Only search comment blocks and prologs (xml declaration, yaml '---') until this many
+		code lines were seen at the top of each file. 0 means no limit.""",
+		type=int,
+		default=language_support.DEFAULT_SCAN_WINDOW_CODE_LINES,
+	)
+	parser.add_argument(
+		"--scan_window_size",
+		help="""Only search comment blocks and prologs in this many characters at the top of each file.
+		0 means no limit.""",
+		type=int,
+		default=language_support.DEFAULT_SCAN_WINDOW_SIZE,
+	)
+	parser.add_argument(
+		"--time_budget",
+		help="""Seconds the run may take: once they are used up, it stops before the next file.
+		Files are then processed by priority: files without a known header (see --header_index),
+		then the most recently modified ones. Use --journal to resume on the next run.""",
+		type=float,
+		default=None,
+	)
+	parser.add_argument(
+		"--journal",
+		help="""Path to a sweep journal: processed files are appended to it, and skipped by
+		the next runs until all files were processed. For sweeps spanning several jobs.""",
+		type=Path,
+		default=None,
+	)
+	parser.add_argument(
+		"--walk_threads",
+		help="""Number of threads listing directories concurrently while looking for files.
+		Useful on network filesystems, where each listing waits for the server.""",
+		type=int,
+		default=file_walk.DEFAULT_WALK_THREADS,
+	)
+	parser.add_argument(
+		"--whitespace_surround",
+		help="If set, copyright messages will get surrounded by empty lines for readability.",
+		action="store_true",
+	)
+	parser.add_argument(
+		"--safe_writes",
+		help="""If set, files are written in a crash-safe way: rewritten files go through
+		a temporary file renamed over the original, and in-place edits are synced to disk.""",
+		action="store_true",
+	)
+	parser.add_argument(
+		"--year_cache_path",
+		help="""Path to the persistent creation year cache file.
+		Defaults to a file in the target repository's git directory.""",
+		type=Path,
+		default=None,
+	)
+	parser.add_argument(
+		"--no_year_cache",
+		help="If set, do not load or save the persistent creation year cache.",
+		action="store_true",
+	)
+	parser.add_argument(
+		"--year_providers",
+		help=f"""Comma-separated creation year providers for new headers, tried in order.
+		Available: {', '.join(content_updates.PROVIDER_NAMES)}.
+		Ex: 'git,map,fixed' for shallow clones with a precomputed year map.""",
+		type=lambda value: value.split(","),
+		default=["git"],
+	)
+	parser.add_argument(
+		"--year_map_path",
+		help="""Path to a JSON file mapping paths (relative to the target) to creation years.
+		Used by the 'map' creation year provider.""",
+		type=Path,
+		default=None,
+	)
+	parser.add_argument(
+		"--default_year",
+		help="Creation year given by the 'fixed' provider. Defaults to the current year.",
+		type=int,
+		default=None,
+	)
+	parser.add_argument(
+		"--skip_shallow_history",
+		help="""If set, the 'git' creation year provider skips shallow clones, leaving their files
+		to the next providers. By default, their truncated history is used: files created before
+		the oldest fetched commit get its year.""",
+		action="store_true",
+	)
+	parser.add_argument(
+		"--header_index",
+		help="""Path to the header index file (relative to the target), recording the position
+		of each file's header end year. Updated at the end of each (non dry-run) run.""",
+		type=Path,
+		default=None,
+	)
+	parser.add_argument(
+		"--rollover",
+		help="""Year rollover mode, with --header_index: for indexed files whose header line is
+		unchanged, only the end year is patched in place. Other files are fully processed.
+		Assumes the disclaimers are up-to-date: indexed files only get their year bumped.""",
+		action="store_true",
+	)
+	parser.add_argument(
+		"--config_cache_dir",
+		help="""Directory where parsed config files (languages, excludes) are cached,
+		keyed by their content hash. Defaults to ~/.cache/update_copyright_headers.""",
+		type=Path,
+		default=config_cache.DEFAULT_CONFIG_CACHE_DIR,
+	)
+	parser.add_argument(
+		"--no_config_cache",
+		help="If set, always parse the config files, without using the config cache.",
+		action="store_true",
+	)
+	parser.add_argument(
+		"--startup_budget_ms",
+		help="Startup time budget, in ms. A warning is logged if startup takes longer.",
+		type=float,
+		default=DEFAULT_STARTUP_BUDGET_MS,
+	)
+	parser.add_argument(
+		"-v",
+		"--verbose",
+		help="Verbose mode. Printing additional logging debug messages.",
+		action="store_true",
+	)
+	parser.add_argument(
+		"-q",
+		"--quiet",
+		help="Quiet mode. Only logs above info level.",
+		action="store_true",
+	)
+	parser.add_argument(
+		"--dry-run",
+		help="Dry run. Print all edits to file, but dont write anything.",
+		action="store_true",
+	)
+	parser.add_argument(
+		"--fast_import_branch",
+		help="""If set, do not write to the worktree: commit the updated files directly
+		to this branch (on top of HEAD) using `git fast-import`.""",
+		default=None,
+	)
+	parser.add_argument(
+		"--commit_message",
+		help="Commit message used with --fast_import_branch.",
+		default="Copyright headers update",
+	)
+	parser.add_argument(
+		"--changed_files_out",
+		help="""Path to a file where the paths of the modified files are written, NUL-separated,
+		relative to the target directory. Use it to stage exactly those files, from the target directory:
+		`git add --pathspec-from-file=<path> --pathspec-file-nul`.""",
+		type=Path,
+		default=None,
+	)
+	parser.add_argument(
+		"--dedup_content",
+		help="""If set, byte-identical files with the same language, disclaimer decision and
+		creation year are only processed once: the update is written to each of them.
+		Paths to the same file (hardlinks, symlinks) are always processed once.""",
+		action="store_true",
+	)
+	parser.add_argument(
+		"--progress_interval",
+		help="""Seconds between two progress status lines (files/s, ETA, modified/skipped/error counts).
+		Per-file messages are only logged with --verbose. 0 logs a status line after every file.""",
+		type=float,
+		default=progress_reporting.DEFAULT_PROGRESS_INTERVAL,
+	)
+	parser.add_argument(
+		"--events_out",
+		help="""Path to a JSON lines file where an event is written for each processed file:
+		path, status (modified, skipped or error), duration and error.""",
+		type=Path,
+		default=None,
+	)
+	parser.add_argument(
+		"--profile",
+		help="""Path to a directory where profiling data is written: cProfile stats,
+		and the slowest files with the time spent in each stage (see profiling/profiler.py).""",
+		type=Path,
+		default=None,
+	)
+	parser.add_argument(
+		"--profile_sample",
+		help="""With --profile: only run cProfile on one file out of N, to limit its overhead
+		on large runs. 0 profiles the whole run.""",
+		type=int,
+		default=0,
+	)
+	parser.add_argument(
+		"--profile_memory",
+		help="With --profile: also trace memory allocations, with tracemalloc.",
+		action="store_true",
+	)
+	parser.add_argument(
+		"--profile_top",
+		help="With --profile: number of slowest files to report.",
+		type=int,
+		default=20,
+	)
+	parser.add_argument(
+		"--serve",
+		help="""Server mode: path of a Unix socket on which to answer JSON-RPC requests
+		(see server_mode/server.py), instead of processing the target once.
+		The other arguments are the default config of the requests.""",
+		type=Path,
+		default=None,
+	)
+	parser.add_argument(
+		"--batch_manifest",
+		help="""Batch mode: path to a yaml manifest listing the repositories to process
+		(see batch_mode/manifest.py for the syntax). All repositories are processed by a single
+		process and worker pool. Config paths given as arguments are used as per-repo defaults.""",
+		type=Path,
+		default=None,
+	)
+	parser.add_argument(
+		"-j",
+		"--jobs",
+		help="""Batch and submodules modes: number of worker processes.
+		Defaults to the number of CPUs.""",
+		type=int,
+		default=cpu_count(),
+	)
+	parser.add_argument(
+		"--batch_report",
+		help="Batch and submodules modes: path to a JSON file where per-repo results are written.",
+		type=Path,
+		default=None,
+	)
+	parser.add_argument(
+		"--submodules",
+		help="""Submodules mode: the target and each git repository nested in it (submodules,
+		or other clones) are processed as separate repositories, in parallel (see --jobs):
+		each with its own git history for the creation years, and its own year cache.
+		Exclude patterns still apply relative to the target. Results are reported per repository.""",
+		action="store_true",
+	)
+	parser.add_argument(
+		"--from_tree",
+		help="""Tree mode: update the files of this git tree-ish (ex: HEAD, origin/main) without
+		a worktree, reading them from git objects. The target must be the root of the repository,
+		or its git directory if bare. See --tree_output, and --fast_import_branch to commit them.""",
+		default=None,
+	)
+	parser.add_argument(
+		"--tree_output",
+		help="""Tree mode: write the updates as a unified diff (patch, for `git apply`),
+		or as a JSON summary with the old and new blob ids (plan).""",
+		# tree_mode.TREE_OUTPUTS: not imported for parsing the arguments
+		choices=("patch", "plan"),
+		default="patch",
+	)
+	parser.add_argument(
+		"--tree_out",
+		help="Tree mode: path of the file where --tree_output is written. Defaults to stdout.",
+		type=Path,
+		default=None,
+	)
+	parser.add_argument(
+		"--coordinator",
+		help="""Cluster mode: serve the files of the target to workers, on this address
+		("host:port" for TCP, or the path of a Unix socket). Workers pull work units (chunks of
+		directories) and must see the target at the same path (see cluster_mode/coordinator.py).""",
+		default=None,
+	)
+	parser.add_argument(
+		"--worker",
+		help="""Cluster mode: process work units from the coordinator at this address,
+		with the coordinator's config. No target is needed.""",
+		default=None,
+	)
+	parser.add_argument(
+		"--cluster_authkey",
+		help="""Cluster mode: shared secret authenticating the workers.
+		Defaults to the COPYRIGHT_CLUSTER_AUTHKEY environment variable.""",
+		default=os.environ.get("COPYRIGHT_CLUSTER_AUTHKEY"),
+	)
+	parser.add_argument(
+		"--local_workers",
+		help="Cluster mode: number of workers the coordinator starts on this host.",
+		type=int,
+		default=0,
+	)
+	parser.add_argument(
+		"--unit_size",
+		help="""Cluster mode: number of files (or groups of identical files) in a work unit.
+		Defaults to cluster_mode.UNIT_SIZE.""",
+		type=int,
+		default=None,
+	)
+	parser.add_argument(
+		"--unit_timeout",
+		help="""Cluster mode: seconds a worker has to process a work unit,
+		before it is assigned to another worker. Defaults to cluster_mode.DEFAULT_UNIT_TIMEOUT.""",
+		type=float,
+		default=None,
+	)
+
+	out = parser.parse_args()
+
+	if out.quiet and out.verbose:
+		raise ValueError("Please only specify one of 'quiet' or 'verbose' !")
+
+	if [out.target_path, out.batch_manifest, out.worker].count(None) != 2:
+		raise ValueError("Please specify exactly one of 'target', 'batch_manifest' or 'worker' !")
+
+	if out.profile_sample < 0 or out.profile_top < 0:
+		raise ValueError("'profile_sample' and 'profile_top' must be positive !")
+
+	if out.rollover and out.header_index is None:
+		raise ValueError("'rollover' needs a 'header_index' !")
+
+	if out.header_index is not None and (out.batch_manifest is not None or out.serve is not None):
+		raise ValueError("'header_index' is not supported in batch or server mode !")
+
+	if out.header_index is not None and out.fast_import_branch:
+		raise ValueError("'header_index' is not supported with 'fast_import_branch' !")
+
+	if out.coordinator is not None or out.worker is not None:
+		if out.cluster_authkey is None:
+			raise ValueError(
+				"Cluster mode needs 'cluster_authkey' (or COPYRIGHT_CLUSTER_AUTHKEY) !"
+			)
+		for arg_name in ("serve", "profile", "header_index", "events_out"):
+			if getattr(out, arg_name) is not None:
+				raise ValueError(f"'{arg_name}' is not supported in cluster mode !")
+		if out.fast_import_branch:
+			raise ValueError("'fast_import_branch' is not supported in cluster mode !")
+		if out.local_workers < 0 or any(
+			value is not None and value <= 0 for value in (out.unit_size, out.unit_timeout)
+		):
+			raise ValueError("'local_workers', 'unit_size' and 'unit_timeout' must be positive !")
+
+	if out.time_budget is not None or out.journal is not None:
+		for arg_name in ("batch_manifest", "serve", "worker", "coordinator", "from_tree"):
+			if getattr(out, arg_name) is not None:
+				raise ValueError(f"'time_budget' and 'journal' are not supported with '{arg_name}' !")
+		if out.time_budget is not None and out.time_budget <= 0:
+			raise ValueError("'time_budget' must be positive !")
+		if out.journal is not None and (out.dry_run or out.fast_import_branch):
+			raise ValueError("'journal' is not supported with 'dry_run' or 'fast_import_branch' !")
+
+	if out.submodules:
+		for arg_name in (
+			"batch_manifest",
+			"serve",
+			"worker",
+			"coordinator",
+			"from_tree",
+			"profile",
+			"header_index",
+			"events_out",
+			"changed_files_out",
+			"journal",
+			"time_budget",
+		):
+			if getattr(out, arg_name) is not None:
+				raise ValueError(f"'{arg_name}' is not supported with 'submodules' !")
+		if out.fast_import_branch:
+			raise ValueError("'fast_import_branch' is not supported with 'submodules' !")
+
+	if out.worker is not None:
+		# The config is sent by the coordinator
+		return out
+
+	if out.from_tree is not None:
+		for arg_name in ("batch_manifest", "serve", "coordinator", "profile", "header_index"):
+			if getattr(out, arg_name) is not None:
+				raise ValueError(f"'{arg_name}' is not supported with 'from_tree' !")
+		if out.dedup_content:
+			raise ValueError("'dedup_content' is not supported with 'from_tree' !")
+
+	if out.batch_manifest is not None:
+		if out.coordinator is not None:
+			raise ValueError("'coordinator' is not supported in batch mode !")
+		if out.serve is not None:
+			raise ValueError("'serve' is not supported in batch mode !")
+		if out.profile is not None:
+			raise ValueError("'profile' is not supported in batch mode !")
+		if out.fast_import_branch:
+			raise ValueError("'fast_import_branch' is not supported in batch mode !")
+		if out.changed_files_out is not None:
+			raise ValueError("'changed_files_out' is not supported in batch mode, see 'batch_report' !")
+		if out.events_out is not None:
+			raise ValueError("'events_out' is not supported in batch mode, see 'batch_report' !")
+		# Per-repo paths are resolved when loading the manifest
+		return out
+
+	out.target_path = out.target_path.absolute()
+
+	if not out.target_path.exists():
+		raise FileNotFoundError(
+			f"Specified target path '(out.target_path!s)' does not exist !"
+		)
+
+	for arg_name in (
+		"languages_path",
+		"disclaimer_path",
+		"excludes_path",
+	):
+		# Calculate full path
+		path: Path = out.target_path.joinpath(getattr(out, arg_name))
+		if not path.exists():
+			raise FileNotFoundError(
+				f"Specified path '{path!s}' for argument '{arg_name}' does not exist !"
+			)
+		setattr(out, arg_name, path)
+
+	if out.year_cache_path is not None:
+		# Does not need to exist yet, it is created at the end of the run
+		out.year_cache_path = out.target_path.joinpath(out.year_cache_path)
+
+	if out.header_index is not None:
+		# Does not need to exist yet, it is created at the end of the run
+		out.header_index = out.target_path.joinpath(out.header_index)
+
+	if out.journal is not None:
+		# Does not need to exist yet, it is created on the first run of the sweep
+		out.journal = out.target_path.joinpath(out.journal)
+
+	if out.year_map_path is not None:
+		out.year_map_path = out.target_path.joinpath(out.year_map_path)
+		if not out.year_map_path.exists():
+			raise FileNotFoundError(
+				f"Specified path '{out.year_map_path!s}' for argument 'year_map_path' does not exist !"
+			)
+
+	return out
+
+
+def config_setup(args: Namespace) -> None:
+	"""Load all config files and initialize needed variables."""
+	# Initialize logging
+	level = (
+		logging.DEBUG
+		if args.verbose
+		else (logging.WARNING if args.quiet else logging.INFO)
+	)
+	logging.basicConfig(format="[%(relativeCreated)d ms] %(message)s", level=level)
+
+	config_cache.set_config_cache_dir(
+		None if args.no_config_cache else args.config_cache_dir
+	)
+
+	# Setup whitespace-related configs
+	logging.info(
+		"Setting padding amount to: %s space.%s",
+		args.padding,
+		"Enabling whitespace_surround function." if args.whitespace_surround else "",
+	)
+	language_support.set_inner_pad(args.padding)
+	language_support.set_scan_window(
+		args.scan_window_lines or None, args.scan_window_size or None
+	)
+	content_updates.set_whitespace_surround(args.whitespace_surround)
+	content_updates.set_safe_writes(args.safe_writes)
+	file_walk.set_walk_threads(args.walk_threads)
+	file_walk.set_nested_excludes_name(args.nested_excludes_name)
+
+	if args.batch_manifest is not None or args.worker is not None:
+		# In batch and worker modes, configs are loaded per repository
+		return
+
+	# Load config and content files
+	logging.info("Loading languages from %s", str(args.languages_path))
+	language_support.load_languages(languages_config_path=args.languages_path)
+	logging.debug("Loaded langugaes: %s", language_support.load_languages())
+
+	logging.info("loading exclude patterns from %s", str(args.excludes_path))
+	file_walk.get_exclude_patterns(excludes_file_path=args.excludes_path)
+	logging.debug("Loaded exclude patterns: %s", file_walk.get_exclude_patterns())
+
+	# Only load disclaimer if we will use it
+	if args.disclaimer_mode in ("always", "config"):
+		logging.info("Loading copyright disclaimer from %s", str(args.disclaimer_path))
+		content_updates.get_disclaimer_text(disclaimer_file_path=args.disclaimer_path)
+		logging.debug(
+			"Loaded copyright disclaimer: %s",
+			"\n".join(content_updates.get_disclaimer_text()),
+		)
+
+	# The year cache follows HEAD: it does not apply to another tree-ish
+	if not args.no_year_cache and args.from_tree is None:
+		year_cache = content_updates.load_year_cache(args.target_path, args.year_cache_path)
+		if year_cache is not None:
+			logging.info(
+				"Loaded %s creation years from %s",
+				len(year_cache.years),
+				str(year_cache.cache_path),
+			)
+
+	content_updates.set_year_provider(
+		content_updates.make_year_provider(
+			args.year_providers,
+			args.target_path,
+			args.year_map_path,
+			args.default_year,
+			args.from_tree,
+			args.skip_shallow_history,
+		)
+	)
+
+	if args.header_index is not None:
+		header_index = content_updates.load_header_index(args.target_path, args.header_index)
+		logging.info(
+			"Loaded %s header index entries from %s",
+			len(header_index.entries),
+			str(args.header_index),
+		)
+		content_updates.set_rollover(args.rollover)
+
+
+def write_changed_files(
+	changed_files: List[Path], target_path: Path, output_path: Path
+) -> None:
+	"""
+	Write the paths of the changed files to output_path, NUL-separated.
+	Paths are relative to the target directory, and use the ':(literal)' pathspec magic:
+	file names containing glob characters only ever match themselves.
+	"""
+	target_dir = target_path if target_path.is_dir() else target_path.parent
+	with open(output_path, "wb") as output_file:
+		for path in changed_files:
+			output_file.write(f":(literal){path.relative_to(target_dir).as_posix()}".encode())
+			output_file.write(b"\0")
+
+
+def main_batch(args: Namespace) -> int:
+	"""Batch mode: process all repositories of the manifest, and report results per repo."""
+	# pylint: disable-next=import-outside-toplevel
+	import batch_mode
+
+	repos = batch_mode.load_manifest(args.batch_manifest, args)
+	logging.info("Processing %s repositories with %s workers", len(repos), args.jobs)
+
+	results = batch_mode.run_batch(repos, args)
+	return report_batch_results(results, args)
+
+
+def report_batch_results(results: List["batch_mode.RepoResult"], args: Namespace) -> int:
+	"""Log the results of each repository, and write the batch report. Returns the exit code."""
+	logging.info("Done !")
+	for result in results:
+		logging.info(
+			"%s: %s files, %s modified, %s errors",
+			result.target_path,
+			result.n_files,
+			len(result.modified),
+			len(result.errors),
+		)
+		for path_str, exception, traceback in result.errors:
+			logging.error(
+				"==== %s: %s ===== \nException: %s. Traceback:\n%s",
+				result.target_path,
+				path_str,
+				exception,
+				traceback,
+			)
+
+	if args.batch_report is not None:
+		# pylint: disable-next=import-outside-toplevel
+		import batch_mode
+
+		batch_mode.write_batch_report(results, args.batch_report)
+
+	return 1 if any(result.errors for result in results) else 0
+
+
+def main_submodules(args: Namespace) -> int:
+	"""Submodules mode: process the target and each nested repository separately, in parallel."""
+	# pylint: disable-next=import-outside-toplevel
+	import batch_mode
+	# pylint: disable-next=import-outside-toplevel
+	import server_mode
+
+	logging.info("Locating files to update in %s...", str(args.target_path))
+	nested_repos: List[Path] = []
+	to_update = list(
+		file_walk.get_relevant_files(
+			args.target_path, args.disclaimer_mode, nested_repos=nested_repos
+		)
+	)
+
+	# Each file belongs to the deepest repository containing it
+	repo_roots = [args.target_path, *nested_repos]
+	repo_files: Dict[Path, List[Tuple[Path, bool]]] = {repo_root: [] for repo_root in repo_roots}
+	for path, do_disclaimer in to_update:
+		repo_root = next(parent for parent in path.parents if parent in repo_files)
+		repo_files[repo_root].append((path, do_disclaimer))
+
+	# Same configuration for all repositories, except for the year cache: see make_session_config()
+	repos = [
+		server_mode.make_session_config(args, {"target_path": repo_root}).repo
+		for repo_root in repo_roots
+	]
+	logging.info(
+		"Processing %s files in %s repositories (%s nested) with %s workers",
+		len(to_update),
+		len(repos),
+		len(nested_repos),
+		args.jobs,
+	)
+	results = batch_mode.run_batch(repos, args, [repo_files[repo_root] for repo_root in repo_roots])
+	return report_batch_results(results, args)
+
+
+def main_tree(args: Namespace) -> int:
+	"""Tree mode: update the files of a tree-ish in memory, and write the patch or plan."""
+	# pylint: disable-next=import-outside-toplevel
+	import tree_mode
+
+	progress = progress_reporting.ProgressReporter(
+		interval=args.progress_interval,
+		event_writer=(
+			None if args.events_out is None else progress_reporting.EventWriter(args.events_out)
+		),
+	)
+	result = tree_mode.run_tree(args.target_path, args.from_tree, args.disclaimer_mode, progress)
+	progress.finish()
+
+	write_output = tree_mode.write_patch if args.tree_output == "patch" else tree_mode.write_plan
+	if args.tree_out is None:
+		write_output(result, stdout.buffer)
+		stdout.flush()
+	else:
+		with open(args.tree_out, "wb") as output_file:
+			write_output(result, output_file)
+
+	if args.fast_import_branch and not args.dry_run:
+		committer = git_plumbing.FastImportCommitter(
+			args.target_path, args.fast_import_branch, args.commit_message, args.from_tree
+		)
+		for update in result.updates:
+			committer.add_blob(update.entry.path, update.entry.mode, update.new_content)
+		committer.close()
+
+	if args.changed_files_out is not None:
+		write_changed_files(
+			[args.target_path.joinpath(update.entry.path) for update in result.updates],
+			args.target_path,
+			args.changed_files_out,
+		)
+
+	logging.info(
+		"Done ! %s files, %s modified, %s errors",
+		result.n_files,
+		len(result.updates),
+		len(result.errors),
+	)
+	for path_str, exception, traceback in result.errors:
+		logging.error(
+			"==== %s ===== \nException: %s. Traceback:\n%s", path_str, exception, traceback
+		)
+
+	return 1 if result.errors else 0
+
+
+def main_cluster(args: Namespace) -> int:
+	"""Cluster mode: serve the files to update to the workers, and collect their results."""
+	# pylint: disable-next=import-outside-toplevel
+	from multiprocessing import Event, Process
+
+	# pylint: disable-next=import-outside-toplevel
+	import cluster_mode
+	# pylint: disable-next=import-outside-toplevel
+	import server_mode
+
+	address = cluster_mode.parse_address(args.coordinator)
+	authkey = args.cluster_authkey.encode()
+
+	session = server_mode.make_session_config(args)
+	server_mode.activate_session(session)
+	year_cache = content_updates.get_year_cache() if session.use_year_cache else None
+	if year_cache is not None and not args.dry_run:
+		# Save the cache brought up-to-date with HEAD: workers load it as is
+		year_cache.save()
+
+	logging.info("Locating files to update in %s...", str(args.target_path))
+	to_update = list(
+		file_walk.get_relevant_files(args.target_path, args.disclaimer_mode)
+	)
+	groups = content_updates.group_files(to_update, args.dedup_content)
+	progress = progress_reporting.ProgressReporter(len(to_update), args.progress_interval)
+	unit_size = cluster_mode.UNIT_SIZE if args.unit_size is None else args.unit_size
+	unit_timeout = (
+		cluster_mode.DEFAULT_UNIT_TIMEOUT if args.unit_timeout is None else args.unit_timeout
+	)
+	coordinator = cluster_mode.Coordinator(
+		session, cluster_mode.make_units(groups, unit_size), args.dry_run, unit_timeout, progress
+	)
+
+	# Local workers wait for the coordinator to be listening, until stop is set
+	stop = Event()
+	workers = [
+		Process(target=cluster_mode.run_worker, args=(address, authkey), kwargs={"stop": stop})
+		for _ in range(args.local_workers)
+	]
+	for worker in workers:
+		worker.start()
+
+	result = coordinator.run(address, authkey)
+	progress.finish()
+
+	# Connected workers were sent ("done",), the others (all units were already done) are only
+	# waiting to connect: they all get the same delay to exit
+	stop.set()
+	deadline = perf_counter() + cluster_mode.DISCONNECT_DELAY
+	for worker in workers:
+		worker.join(timeout=max(0.0, deadline - perf_counter()))
+	for worker in workers:
+		if worker.is_alive():
+			worker.terminate()
+
+	if year_cache is not None and not args.dry_run:
+		year_cache.save()
+
+	logging.info(
+		"Done ! %s files, %s modified, %s errors",
+		result.n_files,
+		len(result.modified),
+		len(result.errors),
+	)
+	for path_str, exception, traceback in result.errors:
+		logging.error(
+			"==== %s ===== \nException: %s. Traceback:\n%s", path_str, exception, traceback
+		)
+
+	if args.changed_files_out is not None:
+		write_changed_files(
+			[args.target_path.joinpath(path_str) for path_str in result.modified],
+			args.target_path,
+			args.changed_files_out,
+		)
+
+	return 1 if result.errors else 0
+
+
+def main() -> int:
+	"""Main function"""
+	args = parse_arguments()
+
+	profiler = None
+	if args.profile is not None:
+		profiler = profiling.start_profiler(
+			args.profile, args.profile_sample, args.profile_memory, args.profile_top
+		)
+
+	config_setup(args)
+
+	startup_ms = 1000 * (perf_counter() - START_TIME)
+	if startup_ms > args.startup_budget_ms:
+		logging.warning(
+			"Startup took %.1f ms, over the %.1f ms budget !",
+			startup_ms,
+			args.startup_budget_ms,
+		)
+	else:
+		logging.debug(
+			"Startup took %.1f ms (budget: %.1f ms)", startup_ms, args.startup_budget_ms
+		)
+
+	if args.batch_manifest is not None:
+		return main_batch(args)
+
+	if args.serve is not None:
+		# pylint: disable-next=import-outside-toplevel
+		import server_mode
+
+		return server_mode.serve(args.serve, args)
+
+	if args.worker is not None:
+		# pylint: disable-next=import-outside-toplevel
+		import cluster_mode
+
+		return cluster_mode.run_worker(
+			cluster_mode.parse_address(args.worker), args.cluster_authkey.encode()
+		)
+
+	if args.coordinator is not None:
+		return main_cluster(args)
+
+	if args.from_tree is not None:
+		return main_tree(args)
+
+	if args.submodules:
+		return main_submodules(args)
+
+	logging.info("Locating files to update in %s...", str(args.target_path))
+	nested_repos: List[Path] = []
+	to_update = list(
+		file_walk.get_relevant_files(
+			args.target_path, args.disclaimer_mode, nested_repos=nested_repos
+		)
+	)
+	if nested_repos:
+		logging.warning(
+			"Found %s nested git repositories (ex: %s): their files are processed with the git "
+			"history of the target. Use --submodules to process them separately.",
+			len(nested_repos),
+			str(nested_repos[0]),
+		)
+
+	journal = None
+	if args.journal is not None:
+		# pylint: disable-next=import-outside-toplevel
+		import resumable_sweeps
+
+		journal = resumable_sweeps.SweepJournal(args.journal, args.target_path)
+		journal.open()
+		n_found = len(to_update)
+		to_update = [
+			(path, do_disclaimer)
+			for path, do_disclaimer in to_update
+			if not journal.is_done(path)
+		]
+		logging.info(
+			"Sweep journal %s: %s files already processed, %s left",
+			str(args.journal),
+			n_found - len(to_update),
+			len(to_update),
+		)
+
+	# Creation years are looked up in bulk, the first time a file needs one
+	content_updates.add_creation_year_candidates(path for path, _ in to_update)
+	groups = content_updates.group_files(to_update, args.dedup_content)
+
+	deadline = None
+	if args.time_budget is not None:
+		# The budget includes the startup and the walk: it is the run's duration
+		deadline = START_TIME + args.time_budget
+		# pylint: disable-next=import-outside-toplevel
+		import resumable_sweeps
+
+		groups = resumable_sweeps.prioritize_groups(groups)
+
+	errors = []
+	changed_files = []
+
+	committer = None
+	if args.fast_import_branch and not args.dry_run:
+		committer = git_plumbing.FastImportCommitter(
+			args.target_path, args.fast_import_branch, args.commit_message
+		)
+
+	progress = progress_reporting.ProgressReporter(
+		len(to_update),
+		args.progress_interval,
+		None if args.events_out is None else progress_reporting.EventWriter(args.events_out),
+	)
+
+	out_of_time = False
+	for group_index, group in enumerate(groups):
+		if deadline is not None and perf_counter() > deadline:
+			logging.warning(
+				"Time budget of %s s used up: stopping with %s files left",
+				args.time_budget,
+				sum(len(left.paths) for left in groups[group_index:]),
+			)
+			out_of_time = True
+			break
+
+		path_str = str(group.path.relative_to(args.target_path))
+		logging.debug("====Processing file %s ====", path_str)
+		if len(group.paths) > 1:
+			logging.debug("Same update for: %s", ", ".join(str(path) for path in group.paths[1:]))
+		if profiler is not None:
+			profiler.start_file(path_str)
+		file_start = perf_counter()
+		try:
+			if committer is None:
+				modified = content_updates.process_group(group, args.dry_run)
+			else:
+				_, new_lines = content_updates.get_updated_lines(group.path, group.do_disclaimer)
+				modified = new_lines.modified
+				if modified:
+					# Encode the same way open() would have when writing the file
+					content = "".join(new_lines).encode(getpreferredencoding(False))
+					for path in group.paths:
+						# Symlinks stay symlinks: their target is updated under its own path
+						if not path.is_symlink():
+							committer.add_file(path, content)
+			if modified:
+				changed_files.extend(group.paths)
+			status = (
+				progress_reporting.STATUS_MODIFIED if modified else progress_reporting.STATUS_SKIPPED
+			)
+			error = None
+		# pylint: disable-next=braod-exception-caught
+		except Exception as exc:
+			traceback = format_exc()
+			logging.error(
+				"Error while processing %s !: %s. See end for full traceback.",
+				path_str,
+				exc,
+			)
+			errors.append((path_str, exc, traceback))
+			status = progress_reporting.STATUS_ERROR
+			error = repr(exc)
+		finally:
+			if profiler is not None:
+				profiler.end_file()
+
+		duration = perf_counter() - file_start
+		for path in group.paths:
+			progress.file_done(str(path.relative_to(args.target_path)), status, duration, error)
+			# The whole duration is reported for the first path of the group only
+			duration = 0.0
+
+		# Files in error are tried again by the next run
+		if journal is not None and status != progress_reporting.STATUS_ERROR:
+			journal.add(group.paths)
+
+	progress.finish()
+
+	if journal is not None:
+		journal.close(complete=not out_of_time)
+
+	if committer is not None:
+		committer.close()
+
+	if args.changed_files_out is not None:
+		write_changed_files(changed_files, args.target_path, args.changed_files_out)
+		logging.info(
+			"Wrote %s changed file paths to %s", len(changed_files), str(args.changed_files_out)
+		)
+
+	if not args.dry_run:
+		content_updates.save_year_cache()
+		content_updates.save_header_index()
+
+	if profiler is not None:
+		profiler.finish()
+
+	logging.info("Done !")
+	if errors:
+		logging.error("Errors occured ! Full tracebacks:")
+		for path_str, exception, traceback in errors:
+			logging.error(
+				"==== %s ===== \nException: %s. Traceback:\n%s",
+				path_str,
+				exception,
+				traceback,
+			)
+		return 1
+
+	return 0
+
+
+if __name__ == "__main__":
+	s_exit(main())